@@ -0,0 +1,124 @@
+import random
+
+COMPARISONS = ['<', '<=', '>', '>=', '==', '!=']
+OPERATORS = ['+', '-', '*', '//', '%']
+
+class ProgramGenerator():
+    """
+        Writes synthetic programs in the subset the translator accepts, as
+        large as needed to see how it scales: many globals, deeply nested
+        while/if, many functions calling each other.
+
+        Every expression has a variable or a constant on one side, calls take
+        variables or constants, arrays have a constant size and are indexed
+        by constants or by a loop counter bounded by their size, divisions are
+        by non-zero constants. Function k only calls the functions before it
+        and the top level calls all of them, so none is dead code. The same
+        seed writes the same program.
+    """
+
+    ARRAY_SIZE = 16
+
+    def __init__(self, seed = 0, globals = 100, arrays = 4, functions = 10, depth = 3, statements = 20, locals = 4) -> None:
+        self.globals = globals          # scalar globals, each initialized at the top of the module
+        self.arrays = arrays            # global arrays of ARRAY_SIZE words
+        self.functions = functions
+        self.depth = depth              # nesting of while/if, reached at least once by every function and the top level
+        self.statements = statements    # statements per block, the top level gets as many per 10 globals
+        self.locals = locals            # locals per function, besides its two parameters
+        self.__random = random.Random(seed)
+        self.__lines = []
+
+    def source(self):
+        """The program, as Python source"""
+        self.__lines = []
+        for n in range(self.globals):
+            self.__emit(0, f'g{n} = {self.__random.randint(0, 99)}')
+        for n in range(self.arrays):
+            self.__emit(0, f'arr{n} = [0] * {self.ARRAY_SIZE}')
+        self.__emit(0, '')
+        for k in range(self.functions):
+            self.__function(k)
+        variables = [f'g{n}' for n in range(self.globals)] or ['x']
+        self.__emit(0, 'x = int(input())')
+        self.__block(0, variables, list(range(self.functions)), self.depth, self.statements + self.globals // 10)
+        for k in range(self.functions):
+            self.__emit(0, f'x = fun{k}(x, {self.__random.choice(variables)})')
+        self.__emit(0, 'print(x)')
+        return '\n'.join(self.__lines) + '\n'
+
+    ####
+    ## Functions and blocks
+    ####
+
+    def __function(self, k):
+        self.__emit(0, f'def fun{k}(p0, p1):')
+        variables = ['p0', 'p1'] + [f'v{n}' for n in range(self.locals)]
+        for name in variables[2:]:
+            self.__emit(1, f'{name} = {self.__operand(variables[:2])}')
+        self.__block(1, variables, list(range(k)), self.depth, self.statements)
+        self.__emit(1, f'return {self.__random.choice(variables)}')
+        self.__emit(0, '')
+
+    def __block(self, indent, variables, callees, depth, count):
+        """count statements, the first one nesting depth levels of while/if"""
+        # nested blocks nest only through their first statement, and else branches not at all,
+        # so a program grows linearly with the depth; a few more statements nest at the outermost level
+        for n in range(max(count, 1)):
+            if depth > 0 and (n == 0 or depth == self.depth and self.__random.random() < 0.15):
+                if self.__random.random() < 0.5:
+                    self.__loop(indent, variables, callees, depth)
+                else:
+                    self.__branch(indent, variables, callees, depth)
+            else:
+                self.__simple(indent, variables, callees)
+
+    def __loop(self, indent, variables, callees, depth):
+        counter = f'i{depth}'
+        bound = self.__random.randint(2, self.ARRAY_SIZE)
+        self.__emit(indent, f'{counter} = 0')
+        self.__emit(indent, f'while {counter} < {bound}:')
+        self.__block(indent + 1, variables, callees, depth - 1, self.__random.randint(1, 4))
+        if self.arrays:
+            self.__emit(indent + 1, f'arr{self.__random.randrange(self.arrays)}[{counter}] = {self.__random.choice(variables)}')
+        self.__emit(indent + 1, f'{counter} = {counter} + 1')
+
+    def __branch(self, indent, variables, callees, depth):
+        left, right = self.__random.choice(variables), self.__operand(variables)
+        self.__emit(indent, f'if {left} {self.__random.choice(COMPARISONS)} {right}:')
+        self.__block(indent + 1, variables, callees, depth - 1, self.__random.randint(1, 4))
+        if self.__random.random() < 0.5:
+            self.__emit(indent, 'else:')
+            self.__block(indent + 1, variables, callees, 0, self.__random.randint(1, 3))
+
+    def __simple(self, indent, variables, callees):
+        target = self.__random.choice(variables)
+        choice = self.__random.random()
+        if callees and choice < 0.1:
+            self.__emit(indent, f'{target} = fun{self.__random.choice(callees)}({self.__operand(variables)}, {self.__operand(variables)})')
+        elif self.arrays and choice < 0.2:
+            self.__emit(indent, f'arr{self.__random.randrange(self.arrays)}[{self.__random.randrange(self.ARRAY_SIZE)}] = {target}')
+        elif self.arrays and choice < 0.3:
+            self.__emit(indent, f'{target} = arr{self.__random.randrange(self.arrays)}[{self.__random.randrange(self.ARRAY_SIZE)}]')
+        elif choice < 0.35:
+            self.__emit(indent, f'print({target})')
+        else:
+            self.__emit(indent, f'{target} = {self.__expression(variables)}')
+
+    ####
+    ## Helper functions
+    ####
+
+    def __expression(self, variables):
+        operator = self.__random.choice(OPERATORS)
+        left = self.__random.choice(variables)
+        right = self.__random.randint(1, 9) if operator in ('//', '%') else self.__operand(variables)
+        if self.__random.random() < 0.2:
+            return f'{left} {operator} {right} + {self.__random.randint(0, 9)}'
+        return f'{left} {operator} {right}'
+
+    def __operand(self, variables):
+        return self.__random.choice(variables) if self.__random.random() < 0.7 else str(self.__random.randint(0, 99))
+
+    def __emit(self, indent, line):
+        self.__lines.append('    ' * indent + line if line else '')
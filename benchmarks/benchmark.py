@@ -0,0 +1,107 @@
+"""
+    Translator throughput benchmarks on synthetic programs (see ProgramGenerator).
+
+    Every case is generated at growing scales and translated with the default
+    options: the time of each phase is the best of --repeat runs, the peak
+    memory it allocates comes from one more run under tracemalloc. Results are
+    printed as a table and written as JSON (--json FILE), or appended as one
+    JSON line per run (--history FILE) to track them over time.
+
+        python benchmarks/benchmark.py --cases nesting functions --scales 1 2 --json results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translator
+from ProgramGenerator import ProgramGenerator
+
+# the generator parameters of every case at scale s: each one stresses one dimension of the input
+CASES = {
+    'globals': lambda s: dict(globals=1000 * s, arrays=4, functions=2, depth=2, statements=10),
+    'nesting': lambda s: dict(globals=20, arrays=4, functions=4, depth=6 * s, statements=4),
+    'functions': lambda s: dict(globals=50, arrays=4, functions=100 * s, depth=2, statements=8),
+    'mixed': lambda s: dict(globals=200 * s, arrays=8, functions=20 * s, depth=2 + s, statements=10),
+}
+
+def main():
+    args = process_cli()
+    cases = args.cases or list(CASES)
+    results = []
+    for case in cases:
+        for scale in args.scales:
+            source = ProgramGenerator(args.seed, **CASES[case](scale)).source()
+            results.append(measure(case, scale, source, args.repeat, not args.no_memory))
+            print_result(results[-1])
+    document = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'translator': translator.translator_version(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.json is not None:
+        with open(args.json, 'w') as out:
+            json.dump(document, out, indent=1)
+    if args.history is not None:
+        with open(args.history, 'a') as out:
+            out.write(json.dumps(document) + '\n')
+
+def process_cli():
+    parser = argparse.ArgumentParser(description='Benchmark the translator on synthetic programs')
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=None,
+                        help='cases to run (default: all)')
+    parser.add_argument('--scales', nargs='+', type=int, default=[1, 2], metavar='S',
+                        help='scale factors of the generated programs')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='translations per program, the best time of each phase is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', default=False, action='store_true',
+                        help='skip the tracemalloc run measuring the peak memory of each phase')
+    parser.add_argument('--json', default=None, metavar='FILE',
+                        help='write the results to FILE')
+    parser.add_argument('--history', default=None, metavar='FILE',
+                        help='append the results to FILE as one JSON line')
+    return parser.parse_args()
+
+def measure(case, scale, source, repeat, memory):
+    """Best time of every phase over repeat translations, then their peak memory"""
+    best = None
+    for _ in range(max(repeat, 1)):
+        _, profiler = translator.profile_translation(case, source)
+        summary = profiler.summary()
+        if best is None:
+            best = summary
+        else:
+            best['phases'] = {name: min(seconds, best['phases'][name]) for name, seconds in summary['phases'].items()}
+    peaks = {}
+    if memory:
+        _, profiler = translator.profile_translation(case, source, memory=True)
+        peaks = profiler.memory
+    return {
+        'case': case,
+        'scale': scale,
+        'lines': source.count('\n'),
+        'counters': best['counters'],
+        'total': sum(best['phases'].values()),
+        'phases': {name: {'seconds': seconds, 'peak_bytes': peaks.get(name)} for name, seconds in best['phases'].items()},
+    }
+
+def print_result(result):
+    print(f'{result["case"]} x{result["scale"]}: {result["lines"]} lines, {result["counters"].get("ast_nodes")} AST nodes, '
+          f'{result["counters"].get("instructions_optimized", result["counters"].get("instructions"))} instructions, '
+          f'{result["total"] * 1000:.1f} ms')
+    for name, phase in result['phases'].items():
+        peak = f'{phase["peak_bytes"] / 1024:>10.1f} KiB' if phase['peak_bytes'] is not None else ''
+        print(f'    {name:<20} {phase["seconds"] * 1000:>10.2f} ms {peak}')
+
+
+if __name__ == '__main__':
+    main()
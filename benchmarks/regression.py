@@ -0,0 +1,145 @@
+"""
+    Performance regression suite of the generated code.
+
+    Every program under _samples is translated with the default options and
+    run on the built-in Pep/9 simulator with fixed input vectors. Its static
+    code size, and for every vector its output, executed instruction count
+    and peak stack usage, are compared with the committed baseline
+    (benchmarks/baseline.json): the suite fails when an output changes or a
+    figure grows past --threshold. Samples run in parallel, one per core.
+
+        python benchmarks/regression.py                 # compare with the baseline
+        python benchmarks/regression.py --update        # accept the current figures
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import translator
+from simulator.Pep9Simulator import Pep9Simulator
+
+SAMPLES = os.path.join(ROOT, '_samples')
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+MAX_STEPS = 5_000_000
+
+# values read by input(), one run per vector; the samples missing here read one number
+DEFAULT_INPUTS = [[0], [5], [10]]
+INPUTS = {
+    '1_global/mult.py': [[6, 7], [0, 9], [123, 45]],
+    '2_mem_alloc/mult.py': [[6, 7], [0, 9], [123, 45]],
+    '3_conditionals/gcd.py': [[84, 36], [17, 5], [1000, 1000]],
+    '3_conditionals/smart_mult.py': [[6, 7], [45, 123], [123, 45]],
+    '4_function_calls/fib_rec.py': [[0], [5], [15]],
+    '5_arrays/eratosthenes.py': [[10], [50], [99]],
+    '5_arrays/eratosthenes_local.py': [[10], [50], [99]],
+    '5_arrays/fibo_cached.py': [[0], [5], [24]],
+    '5_arrays/global_read.py': [[3, 4, 1, 2, 3, 4], [0, 0], [-7, 2, 100, 200]],
+    '5_arrays/local_read.py': [[3, 4, 1, 2, 3, 4], [0, 0], [-7, 2, 100, 200]],
+}
+# figures compared with the threshold: the larger, the worse
+SAMPLE_METRICS = ('code_size',)
+RUN_METRICS = ('instructions', 'max_stack_depth')
+
+def main():
+    args = process_cli()
+    samples = sorted(os.path.relpath(path, SAMPLES).replace(os.sep, '/')
+                     for path in glob.glob(os.path.join(SAMPLES, '*', '*.py')))
+    with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        results = dict(zip(samples, pool.map(measure, samples)))
+    if args.update or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as out:
+            json.dump(results, out, indent=1, sort_keys=True)
+            out.write('\n')
+        print(f'; baseline of {len(results)} samples written to {args.baseline}')
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failures = compare(baseline, results, args.threshold)
+    raise SystemExit(1 if failures else 0)
+
+def process_cli():
+    parser = argparse.ArgumentParser(description='Compare the code generated for _samples with the committed baseline')
+    parser.add_argument('--baseline', default=BASELINE, metavar='FILE',
+                        help='baseline to compare with (default: benchmarks/baseline.json)')
+    parser.add_argument('--threshold', type=float, default=0.02, metavar='RATIO',
+                        help='relative growth of a figure counted as a regression (default: 0.02)')
+    parser.add_argument('--update', default=False, action='store_true',
+                        help='write the current figures as the new baseline')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes (default: one per core)')
+    return parser.parse_args()
+
+def measure(sample):
+    """Worker: code size of sample, and output, instruction count and stack depth of every run"""
+    with open(os.path.join(SAMPLES, sample)) as f:
+        source = f.read()
+    try:
+        program = translator.program_listing(ast.parse(source))
+    except Exception as e:
+        return {'error': f'{type(e).__name__}: {e}'}
+    result = {'runs': []}
+    for inputs in INPUTS.get(sample, DEFAULT_INPUTS):
+        simulator = Pep9Simulator(program, inputs, MAX_STEPS)
+        run = {'input': inputs}
+        try:
+            simulator.run()
+        except Exception as e:
+            run['error'] = f'{type(e).__name__}: {e}'
+        stats = simulator.stats()
+        result['code_size'] = stats['code_size']
+        run.update(output=simulator.text(), instructions=stats['instructions'], max_stack_depth=stats['max_stack_depth'])
+        result['runs'].append(run)
+    return result
+
+def compare(baseline, results, threshold):
+    """Print every change from the baseline, returns the regressions"""
+    failures = []
+    changes = []
+    def check(name, metric, old, new):
+        if old is None or old == new:
+            return
+        ratio = (new - old) / old if old else float('inf')
+        changes.append(f'; {name:<48} {metric:<16} {old:>9} -> {new:>9} ({ratio * 100:+.1f}%)')
+        if ratio > threshold:
+            failures.append(f'{name}: {metric} grew from {old} to {new}')
+    for sample, result in results.items():
+        expected = baseline.get(sample)
+        if expected is None:
+            print(f'; {sample}: not in the baseline')
+            continue
+        if 'error' in result or 'error' in expected:
+            if 'error' in result and 'error' not in expected:
+                failures.append(f'{sample}: no longer translated ({result["error"]})')
+            elif 'error' not in result:
+                print(f'; {sample}: now translated')
+            continue
+        for metric in SAMPLE_METRICS:
+            check(sample, metric, expected.get(metric), result.get(metric))
+        for run, old in zip(result['runs'], expected['runs']):
+            name = f'{sample} {run["input"]}'
+            if run['input'] != old['input']:
+                print(f'; {name}: input differs from the baseline, not compared')
+                continue
+            if run['output'] != old['output'] or run.get('error') != old.get('error'):
+                failures.append(f'{name}: output {run["output"]!r}{" (" + run["error"] + ")" if "error" in run else ""}, expected {old["output"]!r}')
+            for metric in RUN_METRICS:
+                check(name, metric, old.get(metric), run.get(metric))
+    for sample in baseline.keys() - results.keys():
+        print(f'; {sample}: in the baseline, no longer a sample')
+    for change in changes:
+        print(change)
+    for failure in failures:
+        print(f'; REGRESSION {failure}')
+    print(f'; {len(results)} samples, {len(changes)} changed figures, {len(failures)} regressions (threshold {threshold * 100:g}%)')
+    return failures
+
+
+if __name__ == '__main__':
+    main()
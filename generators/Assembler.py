@@ -0,0 +1,180 @@
+LabeledInstruction = tuple[str, str]
+
+# instruction specifiers: unary instructions are one byte, the others a byte then a 16-bit operand
+UNARY = {
+    'STOP': 0x00, 'RET': 0x01, 'RETTR': 0x02, 'MOVSPA': 0x03, 'MOVFLGA': 0x04, 'MOVAFLG': 0x05,
+    'NOTA': 0x06, 'NOTX': 0x07, 'NEGA': 0x08, 'NEGX': 0x09, 'ASLA': 0x0A, 'ASLX': 0x0B,
+    'ASRA': 0x0C, 'ASRX': 0x0D, 'ROLA': 0x0E, 'ROLX': 0x0F, 'RORA': 0x10, 'RORX': 0x11,
+    'NOP0': 0x26, 'NOP1': 0x27,
+}
+# branches and CALL: the low bit selects immediate (0) or indexed (1) addressing
+BRANCHES = {
+    'BR': 0x12, 'BRLE': 0x14, 'BRLT': 0x16, 'BREQ': 0x18, 'BRNE': 0x1A,
+    'BRGE': 0x1C, 'BRGT': 0x1E, 'BRV': 0x20, 'BRC': 0x22, 'CALL': 0x24,
+}
+# the low three bits select the addressing mode
+NONUNARY = {
+    'NOP': 0x28, 'DECI': 0x30, 'DECO': 0x38, 'HEXO': 0x40, 'STRO': 0x48, 'ADDSP': 0x50, 'SUBSP': 0x58,
+    'ADDA': 0x60, 'ADDX': 0x68, 'SUBA': 0x70, 'SUBX': 0x78, 'ANDA': 0x80, 'ANDX': 0x88,
+    'ORA': 0x90, 'ORX': 0x98, 'CPWA': 0xA0, 'CPWX': 0xA8, 'CPBA': 0xB0, 'CPBX': 0xB8,
+    'LDWA': 0xC0, 'LDWX': 0xC8, 'LDBA': 0xD0, 'LDBX': 0xD8, 'STWA': 0xE0, 'STWX': 0xE8,
+    'STBA': 0xF0, 'STBX': 0xF8,
+}
+MODES = {'i': 0, 'd': 1, 'n': 2, 's': 3, 'sf': 4, 'x': 5, 'sx': 6, 'sfx': 7}
+# instructions writing to their operand cannot take an immediate
+NOT_IMMEDIATE = {'DECI', 'STWA', 'STWX', 'STBA', 'STBX'}
+STRO_MODES = {'d', 'n', 's', 'sf', 'x'}
+
+MEMORY_SIZE = 0x10000
+
+class AssemblyError(Exception):
+    """Raised when a listing cannot be assembled (unknown mnemonic, undefined symbol, bad addressing mode...)"""
+
+
+class Assembler():
+    """
+        Two-pass Pep/9 assembler, so a translation runs without the Pep/9 IDE.
+
+        The program is the whole listing as (label, instruction) pairs, the
+        same as Pep9Simulator takes: `BR tl`, the allocator directives
+        (.WORD, .BLOCK, .EQUATE), the instructions and `.END`. The first pass
+        gives every label its address (or its .EQUATE value), the second one
+        encodes the instructions with their operands resolved.
+
+        objectCode() is the hex text of a .pepo file, listing() the program
+        with the address and the object code of every line, then the symbols.
+    """
+
+    def __init__(self, program: list[LabeledInstruction]) -> None:
+        self.symbols = {}
+        self.code = bytearray()
+        self.__lines = []   # (address, object bytes, label, mnemonic, operand)
+        entries = self.__layout(program)
+        self.__encode(entries)
+
+    def objectCode(self):
+        """Object code in the .pepo format: hex bytes, 16 per line, terminated by zz"""
+        text = [f'{byte:02X}' for byte in self.code] + ['zz']
+        return '\n'.join(' '.join(text[i:i + 16]) for i in range(0, len(text), 16)) + '\n'
+
+    def listing(self):
+        """Assembler listing: address, object code (up to 3 bytes), source line, then the symbol table"""
+        lines = ['Addr  Object  Symbol    Mnemon  Operand', '-' * 48]
+        for address, data, label, mnemonic, operand in self.__lines:
+            symbol = f'{label}:' if label is not None else ''
+            location = f'{address:04X}' if address is not None else '    '
+            lines.append(f'{location}  {data[:3].hex().upper():<6}  {symbol:<9} {mnemonic:<7} {operand}'.rstrip())
+        lines += ['-' * 48, 'Symbol    Value']
+        for name, value in sorted(self.symbols.items()):
+            lines.append(f'{name:<9} {value & 0xFFFF:04X}')
+        return '\n'.join(lines) + '\n'
+
+    ####
+    ## First pass: addresses of the labels
+    ####
+
+    def __layout(self, program):
+        address = 0
+        entries = []
+        for label, instruction in program:
+            parts = instruction.split(None, 1)
+            mnemonic = parts[0].upper()
+            operand = parts[1].strip() if len(parts) > 1 else ''
+            if label is not None:
+                if len(label) > 8:
+                    raise AssemblyError(f'Symbol {label} is longer than 8 characters')
+                if label in self.symbols:
+                    raise AssemblyError(f'Duplicate symbol: {label}')
+            if mnemonic == '.EQUATE':
+                if label is None:
+                    raise AssemblyError('.EQUATE without a symbol')
+                self.symbols[label] = self.__number(operand)
+                entries.append((None, label, mnemonic, operand))
+                continue
+            if label is not None:
+                self.symbols[label] = address
+            entries.append((address, label, mnemonic, operand))
+            if mnemonic == '.END':
+                break
+            address += self.__size(mnemonic, operand)
+            if address > MEMORY_SIZE:
+                raise AssemblyError('Program does not fit in memory')
+        else:
+            raise AssemblyError('Missing .END')
+        return entries
+
+    def __size(self, mnemonic, operand):
+        if mnemonic == '.WORD':
+            return 2
+        if mnemonic == '.BLOCK':
+            size = self.__number(operand)
+            if not 0 <= size < MEMORY_SIZE:
+                raise AssemblyError(f'Invalid .BLOCK size: {operand}')
+            return size
+        if mnemonic in UNARY:
+            return 1
+        if mnemonic in BRANCHES or mnemonic in NONUNARY:
+            return 3
+        raise AssemblyError(f'Unknown mnemonic: {mnemonic}')
+
+    ####
+    ## Second pass: object code
+    ####
+
+    def __encode(self, entries):
+        for address, label, mnemonic, operand in entries:
+            if mnemonic == '.EQUATE' or mnemonic == '.END':
+                data = b''
+            elif mnemonic == '.WORD':
+                data = self.__word(self.__value(operand))
+            elif mnemonic == '.BLOCK':
+                data = bytes(self.__number(operand))
+            elif mnemonic in UNARY:
+                data = bytes([UNARY[mnemonic]])
+            else:
+                data = self.__instruction(mnemonic, operand)
+            self.code += data
+            self.__lines.append((address, data, label, mnemonic, operand))
+
+    def __instruction(self, mnemonic, operand):
+        spec, _, mode = operand.partition(',')
+        spec, mode = spec.strip(), mode.strip().lower()
+        if not spec:
+            raise AssemblyError(f'{mnemonic} needs an operand')
+        if mnemonic in BRANCHES:
+            mode = mode or 'i'  # the only mode that may be omitted
+            if mode not in ('i', 'x'):
+                raise AssemblyError(f'Invalid addressing mode for {mnemonic}: {mode}')
+            specifier = BRANCHES[mnemonic] | (mode == 'x')
+        else:
+            if mode not in MODES:
+                raise AssemblyError(f'Invalid addressing mode for {mnemonic}: {mode or "none"}')
+            if (mnemonic in NOT_IMMEDIATE and mode == 'i') or (mnemonic == 'STRO' and mode not in STRO_MODES):
+                raise AssemblyError(f'Invalid addressing mode for {mnemonic}: {mode}')
+            specifier = NONUNARY[mnemonic] | MODES[mode]
+        return bytes([specifier]) + self.__word(self.__value(spec))
+
+    ####
+    ## Helper functions
+    ####
+
+    def __word(self, value):
+        if not -0x8000 <= value < MEMORY_SIZE:
+            raise AssemblyError(f'Operand out of range: {value}')
+        return (value & 0xFFFF).to_bytes(2, 'big')
+
+    def __number(self, text):
+        text = text.strip()
+        if len(text) == 3 and text[0] == text[2] == "'":
+            return ord(text[1])
+        try:
+            return int(text, 0)
+        except ValueError:
+            raise AssemblyError(f'Invalid number: {text}') from None
+
+    def __value(self, text):
+        if text in self.symbols:
+            return self.symbols[text]
+        if text and (text[0].isalpha() or text[0] == '_'):
+            raise AssemblyError(f'Undefined symbol: {text}')
+        return self.__number(text)
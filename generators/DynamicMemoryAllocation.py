@@ -1,24 +1,32 @@
+from visitors.SymbolTable import LOCAL, PARAM
 
 class DynamicMemoryAllocation():
+    """
+        Stack offsets of every function, one .EQUATE per local and parameter
+        and one per return value slot. Each function has its own frame
+        (laid out by LocalVariableExtraction), the labels are unique.
+    """
 
-    def __init__(self, local_vars: dict(), returns) -> None:
-        self.__local_vars = local_vars
-        self.__memoryAlloc = [x * 2 for x in range(0, len(self.__local_vars))]  # generate intervals of 2 for stack allocation
-        self.stackMemory = len(self.__local_vars) * 2  # generate max stack allocation for extraneous variable
-        self.returns = returns
+    def __init__(self, symbols) -> None:
+        self.__frames = [scope for scope in symbols.scopes() if scope.returnSymbol is not None]
 
-    def generate(self):
-        print('; Allocating Local (dynamic) memory')
-        for count, n in enumerate(self.__local_vars):
-            
-            varName = n[0]
-            # varValue = n[1]
-            # stackMemory = self.stackMemory
+    def directives(self):
+        """(label, directive) pairs of the stack offsets, locals first then return variables"""
+        return [d for scope in self.__frames for d in self.__localDirectives(scope)] + self.__returnDirectives()
 
-            print(f'{str(varName+":"):<9}\t.EQUATE {str(self.__memoryAlloc[count])}') # reserving memory
-        
-        print('; Allocation memory for return variables')
-        for returnVar, malloc in self.returns:
-            print(f'{str(returnVar+":"):<9}\t.EQUATE {str(malloc)}') # reserving memory
+    def generate(self, sink):
+        sink.comment('Allocating Local (dynamic) memory')
+        for scope in self.__frames:
+            sink.comment(f'Frame of {scope.name}: {scope.frameSize} bytes reserved, parameters: {", ".join(p.name for p in scope.parameters) or "none"}')
+            for label, directive in self.__localDirectives(scope):
+                sink.labeled(label, directive) # reserving memory
 
+        sink.comment('Allocation memory for return variables')
+        for label, directive in self.__returnDirectives():
+            sink.labeled(label, directive) # reserving memory
 
+    def __localDirectives(self, scope):
+        return [(symbol.label, f'.EQUATE {str(symbol.offset)}') for symbol in scope if symbol.storage in (LOCAL, PARAM)]
+
+    def __returnDirectives(self):
+        return [(scope.returnSymbol.label, f'.EQUATE {str(scope.returnSymbol.offset)}') for scope in self.__frames]
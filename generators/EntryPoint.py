@@ -3,8 +3,7 @@ class EntryPoint():
     def __init__(self, instructions) -> None:
         self.__instructions = instructions
 
-    def generate(self):
-        print('; Top Level instructions')
+    def generate(self, sink):
+        sink.comment('Top Level instructions')
         for label, instr in self.__instructions:
-            s = f'\t\t{instr}' if label == None else f'{str(label+":"):<9}\t{instr}'
-            print(s)
\ No newline at end of file
+            sink.labeled(label, instr)
\ No newline at end of file
@@ -0,0 +1,37 @@
+
+class OutputSink():
+    """
+        Destination of a listing. Lines are buffered and written to `stream`
+        with a single write when the sink is flushed (or every `bufferLines`
+        lines, to bound memory on huge programs). Without a stream, the whole
+        listing is returned by getvalue() for in-process callers.
+    """
+
+    def __init__(self, stream = None, bufferLines = 65536) -> None:
+        self.__stream = stream
+        self.__bufferLines = bufferLines
+        self.__lines = []
+
+    def line(self, text):
+        self.__lines.append(text)
+        if self.__stream is not None and len(self.__lines) >= self.__bufferLines:
+            self.flush()
+
+    def comment(self, text):
+        self.line(f'; {text}')
+
+    def labeled(self, label, instruction):
+        """One instruction or directive, in the column layout of the Pep/9 listing"""
+        self.line(f'\t\t{instruction}' if label == None else f'{str(label+":"):<9}\t{instruction}')
+
+    def flush(self):
+        if self.__stream is None or not self.__lines:
+            return
+        self.__lines.append('')  # trailing newline
+        self.__stream.write('\n'.join(self.__lines))
+        self.__lines = []
+        self.__stream.flush()
+
+    def getvalue(self):
+        """The buffered listing as one string (only for sinks without a stream)"""
+        return '\n'.join(self.__lines) + '\n' if self.__lines else ''
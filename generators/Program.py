@@ -0,0 +1,57 @@
+from generators.EntryPoint import EntryPoint
+from generators.OutputSink import OutputSink
+
+LabeledInstruction = tuple[str, str]
+
+class Program():
+    """
+        A translated program as data, for callers that post-process or
+        assemble it rather than print it:
+
+        - static: (label, directive) pairs of the global memory, .WORD, .BLOCK
+          and the .EQUATE of the _CONSTANTS
+        - dynamic: (label, .EQUATE) pairs of the stack offsets of the locals,
+          parameters and return values
+        - instructions: (label, instruction) pairs of the runtime routines,
+          the functions and the top level, as the peephole pass left them
+        - notes: what the optimizers reported
+
+        listing() is the whole program as Assembler and Pep9Simulator take it.
+        The text of the .pep listing is only formatted when render() is first
+        called.
+    """
+
+    def __init__(self, input_file, global_memory_alloc, local_memory_alloc, instructions: list[LabeledInstruction], notes) -> None:
+        self.inputFile = input_file
+        self.static = global_memory_alloc.directives()
+        self.dynamic = local_memory_alloc.directives()
+        self.instructions = instructions
+        self.notes = notes
+        self.__allocators = (global_memory_alloc, local_memory_alloc)
+        self.__text = None
+
+    def listing(self):
+        """(label, instruction) pairs in listing order, from `BR tl` to `.END`"""
+        return [(None, 'BR tl')] + self.static + self.dynamic + self.instructions
+
+    def render(self):
+        """The .pep listing, with its comments; formatted once, then cached"""
+        if self.__text is None:
+            sink = OutputSink()
+            self.generate(sink)
+            self.__text = sink.getvalue()
+        return self.__text
+
+    def generate(self, sink):
+        global_memory_alloc, local_memory_alloc = self.__allocators
+        sink.comment(f'Translating {self.inputFile}')
+        sink.comment('Branching to top level (tl) instructions')
+        sink.labeled(None, 'BR tl')
+
+        global_memory_alloc.generate(sink)
+        local_memory_alloc.generate(sink)
+
+        for note in self.notes:
+            sink.comment(note)
+        ep = EntryPoint(self.instructions)
+        ep.generate(sink)
@@ -0,0 +1,136 @@
+
+# Operands and results of the routines live in static memory: the routines call
+# nothing and the caller reads the result right away, so recursion is safe.
+# Every label starts with '__' to stay out of the way of the program's own names.
+
+MULTIPLY = [
+    # __mul: A <- __mul_a * __mul_b (mod 2^16), shift-and-add over the bits of __mul_b
+    ('__mul', 'LDWA 0,i'),
+    (None, 'STWA __mul_r,d'),
+    ('__mul_l', 'LDWA __mul_b,d'),    # no bit left in b: done
+    (None, 'BREQ __mul_x'),
+    (None, 'ANDA 1,i'),               # low bit of b set: r += a
+    (None, 'BREQ __mul_s'),
+    (None, 'LDWA __mul_r,d'),
+    (None, 'ADDA __mul_a,d'),
+    (None, 'STWA __mul_r,d'),
+    ('__mul_s', 'LDWA __mul_a,d'),    # a <<= 1
+    (None, 'ASLA'),
+    (None, 'STWA __mul_a,d'),
+    (None, 'LDWA __mul_b,d'),         # b >>= 1, logical: ASRA then clear the sign bit
+    (None, 'ASRA'),
+    (None, 'ANDA 0x7FFF,i'),
+    (None, 'STWA __mul_b,d'),
+    (None, 'BR __mul_l'),
+    ('__mul_x', 'LDWA __mul_r,d'),
+    (None, 'RET'),
+]
+
+DIVIDE = [
+    # __div: A <- __div_n // __div_d and __div_n <- __div_n % __div_d, with Python's floor semantics.
+    # Shift-subtract on the magnitudes: the divisor is aligned under the dividend, then
+    # subtracted back one bit at a time. Division by zero stops the program.
+    ('__div', 'LDWA __div_d,d'),
+    (None, 'BREQ __div_z'),
+    (None, 'STWA __div_od,d'),
+    (None, 'BRGE __div_1'),
+    (None, 'NEGA'),
+    (None, 'STWA __div_d,d'),
+    ('__div_1', 'LDWA __div_n,d'),
+    (None, 'STWA __div_on,d'),
+    (None, 'BRGE __div_2'),
+    (None, 'NEGA'),
+    (None, 'STWA __div_n,d'),
+    ('__div_2', 'LDWA 0,i'),
+    (None, 'STWA __div_q,d'),
+    (None, 'LDWA 1,i'),
+    (None, 'STWA __div_b,d'),
+    ('__div_3', 'LDWA __div_d,d'),    # align: d <<= 1 while d < n (unsigned, C clear)
+    (None, 'CPWA __div_n,d'),
+    (None, 'BRC __div_4'),
+    (None, 'ASLA'),
+    (None, 'STWA __div_d,d'),
+    (None, 'LDWA __div_b,d'),
+    (None, 'ASLA'),
+    (None, 'STWA __div_b,d'),
+    (None, 'BR __div_3'),
+    ('__div_4', 'LDWA __div_d,d'),    # n < d (unsigned, d - 1 >= n): this quotient bit is 0
+    (None, 'SUBA 1,i'),
+    (None, 'CPWA __div_n,d'),
+    (None, 'BRC __div_5'),
+    (None, 'LDWA __div_n,d'),         # n -= d, q |= bit
+    (None, 'SUBA __div_d,d'),
+    (None, 'STWA __div_n,d'),
+    (None, 'LDWA __div_q,d'),
+    (None, 'ORA __div_b,d'),
+    (None, 'STWA __div_q,d'),
+    ('__div_5', 'LDWA __div_d,d'),    # d >>= 1, bit >>= 1 (logical)
+    (None, 'ASRA'),
+    (None, 'ANDA 0x7FFF,i'),
+    (None, 'STWA __div_d,d'),
+    (None, 'LDWA __div_b,d'),
+    (None, 'ASRA'),
+    (None, 'ANDA 0x7FFF,i'),
+    (None, 'STWA __div_b,d'),
+    (None, 'BRNE __div_4'),
+    (None, 'LDWA __div_on,d'),        # truncated remainder has the sign of the dividend
+    (None, 'BRGE __div_6'),
+    (None, 'LDWA __div_n,d'),
+    (None, 'NEGA'),
+    (None, 'STWA __div_n,d'),
+    ('__div_6', 'LDWA __div_od,d'),   # same signs: the truncated results are the floored ones
+    (None, 'BRLT __div_7'),
+    (None, 'LDWA __div_on,d'),
+    (None, 'BRGE __div_r'),
+    (None, 'BR __div_ng'),
+    ('__div_7', 'LDWA __div_on,d'),
+    (None, 'BRLT __div_r'),
+    ('__div_ng', 'LDWA __div_q,d'),   # signs differ: q = -q, then floor: if r != 0, q -= 1 and r += d
+    (None, 'NEGA'),
+    (None, 'STWA __div_q,d'),
+    (None, 'LDWA __div_n,d'),
+    (None, 'BREQ __div_r'),
+    (None, 'ADDA __div_od,d'),
+    (None, 'STWA __div_n,d'),
+    (None, 'LDWA __div_q,d'),
+    (None, 'SUBA 1,i'),
+    (None, 'STWA __div_q,d'),
+    ('__div_r', 'LDWA __div_q,d'),
+    (None, 'RET'),
+    ('__div_z', 'STOP'),
+]
+
+ROUTINES = {
+    '__mul': (['__mul_a', '__mul_b', '__mul_r'], MULTIPLY),
+    '__div': (['__div_n', '__div_d', '__div_q', '__div_b', '__div_on', '__div_od'], DIVIDE),
+}
+
+class RuntimeLibrary():
+    """
+        Routines the generated code calls for the operations Pep/9 has no
+        instruction for (multiplication, division, modulo). The code generator
+        records what it uses; each routine and its data are emitted once, and
+        only when used.
+    """
+
+    def __init__(self) -> None:
+        self.__used = []
+
+    def use(self, routine):
+        """Record a call to routine, returns the label to CALL"""
+        if routine not in ROUTINES:
+            raise ValueError(f'Unknown runtime routine: {routine}')
+        if routine not in self.__used:
+            self.__used.append(routine)
+        return routine
+
+    def used(self):
+        return list(self.__used)
+
+    def directives(self):
+        """(label, directive) pairs of the static data of the routines used"""
+        return [(label, '.BLOCK 2') for routine in self.__used for label in ROUTINES[routine][0]]
+
+    def instructions(self):
+        """(label, instruction) pairs of the routines used"""
+        return [instruction for routine in self.__used for instruction in ROUTINES[routine][1]]
@@ -1,20 +1,35 @@
+from visitors.SymbolTable import EQUATE
 
 class StaticMemoryAllocation():
 
-    def __init__(self, global_vars: dict()) -> None:
-        self.__global_vars = global_vars
+    def __init__(self, symbols) -> None:
+        self.__symbols = symbols  # root scope of the SymbolTable
+        self.__reserved = []
 
-    def generate(self):
-        print('; Allocating Global (static) memory')
-        for n in self.__global_vars:
-            ## anything that's not a constant is BLOCK 2, _CAPITAL is EQUATE n, constant is WORD n
-            varName = n[0]
-            varValue = n[1]
+    def reserve(self, directives):
+        """Static memory needed by the generated code itself (runtime library data...)"""
+        self.__reserved.extend(directives)
 
-            if varValue is not None:
-                if varName[0] == "_" and varName[1:].isupper():
-                    print(f'{str(varName+":"):<9}\t.EQUATE {str(varValue)}') # reserving memory
+    def directives(self):
+        """(label, directive) pairs reserving the global memory"""
+        directives = []
+        for symbol in self.__symbols:
+            ## anything that's not a constant is BLOCK 2, _CAPITAL is EQUATE n, constant is WORD n
+            ## arrays are one .BLOCK of their elements, or one .WORD per element when not all 0
+            if symbol.length is not None:
+                if any(symbol.initialValue):
+                    directives.extend((symbol.label if i == 0 else None, f'.WORD {str(value)}') for i, value in enumerate(symbol.initialValue))
                 else:
-                    print(f'{str(varName+":"):<9}\t.WORD {str(varValue)}') # reserving memory
+                    directives.append((symbol.label, f'.BLOCK {str(symbol.size)}'))
+            elif symbol.storage == EQUATE:
+                directives.append((symbol.label, f'.EQUATE {str(symbol.initialValue)}'))
+            elif symbol.initialValue is not None:
+                directives.append((symbol.label, f'.WORD {str(symbol.initialValue)}'))
             else:
-                print(f'{str(varName+":"):<9}\t.BLOCK 2') # reserving memory
+                directives.append((symbol.label, '.BLOCK 2'))
+        return directives + self.__reserved
+
+    def generate(self, sink):
+        sink.comment('Allocating Global (static) memory')
+        for label, directive in self.directives():
+            sink.labeled(label, directive) # reserving memory
@@ -0,0 +1,180 @@
+import ast
+
+COMPARISONS = {
+    ast.Lt:    lambda a, b: a < b,
+    ast.LtE:   lambda a, b: a <= b,
+    ast.Gt:    lambda a, b: a > b,
+    ast.GtE:   lambda a, b: a >= b,
+    ast.Eq:    lambda a, b: a == b,
+    ast.NotEq: lambda a, b: a != b,
+}
+
+ARITHMETIC = {
+    ast.Add:      lambda a, b: a + b,
+    ast.Sub:      lambda a, b: a - b,
+    ast.Mult:     lambda a, b: a * b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod:      lambda a, b: a % b,
+}
+
+def wrap(value):
+    """Pep/9 words are 16-bit two's complement: fold with the same overflow as the target"""
+    return (value + 0x8000) % 0x10000 - 0x8000
+
+class ConstantFolding(ast.NodeTransformer):
+    """
+        Folds constant expressions and propagates constant globals, before any
+        memory is allocated:
+
+        - `3 + 2` becomes `5`, `(x + 1) + 2` becomes `x + 3`, `x - 0` and `x * 1` become `x`
+        - a global assigned exactly once, at the top level, with a constant value
+          (and never shadowed by a parameter or a local) is replaced by that
+          value wherever it is read, so it is accessed with `,i` instead of `,d`
+        - an `if`/`while` whose condition is constant keeps only the branch taken
+
+        The tree is transformed in place.
+    """
+
+    def __init__(self, root_node) -> None:
+        super().__init__()
+        self.root_node = root_node
+        self.constants = {}
+        self.folded = 0
+        self.propagated = 0
+        self.__bindings = self.__countBindings(root_node)
+
+    def run(self):
+        # propagating a constant can make another global constant (x = 5; y = x + 1)
+        while True:
+            self.visit(self.root_node)
+            discovered = self.__discoverConstants()
+            if not discovered:
+                return self.root_node
+            self.constants.update(discovered)
+
+    def report(self):
+        return f'Constant folding: folded {self.folded} expressions, propagated {self.propagated} reads of {len(self.constants)} constant globals'
+
+    ####
+    ## Expressions
+    ####
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load) and node.id in self.constants:
+            self.propagated += 1
+            return ast.copy_location(ast.Constant(self.constants[node.id]), node)
+        return node
+
+    def visit_UnaryOp(self, node):
+        self.generic_visit(node)
+        if self.__isInt(node.operand):
+            if isinstance(node.op, ast.USub):
+                return self.__constant(-node.operand.value, node)
+            if isinstance(node.op, ast.UAdd):
+                return self.__constant(node.operand.value, node)
+        return node
+
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        left, right = node.left, node.right
+        if type(node.op) not in ARITHMETIC:
+            return node
+        if self.__isInt(left) and self.__isInt(right):
+            if isinstance(node.op, (ast.FloorDiv, ast.Mod)) and right.value == 0:
+                return node  # let the program fail at run time, as Python would
+            return self.__constant(ARITHMETIC[type(node.op)](left.value, right.value), node)
+        if isinstance(node.op, (ast.Mult, ast.FloorDiv)) and self.__isInt(right) and right.value == 1:
+            self.folded += 1
+            return left
+        if isinstance(node.op, ast.Mult) and self.__isInt(left) and left.value == 1:
+            self.folded += 1
+            return right
+        if not isinstance(node.op, (ast.Add, ast.Sub)):
+            return node
+        sign = 1 if isinstance(node.op, ast.Add) else -1
+        # x + 0, x - 0, 0 + x
+        if self.__isInt(right) and right.value == 0:
+            self.folded += 1
+            return left
+        if sign == 1 and self.__isInt(left) and left.value == 0:
+            self.folded += 1
+            return right
+        # (x +/- c1) +/- c2  becomes  x +/- (c1 +/- c2)
+        if (self.__isInt(right) and isinstance(left, ast.BinOp) and isinstance(left.op, (ast.Add, ast.Sub))
+                and self.__isInt(left.right)):
+            inner = 1 if isinstance(left.op, ast.Add) else -1
+            total = wrap(inner * left.right.value + sign * right.value)
+            self.folded += 1
+            if total == 0:
+                return left.left
+            op = ast.Add() if total > 0 else ast.Sub()
+            return ast.copy_location(ast.BinOp(left.left, op, ast.Constant(abs(total))), node)
+        return node
+
+    ####
+    ## Statements with a constant condition
+    ####
+
+    def visit_If(self, node):
+        self.generic_visit(node)
+        taken = self.__evaluate(node.test)
+        if taken is None:
+            return node
+        self.folded += 1
+        return (node.body if taken else node.orelse) or None
+
+    def visit_While(self, node):
+        self.generic_visit(node)
+        if self.__evaluate(node.test) is False:
+            self.folded += 1
+            return node.orelse or None
+        return node
+
+    ####
+    ## Helper functions
+    ####
+
+    def __evaluate(self, test):
+        """True/False for a comparison between two constants, None otherwise"""
+        if (isinstance(test, ast.Compare) and len(test.ops) == 1 and type(test.ops[0]) in COMPARISONS
+                and self.__isInt(test.left) and self.__isInt(test.comparators[0])):
+            return COMPARISONS[type(test.ops[0])](test.left.value, test.comparators[0].value)
+        return None
+
+    def __constant(self, value, node):
+        self.folded += 1
+        return ast.copy_location(ast.Constant(wrap(value)), node)
+
+    @staticmethod
+    def __isInt(node):
+        return isinstance(node, ast.Constant) and type(node.value) is int
+
+    def __discoverConstants(self):
+        """Globals bound once, by a top level assignment of a constant"""
+        discovered = {}
+        for statement in self.root_node.body:
+            if (isinstance(statement, ast.Assign) and len(statement.targets) == 1
+                    and isinstance(statement.targets[0], ast.Name)
+                    and self.__isInt(statement.value)):
+                name = statement.targets[0].id
+                if self.__bindings.get(name) == 1 and name not in self.constants:
+                    discovered[name] = statement.value.value
+        return discovered
+
+    @staticmethod
+    def __countBindings(root_node):
+        """Number of places binding each name, anywhere in the module (locals and parameters included)"""
+        bindings = {}
+        for node in ast.walk(root_node):
+            names = []
+            if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+                names.append(node.id)
+            elif isinstance(node, ast.arg):
+                names.append(node.arg)
+            elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+                names.append(node.name)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                names.extend(node.names)
+            for name in names:
+                bindings[name] = bindings.get(name, 0) + 1
+        return bindings
@@ -0,0 +1,209 @@
+import ast
+
+class DeadCodeElimination():
+    """
+        Removes what the program never uses, after the other AST optimizations
+        and before any memory is allocated (the allocators only see what is
+        left, so unread variables get no storage at all):
+
+        - functions the top level cannot reach through the call graph
+        - statements following a return, break or continue
+        - stores whose value is never read (liveness, backwards through the
+          statements, to a fixpoint around loops), and statements computing
+          nothing, as long as they have no effect (no call but int(), no
+          division by a variable, which may stop the program)
+        - arrays never read: their elements are never stored
+
+        A global read by a function is live everywhere at the top level. The
+        tree is transformed in place.
+    """
+
+    def __init__(self, root_node) -> None:
+        self.root_node = root_node
+        self.functions = []     # names of the functions removed
+        self.stores = 0
+        self.unreachable = 0
+
+    def run(self):
+        self.__removeUnreachableFunctions()
+        functions = [s for s in self.root_node.body if isinstance(s, ast.FunctionDef)]
+        # a global read by a function is read by every call, wherever it is
+        pinned = set()
+        for function in functions:
+            pinned |= self.__reads(function) - self.__bound(function)
+        self.__removeUnreadArrays()
+
+        for function in functions:
+            function.body = self.__trim(function.body)
+            _, function.body = self.__live(function.body, set(), [], set(), True)
+        self.root_node.body = self.__trim(self.root_node.body)
+        topLevel = [s for s in self.root_node.body if not isinstance(s, ast.FunctionDef)]
+        _, kept = self.__live(topLevel, set(pinned), [], pinned, True)
+        kept = set(map(id, kept))
+        self.root_node.body = [s for s in self.root_node.body if isinstance(s, ast.FunctionDef) or id(s) in kept]
+        ast.fix_missing_locations(self.root_node)
+        return self.root_node
+
+    def report(self):
+        return (f'Dead code: removed {len(self.functions)} unreachable functions'
+                + (f' ({", ".join(self.functions)})' if self.functions else '')
+                + f', {self.stores} dead stores and useless statements, {self.unreachable} unreachable statements')
+
+    ####
+    ## Call graph
+    ####
+
+    def __removeUnreachableFunctions(self):
+        functions = {s.name: s for s in self.root_node.body if isinstance(s, ast.FunctionDef)}
+        reached = set()
+        pending = [s for s in self.root_node.body if not isinstance(s, ast.FunctionDef)]
+        while pending:
+            for name in self.__callees(pending.pop()):
+                if name in functions and name not in reached:
+                    reached.add(name)
+                    pending.append(functions[name])
+        for name, function in functions.items():
+            if name not in reached:
+                self.root_node.body.remove(function)
+                self.functions.append(name)
+
+    @staticmethod
+    def __callees(node):
+        return {n.func.id for n in ast.walk(node) if isinstance(n, ast.Call) and isinstance(n.func, ast.Name)}
+
+    ####
+    ## Liveness
+    ####
+
+    def __live(self, body, live, loops, pinned, remove):
+        """(variables live before body, statements kept) given those live after it.
+           loops holds the (head, exit) live sets of the enclosing loops, for continue and break"""
+        kept = []
+        for statement in reversed(body):
+            if isinstance(statement, ast.FunctionDef):
+                kept.append(statement)
+                continue
+            if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+                name = statement.targets[0].id
+                if name not in live and name not in pinned and self.__pure(statement.value):
+                    self.__removed(remove)
+                    continue
+                live = (live - {name}) | self.__uses(statement.value)
+            elif isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name):
+                name = statement.target.id
+                if name not in live and name not in pinned and self.__pure(statement.value):
+                    self.__removed(remove)
+                    continue
+                live = live | {name} | self.__uses(statement.value)
+            elif isinstance(statement, ast.Expr):
+                if self.__pure(statement.value):
+                    self.__removed(remove)
+                    continue
+                live = live | self.__uses(statement.value)
+            elif isinstance(statement, ast.Return):
+                live = set(pinned) | (self.__uses(statement.value) if statement.value is not None else set())
+            elif isinstance(statement, ast.Break):
+                live = set(loops[-1][1]) if loops else live
+            elif isinstance(statement, ast.Continue):
+                live = set(loops[-1][0]) if loops else live
+            elif isinstance(statement, ast.If):
+                liveBody, body = self.__live(statement.body, live, loops, pinned, remove)
+                liveElse, orelse = self.__live(statement.orelse, live, loops, pinned, remove)
+                if not body and not orelse and self.__pure(statement.test):
+                    self.__removed(remove)  # nothing left to choose between
+                    continue
+                if remove:
+                    statement.body, statement.orelse = body or [ast.Pass()], orelse
+                live = liveBody | liveElse | self.__uses(statement.test)
+            elif isinstance(statement, ast.While):
+                # what the test and the body read is live at the head, for the next iteration too
+                exit = live | self.__uses(statement.orelse)
+                head = exit | self.__uses(statement.test)
+                while True:
+                    liveBody, _ = self.__live(statement.body, head, loops + [(head, exit)], pinned, False)
+                    updated = head | liveBody
+                    if updated == head:
+                        break
+                    head = updated
+                if remove:
+                    _, body = self.__live(statement.body, head, loops + [(head, exit)], pinned, True)
+                    statement.body = body or [ast.Pass()]
+                live = head
+            else:
+                # stores into array elements, anything unknown: everything it reads is live
+                live = live | self.__uses(statement)
+            kept.append(statement)
+        kept.reverse()
+        return live, kept
+
+    def __removed(self, remove):
+        if remove:
+            self.stores += 1
+
+    ####
+    ## Unreachable statements and unread arrays
+    ####
+
+    def __trim(self, body):
+        """body without the statements after a return, break or continue"""
+        for i, statement in enumerate(body):
+            if isinstance(statement, (ast.If, ast.While)):
+                statement.body = self.__trim(statement.body)
+                statement.orelse = self.__trim(statement.orelse)
+            if isinstance(statement, (ast.Return, ast.Break, ast.Continue)) and i + 1 < len(body):
+                self.unreachable += len(body) - i - 1
+                return body[:i + 1]
+        return body
+
+    def __removeUnreadArrays(self):
+        """Drop the element stores of the arrays nothing reads: their definitions are then dead stores"""
+        stored = {id(n.targets[0].value) for n in ast.walk(self.root_node) if isinstance(n, ast.Assign)
+                  and isinstance(n.targets[0], ast.Subscript)}
+        read = {n.id for n in ast.walk(self.root_node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load) and id(n) not in stored}
+        def unread(statement):
+            if not (isinstance(statement, ast.Assign) and isinstance(statement.targets[0], ast.Subscript)):
+                return False
+            target = statement.targets[0]
+            return (isinstance(target.value, ast.Name) and target.value.id not in read
+                    and self.__pure(target.slice) and self.__pure(statement.value))
+        def walk(body):
+            kept = []
+            for statement in body:
+                if unread(statement):
+                    self.stores += 1
+                    continue
+                for field in ('body', 'orelse'):
+                    if isinstance(statement, (ast.If, ast.While, ast.FunctionDef)) and getattr(statement, field, None):
+                        setattr(statement, field, walk(getattr(statement, field)) or [ast.Pass()])
+                kept.append(statement)
+            return kept
+        self.root_node.body = walk(self.root_node.body)
+
+    ####
+    ## Helper functions
+    ####
+
+    @staticmethod
+    def __pure(node):
+        """Evaluating node has no effect besides its value"""
+        for n in ast.walk(node):
+            if isinstance(n, ast.Call) and not (isinstance(n.func, ast.Name) and n.func.id == 'int'):
+                return False
+            if isinstance(n, ast.BinOp) and isinstance(n.op, (ast.FloorDiv, ast.Mod)) and not (
+                    isinstance(n.right, ast.Constant) and n.right.value != 0):
+                return False
+        return True
+
+    @staticmethod
+    def __uses(node):
+        nodes = node if isinstance(node, list) else [node]
+        return {n.id for tree in nodes for n in ast.walk(tree) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+
+    @staticmethod
+    def __reads(function):
+        return {n.id for n in ast.walk(function) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+
+    @staticmethod
+    def __bound(function):
+        return {n.id for n in ast.walk(function) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)} | {
+            a.arg for a in function.args.args}
@@ -0,0 +1,206 @@
+import ast
+import copy
+
+BUILTINS = {'int', 'input', 'print', 'exit'}
+
+class FunctionInlining():
+    """
+        Replaces the calls of small leaf functions (functions calling no other
+        user function, hence never recursive) by their body, before any memory
+        is allocated:
+
+        - `x = f(a, b)`, `f(a, b)` and `return f(a, b)` statements are inlined
+        - the locals of f become fresh variables of the caller (globals at the
+          top level, locals of the caller's frame in a function); a parameter
+          bound to a variable or a constant and never assigned by f is
+          substituted, the others are copied first
+        - f is inlined when its body has at most `maxStatements` statements, or
+          when it is called once (the body then only moves)
+        - f may only return from its last statement
+        - a function whose calls have all been inlined is removed
+
+        Inlining can turn a caller into a leaf, so it runs until nothing
+        changes. The tree is transformed in place.
+    """
+
+    MAX_STATEMENTS = 6
+
+    def __init__(self, root_node, maxStatements = MAX_STATEMENTS) -> None:
+        self.root_node = root_node
+        self.maxStatements = maxStatements
+        self.inlined = 0
+        self.removed = []
+        self.__names = {n.id for n in ast.walk(root_node) if isinstance(n, ast.Name)} | {
+            n.arg for n in ast.walk(root_node) if isinstance(n, ast.arg)}
+
+    def run(self):
+        while True:
+            functions = {s.name: s for s in self.root_node.body if isinstance(s, ast.FunctionDef)}
+            calls = self.__countCalls(functions)
+            leaves = {name: f for name, f in functions.items()
+                      if self.__inlinable(f, functions) and (self.__size(f.body) <= self.maxStatements or calls[name] == 1)}
+            before = self.inlined
+            self.root_node.body = self.__inlineBody(self.root_node.body, None, leaves)
+            for function in functions.values():
+                function.body = self.__inlineBody(function.body, function, leaves)
+            if self.inlined == before:
+                break
+            # the functions all of whose calls are gone
+            remaining = self.__countCalls(functions)
+            for name in leaves:
+                if calls[name] and not remaining[name]:
+                    self.root_node.body.remove(functions[name])
+                    self.removed.append(name)
+        ast.fix_missing_locations(self.root_node)
+        return self.root_node
+
+    def report(self):
+        return f'Inlining: inlined {self.inlined} calls, removed {len(self.removed)} functions' + (
+            f' ({", ".join(self.removed)})' if self.removed else '')
+
+    ####
+    ## Call sites
+    ####
+
+    def __inlineBody(self, body, caller, leaves):
+        """body with the calls of leaves it makes as statements replaced by their body"""
+        result = []
+        for statement in body:
+            call, target = self.__callSite(statement)
+            callee = leaves.get(call.func.id) if call is not None else None
+            if callee is not None and callee is not caller and self.__fits(callee, call, caller, target, statement):
+                result.extend(self.__expand(callee, call, target, statement))
+                self.inlined += 1
+                continue
+            if isinstance(statement, (ast.While, ast.If)):
+                statement.body = self.__inlineBody(statement.body, caller, leaves)
+                statement.orelse = self.__inlineBody(statement.orelse, caller, leaves)
+            result.append(statement)
+        return result
+
+    @staticmethod
+    def __callSite(statement):
+        """(call, target) of `target = f(...)`, `f(...)` (target None) and `return f(...)` (target the Return)"""
+        value, target = None, None
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1:
+            value, target = statement.value, statement.targets[0]
+        elif isinstance(statement, ast.Expr):
+            value = statement.value
+        elif isinstance(statement, ast.Return):
+            value, target = statement.value, statement
+        if isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and not value.keywords:
+            return value, target
+        return None, None
+
+    def __fits(self, callee, call, caller, target, statement):
+        if len(call.args) != len(callee.args.args):
+            return False
+        value = self.__returned(callee)
+        if target is not None and value is None:
+            return False  # the caller uses a return value f never gives
+        if isinstance(statement, ast.Expr) and value is not None and any(isinstance(n, ast.Call) for n in ast.walk(value)):
+            return False  # a returned value with side effects, the caller drops
+        if caller is not None:
+            # the globals f reads must not be shadowed by the caller's variables
+            free = self.__reads(callee) - self.__bound(callee)
+            if free & self.__bound(caller):
+                return False
+        return True
+
+    def __expand(self, callee, call, target, statement):
+        bound = self.__bound(callee)
+        assigned = self.__assigned(callee)
+        mapping = {}
+        statements = []
+        for param, arg in zip([a.arg for a in callee.args.args], call.args):
+            if isinstance(arg, (ast.Name, ast.Constant)) and param not in assigned:
+                mapping[param] = arg
+            else:
+                mapping[param] = ast.Name(self.__fresh(param), ast.Load())
+                statements.append(ast.Assign([ast.Name(mapping[param].id, ast.Store())], arg))
+        for name in bound - set(mapping):
+            mapping[name] = ast.Name(self.__fresh(name), ast.Load())
+
+        body = Substitution(mapping).visit(ast.Module(copy.deepcopy(callee.body), [])).body
+        value = None
+        if body and isinstance(body[-1], ast.Return):
+            value = body.pop().value
+        statements.extend(body)
+        if isinstance(target, ast.Return):
+            statements.append(ast.Return(value))
+        elif target is not None:
+            statements.append(ast.Assign([target], value))
+        for new in statements:
+            ast.copy_location(new, statement)
+        return statements
+
+    ####
+    ## Helper functions
+    ####
+
+    def __inlinable(self, function, functions):
+        """A leaf, with positional parameters only, returning (if at all) from its last statement"""
+        arguments = function.args
+        if arguments.vararg or arguments.kwarg or arguments.kwonlyargs or arguments.defaults or arguments.posonlyargs:
+            return False
+        returns = [n for n in ast.walk(function) if isinstance(n, ast.Return)]
+        if returns and not (len(returns) == 1 and function.body[-1] is returns[0]):
+            return False
+        for node in ast.walk(function):
+            if node is not function and isinstance(node, (ast.FunctionDef, ast.Lambda, ast.Global, ast.Nonlocal)):
+                return False
+            if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id in functions
+                                               or node.func.id not in BUILTINS):
+                return False
+        return True
+
+    def __countCalls(self, functions):
+        calls = {name: 0 for name in functions}
+        for node in ast.walk(self.root_node):
+            if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in calls:
+                calls[node.func.id] += 1
+        return calls
+
+    def __size(self, body):
+        return sum(1 for statement in body for n in ast.walk(statement) if isinstance(n, ast.stmt))
+
+    @staticmethod
+    def __returned(function):
+        last = function.body[-1] if function.body else None
+        return last.value if isinstance(last, ast.Return) else None
+
+    @staticmethod
+    def __assigned(function):
+        return {n.id for n in ast.walk(function) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+
+    def __bound(self, function):
+        """Parameters and locals"""
+        return self.__assigned(function) | {a.arg for a in function.args.args}
+
+    @staticmethod
+    def __reads(function):
+        return {n.id for n in ast.walk(function) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+
+    def __fresh(self, name):
+        """A name used nowhere in the module"""
+        k = 1
+        while f'{name}_{k}' in self.__names:
+            k += 1
+        self.__names.add(f'{name}_{k}')
+        return f'{name}_{k}'
+
+
+class Substitution(ast.NodeTransformer):
+    """Replaces the names of a copied function body by the caller's variables or values"""
+
+    def __init__(self, mapping) -> None:
+        super().__init__()
+        self.mapping = mapping
+
+    def visit_Name(self, node):
+        if node.id not in self.mapping:
+            return node
+        replacement = self.mapping[node.id]
+        if isinstance(replacement, ast.Name):
+            return ast.copy_location(ast.Name(replacement.id, node.ctx), node)
+        return ast.copy_location(copy.deepcopy(replacement), node)
@@ -0,0 +1,188 @@
+import ast
+import copy
+
+class LoopIdioms():
+    """
+        Recognizes the loops computing a product by repeated addition or a
+        quotient by repeated subtraction, and replaces them by the operator,
+        compiled to the shift-and-add `__mul` or shift-subtract `__div` of
+        the runtime library (logarithmic instead of linear in the operands):
+
+            while b > 0:                    if b > 0:
+                r = r + a           ->          r = r + a * b
+                b = b - 1                       b = 0
+
+            while r >= d:                   if d > 0:
+                r = r - d                       if r >= d:
+                q = q + 1           ->              q = q + r // d
+                                                    r = r % d
+                                            else:
+                                                while r >= d: ...
+
+        Both statements may come in either order, as augmented assignments, and
+        `r = r - a` accumulates a negated product. a and d are variables or
+        constants distinct from the counters. Right after `r = 0`, the sum is
+        just `r = a * b`. A division by a variable keeps the loop for
+        d <= 0 (it never ends in Python); by a positive constant it needs no
+        guard. 16-bit words wrap the same way whether added b times or
+        multiplied. The tree is transformed in place.
+    """
+
+    def __init__(self, root_node) -> None:
+        self.root_node = root_node
+        self.products = 0
+        self.quotients = 0
+
+    def run(self):
+        self.root_node.body = self.__rewriteBody(self.root_node.body)
+        ast.fix_missing_locations(self.root_node)
+        return self.root_node
+
+    def report(self):
+        return f'Loop idioms: {self.products} repeated additions turned into products, {self.quotients} repeated subtractions into quotients'
+
+    ####
+    ## Statements
+    ####
+
+    def __rewriteBody(self, body):
+        rewritten = []
+        for statement in body:
+            if isinstance(statement, (ast.FunctionDef, ast.While, ast.If)):
+                statement.body = self.__rewriteBody(statement.body)
+                if not isinstance(statement, ast.FunctionDef):
+                    statement.orelse = self.__rewriteBody(statement.orelse)
+            replacement = None
+            if isinstance(statement, ast.While) and not statement.orelse and len(statement.body) == 2:
+                replacement = self.__product(statement, rewritten[-1] if rewritten else None)
+                if replacement is not None:
+                    self.products += 1
+                else:
+                    replacement = self.__quotient(statement)
+                    if replacement is not None:
+                        self.quotients += 1
+            if replacement is not None:
+                for new in replacement:
+                    ast.copy_location(new, statement)
+                rewritten.extend(replacement)
+            else:
+                rewritten.append(statement)
+        return rewritten
+
+    def __product(self, loop, previous):
+        """Statements replacing `while b > 0: r = r +/- a; b = b - 1`, None when loop is something else"""
+        counter = self.__positive(loop.test)
+        if counter is None:
+            return None
+        for step, accumulate in (loop.body, loop.body[::-1]):
+            if self.__update(step, counter) != (ast.Sub, 1):
+                continue
+            for name in self.__targets(accumulate):
+                operator, addend = self.__accumulation(accumulate, name)
+                if operator is None or not self.__distinct(addend, name, counter):
+                    continue
+                product = ast.BinOp(self.__load(addend), ast.Mult(), self.__load(counter))
+                if not (operator is ast.Add and self.__isZeroing(previous, name)):
+                    product = ast.BinOp(self.__load(name), operator(), product)
+                return [ast.If(loop.test, [self.__assign(name, product), self.__assign(counter, ast.Constant(0))], [])]
+        return None
+
+    def __quotient(self, loop):
+        """Statements replacing `while r >= d: r = r - d; q = q + 1`, None when loop is something else"""
+        test = loop.test
+        if not (isinstance(test, ast.Compare) and len(test.ops) == 1):
+            return None
+        left, op, right = test.left, type(test.ops[0]), test.comparators[0]
+        if op is ast.LtE:
+            left, op, right = right, ast.GtE, left
+        if op is not ast.GtE or not isinstance(left, ast.Name):
+            return None
+        remainder, divisor = left.id, right
+        for reduce, count in (loop.body, loop.body[::-1]):
+            operator, subtrahend = self.__accumulation(reduce, remainder)
+            if operator is not ast.Sub or ast.dump(subtrahend) != ast.dump(divisor):
+                continue
+            for quotient in self.__targets(count):
+                if self.__update(count, quotient) != (ast.Add, 1) or not self.__distinct(divisor, remainder, quotient):
+                    continue
+                # the quotient is computed first: it reads the remainder before it is reduced
+                division = ast.If(copy.deepcopy(test), [
+                    self.__assign(quotient, ast.BinOp(self.__load(quotient), ast.Add(), ast.BinOp(self.__load(remainder), ast.FloorDiv(), self.__load(divisor)))),
+                    self.__assign(remainder, ast.BinOp(self.__load(remainder), ast.Mod(), self.__load(divisor)))], [])
+                if isinstance(divisor, ast.Constant):
+                    return [division] if divisor.value > 0 else None
+                return [ast.If(ast.Compare(self.__load(divisor), [ast.Gt()], [ast.Constant(0)]), [division], [loop])]
+        return None
+
+    ####
+    ## Helper functions
+    ####
+
+    @staticmethod
+    def __positive(test):
+        """b of `b > 0`, `0 < b`, `b >= 1` or `1 <= b`, None otherwise"""
+        if not (isinstance(test, ast.Compare) and len(test.ops) == 1):
+            return None
+        left, op, right = test.left, type(test.ops[0]), test.comparators[0]
+        for name, op, bound in ((left, op, right), (right, {ast.Lt: ast.Gt, ast.LtE: ast.GtE}.get(op), left)):
+            if isinstance(name, ast.Name) and isinstance(bound, ast.Constant) and (op, bound.value) in ((ast.Gt, 0), (ast.GtE, 1)):
+                return name.id
+        return None
+
+    @staticmethod
+    def __targets(statement):
+        if isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name):
+            return [statement.targets[0].id]
+        if isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name):
+            return [statement.target.id]
+        return []
+
+    def __accumulation(self, statement, name):
+        """(operator, operand) of `name = name + x`, `name = x + name`, `name = name - x` or `name +=/-= x`"""
+        if name not in self.__targets(statement):
+            return None, None
+        if isinstance(statement, ast.AugAssign):
+            operator, operand = type(statement.op), statement.value
+        elif isinstance(statement.value, ast.BinOp):
+            value = statement.value
+            operator = type(value.op)
+            if isinstance(value.left, ast.Name) and value.left.id == name:
+                operand = value.right
+            elif operator is ast.Add and isinstance(value.right, ast.Name) and value.right.id == name:
+                operand = value.left
+            else:
+                return None, None
+        else:
+            return None, None
+        if operator not in (ast.Add, ast.Sub) or not isinstance(operand, (ast.Name, ast.Constant)):
+            return None, None
+        return operator, operand
+
+    def __update(self, statement, name):
+        """(operator, constant) when statement adds or subtracts a constant to name"""
+        operator, operand = self.__accumulation(statement, name)
+        if operator is None or not (isinstance(operand, ast.Constant) and type(operand.value) is int):
+            return None
+        return operator, operand.value
+
+    @staticmethod
+    def __distinct(operand, *names):
+        """operand is a constant, or a variable other than names"""
+        if isinstance(operand, ast.Constant):
+            return type(operand.value) is int
+        return isinstance(operand, ast.Name) and operand.id not in names and len(set(names)) == len(names)
+
+    @staticmethod
+    def __isZeroing(statement, name):
+        return (isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name)
+                and statement.targets[0].id == name and isinstance(statement.value, ast.Constant) and statement.value.value == 0)
+
+    @staticmethod
+    def __load(operand):
+        if isinstance(operand, str):
+            return ast.Name(operand, ast.Load())
+        return ast.Name(operand.id, ast.Load()) if isinstance(operand, ast.Name) else ast.Constant(operand.value)
+
+    @staticmethod
+    def __assign(name, value):
+        return ast.Assign([ast.Name(name, ast.Store())], value)
@@ -0,0 +1,357 @@
+import ast
+from collections import Counter
+
+from optimizers.ConstantFolding import wrap
+
+class LoopOptimization():
+    """
+        Moves work out of while loops, innermost loops first, before any
+        memory is allocated:
+
+        - copies: after `x = y`, the following reads of x read y, until either
+          is assigned again (the inlined `mult(p, p)` copies p to its parameter
+          before multiplying it by itself)
+        - strength reduction: a product of an induction variable i (assigned
+          once in the loop, by `i = i +/- c`) with an invariant, or with
+          itself, becomes a temporary t set in the preheader and updated
+          right after i is stepped: `t = t + c * k`, or for `i * i`
+          `t = t + 2c * i - c * c`, so the loop no longer calls `__mul` (when
+          2c is not a power of two, 2c * i is kept in a temporary as well)
+        - invariants: expressions whose variables the loop never assigns are
+          computed once in the preheader, into a fresh temporary
+
+        The preheader is the code right before the loop: it runs even when the
+        loop does not, so only expressions that cannot fail are moved (no
+        calls, no array elements, no division by a variable). On Pep/9 every
+        operand is read from memory, a variable or a temporary alike: loads
+        themselves cannot be hoisted into registers, only the computations.
+        Every change is described in `log`. The tree is transformed in place.
+    """
+
+    def __init__(self, root_node) -> None:
+        self.root_node = root_node
+        self.log = []
+        self.copies = 0
+        self.reduced = 0
+        self.hoisted = 0
+        self.__temporaries = set()
+        self.__names = {n.id for n in ast.walk(root_node) if isinstance(n, ast.Name)} | {
+            n.arg for n in ast.walk(root_node) if isinstance(n, ast.arg)}
+
+    def run(self):
+        if any(isinstance(n, (ast.Global, ast.Nonlocal)) for n in ast.walk(self.root_node)):
+            return self.root_node  # a call could then change any variable
+        bodies = [self.root_node.body] + [s.body for s in self.root_node.body if isinstance(s, ast.FunctionDef)]
+        for body in bodies:
+            self.__propagateCopies(body)
+        self.root_node.body = self.__optimizeBody(self.root_node.body)
+        ast.fix_missing_locations(self.root_node)
+        return self.root_node
+
+    def report(self):
+        return (f'Loop optimization: propagated {self.copies} copies, strength-reduced {self.reduced} products, '
+                f'hoisted {self.hoisted} invariant expressions')
+
+    ####
+    ## Copy propagation
+    ####
+
+    def __propagateCopies(self, body):
+        for i, statement in enumerate(body):
+            for nested in self.__bodies(statement):
+                self.__propagateCopies(nested)
+            if (isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name)
+                    and isinstance(statement.value, ast.Name) and statement.targets[0].id != statement.value.id):
+                self.__substitute(body[i + 1:], statement.targets[0].id, statement.value.id)
+
+    def __substitute(self, body, copy, original):
+        """Replace the reads of copy by original in body, as long as neither is assigned. False once one is"""
+        for statement in body:
+            if isinstance(statement, ast.FunctionDef):
+                continue  # runs later, when called
+            if isinstance(statement, (ast.Break, ast.Continue)):
+                return False
+            if isinstance(statement, ast.While):
+                if {copy, original} & self.__assigned(statement):
+                    return False  # the test and the body also run after the next iterations assigned them
+                self.__replace(statement, copy, original)
+                continue
+            if isinstance(statement, ast.If):
+                self.__replace(statement.test, copy, original)
+                # both branches are substituted, the statements after the if only when neither assigns
+                body = self.__substitute(statement.body, copy, original)
+                orelse = self.__substitute(statement.orelse, copy, original)
+                if not (body and orelse):
+                    return False
+                continue
+            if isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name) and statement.target.id == copy:
+                return False  # reads the copy as its target
+            if getattr(statement, 'value', None) is not None:
+                self.__replace(statement.value, copy, original)
+            if isinstance(statement, ast.Assign) and isinstance(statement.targets[0], ast.Subscript):
+                self.__replace(statement.targets[0].slice, copy, original)
+            if {copy, original} & self.__assigned(statement):
+                return False
+        return True
+
+    def __replace(self, node, copy, original):
+        for n in ast.walk(node):
+            if isinstance(n, ast.Name) and n.id == copy and isinstance(n.ctx, ast.Load):
+                n.id = original
+                self.copies += 1
+
+    ####
+    ## Loops
+    ####
+
+    def __optimizeBody(self, body):
+        optimized = []
+        for statement in body:
+            for field in ('body', 'orelse'):
+                if isinstance(getattr(statement, field, None), list):
+                    setattr(statement, field, self.__optimizeBody(getattr(statement, field)))
+            if isinstance(statement, ast.While):
+                # one walk of the loop, both passes then keep its counts of assignments up to date
+                stores, inductions, products = self.__scan(statement)
+                preheader = self.__reduce(statement, stores, inductions, products) + self.__hoist(statement, stores)
+                for new in preheader:
+                    ast.copy_location(new, statement)
+                optimized.extend(preheader)
+            optimized.append(statement)
+        return optimized
+
+    def __reduce(self, loop, stores, inductions, products):
+        """Strength-reduce the products of the induction variables of loop, returns the preheader statements"""
+        preheader = []
+        readings = {}   # id of a product -> the temporary it is read from
+        updates = {}    # id of a step -> the statements updating the temporaries after it
+        for name, update, step in inductions:
+            for other, nodes in products[name].values():
+                temporary = self.__fresh('ind')
+                square = isinstance(other, ast.Name) and other.id == name
+                preheader.append(self.__assign(temporary, ast.BinOp(ast.Name(name, ast.Load()), ast.Mult(), self.__copy(other))))
+                if square:
+                    # (i + c)^2 = i^2 + 2c * (i + c) - c^2, with i + c the new value
+                    increment = ast.BinOp(ast.Name(name, ast.Load()), ast.Mult(), ast.Constant(2 * abs(step)))
+                    if (2 * abs(step)) & (2 * abs(step) - 1):
+                        # not a shift: 2|c| * i is kept in a temporary too, stepped by 2|c| * c before the square
+                        double = self.__fresh('ind')
+                        preheader.append(self.__assign(double, increment))
+                        updates.setdefault(id(update), []).append(self.__assign(double, self.__plus(double, wrap(2 * abs(step) * step))))
+                        stores[double] += 1
+                        self.__temporaries.add(double)
+                        increment = ast.Name(double, ast.Load())
+                    value = ast.BinOp(ast.BinOp(ast.Name(temporary, ast.Load()), ast.Add() if step > 0 else ast.Sub(), increment),
+                                      ast.Sub(), ast.Constant(wrap(step * step)))
+                elif isinstance(other, ast.Constant):
+                    value = self.__plus(temporary, wrap(step * other.value))
+                elif abs(step) == 1:
+                    value = ast.BinOp(ast.Name(temporary, ast.Load()), ast.Add() if step > 0 else ast.Sub(), self.__copy(other))
+                else:
+                    delta = self.__fresh('ind')
+                    preheader.append(self.__assign(delta, ast.BinOp(self.__copy(other), ast.Mult(), ast.Constant(step))))
+                    self.__temporaries.add(delta)
+                    value = ast.BinOp(ast.Name(temporary, ast.Load()), ast.Add(), ast.Name(delta, ast.Load()))
+                # the products are read from the temporary, then it follows the steps of the variable
+                readings.update((id(node), temporary) for node in nodes)
+                updates.setdefault(id(update), []).append(self.__assign(temporary, value))
+                stores[temporary] += 1
+                self.reduced += 1
+                self.__temporaries.add(temporary)
+                self.log.append(f'line {loop.lineno}: {name} * {ast.unparse(other)} kept in {temporary}, '
+                                f'updated when {name} is stepped by {step}')
+        if readings:
+            reading = Reading(readings)
+            loop.test = reading.visit(loop.test)
+            loop.body = [reading.visit(statement) for statement in loop.body]
+            self.__insertAfter(loop, updates)
+        return preheader
+
+    def __hoist(self, loop, stores):
+        """Move the invariant computations of loop to its preheader, returns the preheader statements"""
+        preheader = []
+        # temporaries set in the preheaders of inner loops may be invariant here too
+        while True:
+            moved = self.__extract(loop, lambda s: (isinstance(s, ast.Assign) and isinstance(s.targets[0], ast.Name)
+                                                    and s.targets[0].id in self.__temporaries
+                                                    and stores[s.targets[0].id] == 1
+                                                    and self.__invariant(s.value, stores)))
+            if not moved:
+                break
+            preheader.extend(moved)
+            for statement in moved:
+                del stores[statement.targets[0].id]
+                self.log.append(f'line {loop.lineno}: {statement.targets[0].id} = {ast.unparse(statement.value)} moved out of the loop')
+        hoisting = Hoisting(lambda node: self.__invariant(node, stores) and isinstance(node, ast.BinOp), self.__fresh)
+        loop.test = hoisting.visit(loop.test)
+        loop.body = [hoisting.visit(statement) for statement in loop.body]
+        for temporary, value in hoisting.temporaries:
+            preheader.append(self.__assign(temporary, value))
+            self.__temporaries.add(temporary)
+            self.hoisted += 1
+            self.log.append(f'line {loop.lineno}: {ast.unparse(value)} computed once before the loop, in {temporary}')
+        return preheader
+
+    ####
+    ## Helper functions
+    ####
+
+    def __scan(self, loop):
+        """How many times loop assigns each variable, its induction variables (name, update statement, step):
+           the variables it only assigns with `i = i +/- c` or `i +/-= c`, and their products worth reducing,
+           {name: {dump of the other factor: (other factor, [products])}}"""
+        stores = Counter()
+        subscripted = set()
+        steps = []
+        multiplications = []
+        for node in ast.walk(loop):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                stores[node.id] += 1
+            elif isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+                subscripted.add(node.value.id)
+            elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+                multiplications.append(node)
+            elif self.__step(node) is not None:
+                steps.append((node.targets[0].id if isinstance(node, ast.Assign) else node.target.id, node, self.__step(node)))
+        inductions = [(name, node, step) for name, node, step in steps
+                      if stores[name] == 1 and name not in subscripted and name not in self.__temporaries]
+        # a product has at most one induction variable as factor
+        products = {name: {} for name, _, _ in inductions}
+        for node in multiplications:
+            factor = self.__factor(node, products, stores)
+            if factor is not None:
+                name, other = factor
+                products[name].setdefault(ast.dump(other), (other, []))[1].append(node)
+        return stores, inductions, products
+
+    @staticmethod
+    def __step(statement):
+        """c of `i = i + c`, -c of `i = i - c` (and `i += c`, `i -= c`), None for any other statement"""
+        if isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name):
+            op, value = statement.op, statement.value
+        elif (isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name)
+                and isinstance(statement.value, ast.BinOp) and isinstance(statement.value.left, ast.Name)
+                and statement.value.left.id == statement.targets[0].id):
+            op, value = statement.value.op, statement.value.right
+        else:
+            return None
+        if not (isinstance(value, ast.Constant) and type(value.value) is int and value.value != 0):
+            return None
+        if isinstance(op, ast.Add):
+            return value.value
+        if isinstance(op, ast.Sub):
+            return -value.value
+        return None
+
+    def __factor(self, product, inductions, assigned):
+        """(name, other factor) of a product of an induction variable worth reducing, the other factor being
+           an invariant variable, a constant that is not a power of two, or name; None for any other product"""
+        for factor, other in ((product.left, product.right), (product.right, product.left)):
+            if not (isinstance(factor, ast.Name) and factor.id in inductions):
+                continue
+            name = factor.id
+            if isinstance(other, ast.Name) and (other.id == name or other.id not in assigned):
+                return name, other
+            if isinstance(other, ast.Constant) and type(other.value) is int and other.value > 0 and other.value & (other.value - 1):
+                return name, other  # powers of two are shifts already
+        return None
+
+    def __invariant(self, node, assigned):
+        """node computes the same value in every iteration, and cannot fail"""
+        for n in ast.walk(node):
+            if isinstance(n, (ast.Call, ast.Subscript, ast.List, ast.Compare, ast.BoolOp)):
+                return False
+            if isinstance(n, ast.Name) and n.id in assigned:
+                return False
+            if isinstance(n, ast.BinOp) and isinstance(n.op, (ast.FloorDiv, ast.Mod)) and not (
+                    isinstance(n.right, ast.Constant) and n.right.value != 0):
+                return False
+            if isinstance(n, ast.BinOp) and not isinstance(n.op, (ast.Add, ast.Sub, ast.Mult, ast.FloorDiv, ast.Mod)):
+                return False
+        return True
+
+    def __extract(self, loop, predicate):
+        """Remove the statements matching predicate from the bodies of loop, returns them"""
+        extracted = []
+        def walk(body):
+            kept = []
+            for statement in body:
+                if predicate(statement):
+                    extracted.append(statement)
+                    continue
+                for nested in self.__bodies(statement):
+                    nested[:] = walk(nested)
+                kept.append(statement)
+            return kept
+        loop.body = walk(loop.body)
+        return extracted
+
+    def __insertAfter(self, loop, updates):
+        """Insert the statements of updates right after the statement of loop whose id they are keyed by"""
+        for body in [loop.body] + [b for n in ast.walk(loop) if n is not loop for b in self.__bodies(n)]:
+            if any(id(s) in updates for s in body):
+                body[:] = [new for s in body for new in [s] + [ast.copy_location(n, s) for n in updates.get(id(s), [])]]
+
+    @staticmethod
+    def __bodies(statement):
+        if isinstance(statement, (ast.If, ast.While)):
+            return [statement.body, statement.orelse]
+        return []
+
+    @staticmethod
+    def __assigned(node):
+        return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+
+    def __plus(self, name, constant):
+        if constant < 0:
+            return ast.BinOp(ast.Name(name, ast.Load()), ast.Sub(), ast.Constant(-constant))
+        return ast.BinOp(ast.Name(name, ast.Load()), ast.Add(), ast.Constant(constant))
+
+    @staticmethod
+    def __copy(node):
+        return ast.Name(node.id, ast.Load()) if isinstance(node, ast.Name) else ast.Constant(node.value)
+
+    @staticmethod
+    def __assign(name, value):
+        return ast.Assign([ast.Name(name, ast.Store())], value)
+
+    def __fresh(self, name):
+        """A name used nowhere in the module"""
+        k = 1
+        while f'{name}{k}' in self.__names:
+            k += 1
+        self.__names.add(f'{name}{k}')
+        return f'{name}{k}'
+
+
+class Hoisting(ast.NodeTransformer):
+    """Replaces the largest invariant expressions by temporaries, the same expression by the same temporary"""
+
+    def __init__(self, invariant, fresh) -> None:
+        super().__init__()
+        self.invariant = invariant
+        self.fresh = fresh
+        self.temporaries = []   # (name, expression) to compute before the loop
+        self.__known = {}
+
+    def visit_BinOp(self, node):
+        if not self.invariant(node):
+            return self.generic_visit(node)
+        key = ast.dump(node)
+        if key not in self.__known:
+            self.__known[key] = self.fresh('inv')
+            self.temporaries.append((self.__known[key], node))
+        return ast.copy_location(ast.Name(self.__known[key], ast.Load()), node)
+
+
+class Reading(ast.NodeTransformer):
+    """Replaces some nodes (strength-reduced products) by the reads of their variables"""
+
+    def __init__(self, names) -> None:
+        super().__init__()
+        self.names = names      # id of a node -> variable read instead
+
+    def visit_BinOp(self, node):
+        if id(node) in self.names:
+            return ast.copy_location(ast.Name(self.names[id(node)], ast.Load()), node)
+        return self.generic_visit(node)
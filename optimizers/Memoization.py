@@ -0,0 +1,196 @@
+import ast
+
+from optimizers.FunctionInlining import BUILTINS
+
+class Memoization():
+    """
+        Caches the results of pure recursive functions of one integer, so that
+        `fib(n)` calling `fib(n - 1)` and `fib(n - 2)` runs in linear time.
+        Opt-in: a call is only skipped when its result is known, but the tables
+        take static memory.
+
+        Every memoized f gets two global arrays of `entries` words, allocated
+        like any other global (see StaticMemoryAllocation): the results, and
+        their valid bits. For an argument in [0, entries):
+
+            def f(n):
+                if 0 <= n < 64 and f_ok1[n] != 0:
+                    return f_tbl1[n]
+                ...
+                f_val1 = e              # every `return e`
+                if 0 <= n < 64:
+                    f_tbl1[n] = f_val1
+                    f_ok1[n] = 1
+                return f_val1
+
+        f is pure when it has one positional parameter, returns a value on
+        every path, and reads nothing but its parameter, its locals and
+        constant globals: no array, no input/print/exit, no call but to
+        itself or another pure function. Only functions calling themselves more
+        than once are memoized (a single recursive call is better left to
+        TailRecursion, which runs first). The tree is transformed in place.
+    """
+
+    ENTRIES = 64
+
+    def __init__(self, root_node, entries = ENTRIES) -> None:
+        self.root_node = root_node
+        self.entries = entries
+        self.memoized = []
+        self.__names = {n.id for n in ast.walk(root_node) if isinstance(n, ast.Name)} | {
+            n.arg for n in ast.walk(root_node) if isinstance(n, ast.arg)}
+
+    def run(self):
+        functions = {s.name: s for s in self.root_node.body if isinstance(s, ast.FunctionDef)}
+        constants = self.__constantGlobals()
+        # a pure function may call other pure functions: drop the impure ones until none is left
+        pure = {name for name, f in functions.items() if self.__pureBody(f, constants)}
+        while True:
+            impure = {name for name in pure if not all(callee in pure for callee in self.__callees(functions[name]))}
+            if not impure:
+                break
+            pure -= impure
+
+        tables = []
+        for name, function in functions.items():
+            # one recursive call computes each value once anyway, the tables would only cost
+            recursive = [n for n in ast.walk(function) if isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id == name]
+            if name in pure and len(recursive) > 1:
+                tables.extend(self.__memoize(function))
+                self.memoized.append(name)
+        # the tables are globals, defined before anything can call the functions
+        self.root_node.body = tables + self.root_node.body
+        ast.fix_missing_locations(self.root_node)
+        return self.root_node
+
+    def report(self):
+        return f'Memoization: {len(self.memoized)} functions cached in tables of {self.entries} entries' + (
+            f' ({", ".join(self.memoized)})' if self.memoized else '')
+
+    ####
+    ## Transformation
+    ####
+
+    def __memoize(self, function):
+        """Rewrite function around its tables, returns the assignments defining them"""
+        name = function.name
+        table = self.__fresh(f'{name[:4]}_tbl')
+        valid = self.__fresh(f'{name[:4]}_ok')
+        param = function.args.args[0].arg
+        key = param
+        prologue = [ast.If(ast.BoolOp(ast.And(), [self.__inTable(param), self.__compare(ast.Subscript(
+                         ast.Name(valid, ast.Load()), ast.Name(param, ast.Load()), ast.Load()), ast.NotEq(), 0)]),
+                         [ast.Return(self.__element(table, param, ast.Load()))], [])]
+        if param in self.__assigned(function):
+            # the body changes the parameter: remember the argument the result is stored for
+            key = self.__fresh(f'{name[:4]}_key')
+            prologue.append(self.__assign(ast.Name(key, ast.Store()), ast.Name(param, ast.Load())))
+
+        result = self.__fresh(f'{name[:4]}_val')
+        function.body = prologue + self.__rewrite(function.body, table, valid, key, result)
+        # [0] * entries: all invalid
+        return [self.__assign(ast.Name(array, ast.Store()), ast.BinOp(ast.List([ast.Constant(0)], ast.Load()), ast.Mult(), ast.Constant(self.entries)))
+                for array in (table, valid)]
+
+    def __rewrite(self, body, table, valid, key, result):
+        rewritten = []
+        for statement in body:
+            if isinstance(statement, ast.Return):
+                value = statement.value
+                if not isinstance(value, (ast.Name, ast.Constant)):
+                    # evaluated once, stored then returned
+                    rewritten.append(ast.copy_location(self.__assign(ast.Name(result, ast.Store()), value), statement))
+                    value = ast.Name(result, ast.Load())
+                rewritten.append(ast.If(self.__inTable(key), [
+                    self.__assign(self.__element(table, key, ast.Store()), value),
+                    self.__assign(self.__element(valid, key, ast.Store()), ast.Constant(1))], []))
+                rewritten.append(ast.copy_location(ast.Return(value), statement))
+                continue
+            if isinstance(statement, (ast.If, ast.While)):
+                statement.body = self.__rewrite(statement.body, table, valid, key, result)
+                statement.orelse = self.__rewrite(statement.orelse, table, valid, key, result)
+            rewritten.append(statement)
+        return rewritten
+
+    ####
+    ## Recognizing pure functions
+    ####
+
+    def __pureBody(self, function, constants):
+        """function alone is pure, assuming the functions it calls are"""
+        arguments = function.args
+        if (len(arguments.args) != 1 or arguments.vararg or arguments.kwarg or arguments.kwonlyargs
+                or arguments.defaults or arguments.posonlyargs):
+            return False
+        if not self.__alwaysReturns(function.body):
+            return False
+        bound = self.__assigned(function) | {arguments.args[0].arg}
+        called = [n.func for n in ast.walk(function) if isinstance(n, ast.Call)]
+        for node in ast.walk(function):
+            if node is not function and isinstance(node, (ast.FunctionDef, ast.Lambda, ast.Global, ast.Nonlocal)):
+                return False
+            if isinstance(node, (ast.Subscript, ast.List)):
+                return False  # arrays may change between two calls
+            if isinstance(node, ast.Return) and node.value is None:
+                return False
+            if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id not in BUILTINS - {'int'}
+                                                   and not node.keywords):
+                return False  # input/print/exit have effects
+            if (isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load) and node.id not in bound
+                    and node.id not in constants and not any(node is f for f in called)):
+                return False  # a global that may change
+        return True
+
+    def __alwaysReturns(self, body):
+        if not body:
+            return False
+        last = body[-1]
+        if isinstance(last, ast.Return):
+            return True
+        return isinstance(last, ast.If) and self.__alwaysReturns(last.body) and self.__alwaysReturns(last.orelse)
+
+    def __constantGlobals(self):
+        """Globals assigned exactly once, at the top level, with a constant"""
+        stores = {}
+        for node in ast.walk(self.root_node):
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+                stores[node.id] = stores.get(node.id, 0) + 1
+        return {s.targets[0].id for s in self.root_node.body
+                if isinstance(s, ast.Assign) and len(s.targets) == 1 and isinstance(s.targets[0], ast.Name)
+                and isinstance(s.value, ast.Constant) and stores[s.targets[0].id] == 1}
+
+    @staticmethod
+    def __callees(function):
+        return {n.func.id for n in ast.walk(function) if isinstance(n, ast.Call) and isinstance(n.func, ast.Name)} - BUILTINS
+
+    ####
+    ## Helper functions
+    ####
+
+    @staticmethod
+    def __assigned(function):
+        return {n.id for n in ast.walk(function) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Store)}
+
+    def __inTable(self, key):
+        """0 <= key < entries"""
+        return ast.Compare(ast.Constant(0), [ast.LtE(), ast.Lt()], [ast.Name(key, ast.Load()), ast.Constant(self.entries)])
+
+    @staticmethod
+    def __compare(left, op, value):
+        return ast.Compare(left, [op], [ast.Constant(value)])
+
+    @staticmethod
+    def __element(array, key, ctx):
+        return ast.Subscript(ast.Name(array, ast.Load()), ast.Name(key, ast.Load()), ctx)
+
+    @staticmethod
+    def __assign(target, value):
+        return ast.Assign([target], value)
+
+    def __fresh(self, name):
+        """A name used nowhere in the module"""
+        k = 1
+        while f'{name}{k}' in self.__names:
+            k += 1
+        self.__names.add(f'{name}{k}')
+        return f'{name}{k}'
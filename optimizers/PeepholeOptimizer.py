@@ -0,0 +1,196 @@
+from collections import Counter
+
+LabeledInstruction = tuple[str, str]
+
+UNCONDITIONAL = {'BR'}
+CONDITIONAL = {'BRLE', 'BRLT', 'BREQ', 'BRNE', 'BRGE', 'BRGT', 'BRV', 'BRC'}
+
+class PeepholeOptimizer():
+    """
+        Rewrites the (label, instruction) list produced by TopLevelProgram.finalize()
+        before EntryPoint prints it. Every rule can be switched off by leaving it
+        out of `rules`:
+
+        - merge_labels:    NOP1 label sentinels are dropped, their label moves to the
+                           next instruction (labels on the same instruction are merged)
+        - store_load:      `STWA v,m` followed by `LDWA v,m` keeps the value in A
+        - jump_threading:  a branch to an unconditional `BR` goes straight to its target
+        - branch_to_next:  a branch to the instruction right after it is removed
+        - unreachable:     unlabeled instructions after an unconditional `BR` are removed
+
+        Labels listed in `keep` (the entry point, referenced from outside the
+        list) are never renamed away.
+
+        Every rule is one sweep building a new list. While the rules run, an
+        instruction carries all the labels merged onto it; optimize() then
+        keeps one label per instruction and rewrites the operands naming the
+        others in a single pass, so the whole optimization stays linear in the
+        number of instructions.
+    """
+
+    RULES = ('merge_labels', 'store_load', 'jump_threading', 'branch_to_next', 'unreachable')
+
+    def __init__(self, instructions: list[LabeledInstruction], rules = RULES, keep = ('tl',)) -> None:
+        self.__instructions = [[[label] if label is not None else [], instr] for label, instr in instructions]
+        self.__rules = set(rules)
+        self.__keep = set(keep)
+        unknown = self.__rules - set(self.RULES)
+        if unknown:
+            raise ValueError(f'Unknown peephole rules: {", ".join(sorted(unknown))}')
+        self.applied = Counter()
+        self.removed = 0
+
+    def optimize(self):
+        before = len(self.__instructions)
+        changed = True
+        while changed:  # rules feed each other, run them until nothing changes
+            changed = False
+            for rule in self.RULES:
+                if rule in self.__rules:
+                    changed = getattr(self, f'_PeepholeOptimizer__{rule}')() or changed
+        instructions = self.__resolveLabels()
+        self.removed = before - len(instructions)
+        return instructions
+
+    def report(self):
+        details = ', '.join(f'{rule} {count}' for rule, count in sorted(self.applied.items()))
+        return f'Peephole: removed {self.removed} instructions' + (f' (rewrites: {details})' if details else '')
+
+    ####
+    ## Rules, each returns True when it changed the list
+    ####
+
+    def __merge_labels(self):
+        def sentinel(i, labels, instr):
+            return instr == 'NOP1' and self.__canRemove(i)
+        return self.__sweep('merge_labels', sentinel)
+
+    def __store_load(self):
+        kept = []
+        count = 0
+        instructions = self.__instructions
+        for i, entry in enumerate(instructions):
+            labels, second = entry
+            if kept and not labels and second[:4] in ('LDWA', 'STWA'):
+                first = kept[-1][1]
+                pair = (self.__mnemonic(first), self.__mnemonic(second))
+                if pair in (('STWA', 'LDWA'), ('LDWA', 'STWA')) and self.__operand(first) == self.__operand(second):
+                    following = instructions[i + 1][1] if i + 1 < len(instructions) else ''
+                    # LDWA sets N and Z: keep it when a conditional branch reads them
+                    if (pair == ('STWA', 'LDWA') and self.__mnemonic(following) not in CONDITIONAL
+                            or pair == ('LDWA', 'STWA') and not self.__operand(first).endswith(',i')):
+                        count += 1
+                        continue
+            kept.append(entry)
+        return self.__replace('store_load', kept, count)
+
+    def __jump_threading(self):
+        changed = False
+        targets = self.__labelIndex()
+        for entry in self.__instructions:
+            mnemonic = self.__mnemonic(entry[1])
+            if mnemonic not in UNCONDITIONAL | CONDITIONAL:
+                continue
+            target = self.__operand(entry[1])
+            seen = {target}
+            # follow chains of BR, stopping on cycles
+            while target in targets and self.__mnemonic(self.__instructions[targets[target]][1]) == 'BR':
+                following = self.__operand(self.__instructions[targets[target]][1])
+                if following in seen:
+                    break
+                seen.add(following)
+                target = following
+            if target != self.__operand(entry[1]):
+                entry[1] = f'{mnemonic} {target}'
+                self.applied['jump_threading'] += 1
+                changed = True
+        return changed
+
+    def __branch_to_next(self):
+        instructions = self.__instructions
+        def toNext(i, labels, instr):
+            return (self.__mnemonic(instr) in UNCONDITIONAL | CONDITIONAL and i + 1 < len(instructions)
+                    and self.__operand(instr) in instructions[i + 1][0] and self.__canRemove(i))
+        return self.__sweep('branch_to_next', toNext)
+
+    def __unreachable(self):
+        kept = []
+        count = 0
+        for labels, instr in self.__instructions:
+            if kept and self.__mnemonic(kept[-1][1]) in UNCONDITIONAL and not labels and not instr.startswith('.'):
+                count += 1
+                continue
+            kept.append([labels, instr])
+        return self.__replace('unreachable', kept, count)
+
+    ####
+    ## Helper functions
+    ####
+
+    def __sweep(self, rule, removable):
+        """Drop the instructions removable(i, labels, instr) selects, their labels moving to the next instruction"""
+        instructions = self.__instructions
+        kept = []
+        count = 0
+        for i, entry in enumerate(instructions):
+            labels, instr = entry
+            if removable(i, labels, instr):
+                if labels:
+                    instructions[i + 1][0] = labels + instructions[i + 1][0]
+                count += 1
+                continue
+            kept.append(entry)
+        return self.__replace(rule, kept, count)
+
+    def __canRemove(self, i):
+        """Instruction i can go, its labels (if any) moving to the next instruction"""
+        labels = self.__instructions[i][0]
+        if not labels:
+            return True
+        if i + 1 >= len(self.__instructions):
+            return False
+        next_labels, next_instr = self.__instructions[i + 1]
+        if next_instr.startswith('.'):  # directives such as .END cannot carry a label
+            return False
+        # one label per instruction in the listing: two labels used from outside cannot merge
+        return not (self.__keep.intersection(labels) and self.__keep.intersection(next_labels))
+
+    def __replace(self, rule, kept, count):
+        if not count:
+            return False
+        self.__instructions = kept
+        self.applied[rule] += count
+        return True
+
+    def __resolveLabels(self):
+        """(label, instruction) pairs: every instruction keeps one of its labels, operands naming the others are rewritten"""
+        alias = {}
+        resolved = []
+        for labels, instr in self.__instructions:
+            label = None
+            if labels:
+                label = next((l for l in labels if l in self.__keep), labels[-1])
+                for other in labels:
+                    alias[other] = label
+            resolved.append((label, instr))
+        if len(alias) == sum(1 for label, _ in resolved if label is not None):
+            return resolved  # no label was merged away
+        rewritten = []
+        for label, instr in resolved:
+            spec, comma, mode = self.__operand(instr).partition(',')
+            if alias.get(spec, spec) != spec:
+                instr = f'{self.__mnemonic(instr)} {alias[spec]}{comma}{mode}'
+            rewritten.append((label, instr))
+        return rewritten
+
+    def __labelIndex(self):
+        return {label: i for i, (labels, _) in enumerate(self.__instructions) for label in labels}
+
+    @staticmethod
+    def __mnemonic(instr):
+        return instr.split(None, 1)[0] if instr else ''
+
+    @staticmethod
+    def __operand(instr):
+        parts = instr.split(None, 1)
+        return parts[1].strip() if len(parts) > 1 else ''
@@ -0,0 +1,105 @@
+import ast
+
+class Induction():
+    """A variable kept in X for the whole of one loop"""
+
+    def __init__(self, name, update, operator, step) -> None:
+        self.name = name            # source name of the variable
+        self.update = update        # the ast.Assign/ast.AugAssign stepping it, compiled to ADDX/SUBX
+        self.operator = operator    # ast.Add or ast.Sub
+        self.step = step            # constant or variable added or subtracted
+        self.inTest = False         # compared by the loop condition, compiled to CPWX
+        self.writeThrough = False   # read elsewhere in the loop: memory is updated with every step
+
+    def __repr__(self) -> str:
+        return f'Induction({self.name!r}, inTest={self.inTest}, writeThrough={self.writeThrough})'
+
+
+class RegisterAllocation():
+    """
+        Finds the induction variable of every innermost while loop, the
+        variable stepped by exactly one `v = v + step` / `v = v - step` (or
+        `v += step`) statement of its body, and assigns it to X:
+
+        - X is loaded once before the loop, compared with CPWX by the condition
+          and stepped with ADDX/SUBX
+        - when nothing else in the loop reads the variable, memory is only
+          written back at the loop exit (or before a return); otherwise every
+          step is written through with STWX
+        - around the calls of user functions (which may use X or read the
+          variable) X is spilled before and reloaded after
+
+        Loops using X for something else (array elements, array literals) keep
+        all their variables in memory. Like LoopNesting the result is a side
+        table keyed by loop node, nothing is attached to the tree.
+    """
+
+    def __init__(self, root_node) -> None:
+        self.__loops = {}
+        for node in ast.walk(root_node):
+            if isinstance(node, ast.While):
+                induction = self.__allocate(node)
+                if induction is not None:
+                    self.__loops[node] = induction
+
+    def variable(self, loop):
+        """Induction of loop, None when all its variables stay in memory"""
+        return self.__loops.get(loop)
+
+    def report(self):
+        inTest = sum(induction.inTest for induction in self.__loops.values())
+        return f'Register allocation: {len(self.__loops)} loop variables kept in X ({inTest} compared with CPWX)'
+
+    ####
+    ## Helper functions
+    ####
+
+    def __allocate(self, loop):
+        inner = [n for statement in loop.body for n in ast.walk(statement)]
+        if any(isinstance(n, (ast.While, ast.For, ast.Subscript, ast.List)) for n in inner + [loop.test]):
+            return None  # outer loops leave X to the inner ones, arrays need X for indexing
+        candidates = []
+        for statement in loop.body:
+            induction = self.__step(statement)
+            if induction is None:
+                continue
+            # the step must be the only assignment of the variable in the loop
+            stores = [n for n in inner if isinstance(n, ast.Name) and n.id == induction.name and isinstance(n.ctx, ast.Store)]
+            if len(stores) != 1:
+                continue
+            induction.inTest = self.__compared(loop.test, induction.name)
+            reads = sum(1 for n in inner + list(ast.walk(loop.test))
+                        if isinstance(n, ast.Name) and n.id == induction.name and isinstance(n.ctx, ast.Load))
+            # the step reads the variable once (implicitly for v += step), the condition once if compared
+            reads -= (0 if isinstance(statement, ast.AugAssign) else 1) + (1 if induction.inTest else 0)
+            induction.writeThrough = reads > 0
+            candidates.append(induction)
+        # the variable of the condition saves the most: its load and compare become one CPWX
+        candidates.sort(key = lambda induction: (not induction.inTest, induction.writeThrough))
+        return candidates[0] if candidates else None
+
+    def __step(self, statement):
+        """Induction when statement is `v = v +/- step` or `v +/-= step`, None otherwise"""
+        if isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name):
+            name, operator, step = statement.target.id, statement.op, statement.value
+        elif (isinstance(statement, ast.Assign) and len(statement.targets) == 1 and isinstance(statement.targets[0], ast.Name)
+                and isinstance(statement.value, ast.BinOp) and isinstance(statement.value.left, ast.Name)
+                and statement.value.left.id == statement.targets[0].id):
+            name, operator, step = statement.targets[0].id, statement.value.op, statement.value.right
+        else:
+            return None
+        if not isinstance(operator, (ast.Add, ast.Sub)):
+            return None
+        if not (isinstance(step, ast.Constant) and type(step.value) is int or isinstance(step, ast.Name) and step.id != name):
+            return None
+        return Induction(name, statement, type(operator), step)
+
+    @staticmethod
+    def __compared(test, name):
+        """True when test compares name with a variable or a constant"""
+        if not (isinstance(test, ast.Compare) and len(test.ops) == 1):
+            return False
+        sides = [test.left, test.comparators[0]]
+        names = [isinstance(side, ast.Name) and side.id == name for side in sides]
+        other = sides[1] if names[0] else sides[0]
+        return any(names) and not all(names) and isinstance(other, (ast.Name, ast.Constant))
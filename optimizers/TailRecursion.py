@@ -0,0 +1,225 @@
+import ast
+import copy
+
+IDENTITY = {ast.Add: 0, ast.Mult: 1}
+
+class TailRecursion():
+    """
+        Turns self-recursive functions into loops, after inlining and before
+        folding, so they run in constant stack and without CALL/RET:
+
+        - `return f(args)` (a tail call) assigns the arguments to the
+          parameters and starts the body again (`while True:` ... `continue`)
+        - when every recursive call is `return f(args) + e` or
+          `return f(args) * e` (either order, the same operator, e without
+          calls nor array elements), the pending operations are applied to an
+          accumulator instead: `acc = acc * e` before looping, `return acc * v`
+          for the values returned without recursing
+        - in a function returning nothing, a call `f(args)` ending it (or
+          ending a branch of the `if` ending it) is a tail call as well
+        - `v = e` immediately followed by `return ... v ...`, v being used
+          nowhere else, is first substituted into the return, so that
+          `r = f(n - 1); return n * r` is recognized as well
+
+        Recursive calls inside loops, or made anywhere but in a return, leave
+        the function as it is. The tree is transformed in place.
+    """
+
+    def __init__(self, root_node) -> None:
+        self.root_node = root_node
+        self.transformed = []
+        self.__names = {n.id for n in ast.walk(root_node) if isinstance(n, ast.Name)} | {
+            n.arg for n in ast.walk(root_node) if isinstance(n, ast.arg)}
+
+    def run(self):
+        for function in self.root_node.body:
+            if isinstance(function, ast.FunctionDef) and self.__recursive(function):
+                original = copy.deepcopy(function.body)
+                self.__returnTailCalls(function)
+                self.__substituteTemporaries(function)
+                if self.__transform(function):
+                    self.transformed.append(function.name)
+                else:
+                    function.body = original  # the substitutions alone could nest calls
+        ast.fix_missing_locations(self.root_node)
+        return self.root_node
+
+    def report(self):
+        return f'Tail recursion: {len(self.transformed)} functions turned into loops' + (
+            f' ({", ".join(self.transformed)})' if self.transformed else '')
+
+    ####
+    ## Transformation
+    ####
+
+    def __transform(self, function):
+        name = function.name
+        params = [a.arg for a in function.args.args]
+        if function.args.vararg or function.args.kwarg or function.args.kwonlyargs or function.args.defaults:
+            return False
+        returns = self.__returns(function.body, name, 0)
+        if returns is None:
+            return False  # a recursive call inside a loop
+        calls = [n for n in ast.walk(function) if self.__callsSelf(n, name)]
+
+        recursive, operators = [], set()
+        for statement in returns:
+            call, operator, other = self.__split(statement.value, name)
+            if call is None:
+                continue
+            if len(call.args) != len(params) or call.keywords:
+                return False
+            recursive.append(call)
+            if operator is not None:
+                operators.add(operator)
+        if not recursive or len(recursive) != len(calls) or len(operators) > 1:
+            return False  # the function also recurses outside of its returns, or mixes operators
+
+        operator = operators.pop() if operators else None
+        accumulator = None
+        if operator is not None:
+            # every exit must return a value the accumulator applies to
+            if any(statement.value is None for statement in returns) or not isinstance(function.body[-1], ast.Return):
+                return False
+            accumulator = self.__fresh(f'{name[:4]}_acc')
+
+        body = self.__rewrite(function.body, name, params, operator, accumulator)
+        if not isinstance(body[-1], ast.Return):
+            body.append(ast.Return(None))  # falling off the end must leave the loop
+        loop = ast.While(ast.Constant(True), body, [])
+        function.body = ([ast.Assign([ast.Name(accumulator, ast.Store())], ast.Constant(IDENTITY[operator]))]
+                         if accumulator else []) + [loop]
+        return True
+
+    def __rewrite(self, body, name, params, operator, accumulator):
+        result = []
+        for statement in body:
+            if isinstance(statement, ast.Return):
+                call, _, other = self.__split(statement.value, name)
+                if call is not None:
+                    if other is not None:
+                        result.append(self.__assign(accumulator, ast.BinOp(ast.Name(accumulator, ast.Load()), operator(), other)))
+                    result.extend(self.__rebind(params, call.args))
+                    result.append(ast.Continue())
+                    continue
+                if accumulator is not None:
+                    statement = ast.Return(ast.BinOp(ast.Name(accumulator, ast.Load()), operator(), statement.value))
+            elif isinstance(statement, (ast.If, ast.While)):
+                # recursive returns are never in loops, but the others need the accumulator too
+                statement.body = self.__rewrite(statement.body, name, params, operator, accumulator)
+                statement.orelse = self.__rewrite(statement.orelse, name, params, operator, accumulator)
+            result.append(statement)
+        return result
+
+    def __rebind(self, params, args):
+        """Assign the arguments of the tail call to the parameters, as if simultaneously"""
+        pairs = [(param, arg) for param, arg in zip(params, args) if not (isinstance(arg, ast.Name) and arg.id == param)]
+        assigned = {param for param, _ in pairs}
+        reads = [{n.id for n in ast.walk(arg) if isinstance(n, ast.Name)} for _, arg in pairs]
+        if len(pairs) > 1 and any(r & assigned for r in reads):
+            # an argument reads a parameter another argument replaces: go through temporaries
+            temporaries = [self.__fresh(f'{param}_t') for param, _ in pairs]
+            return ([self.__assign(t, arg) for t, (_, arg) in zip(temporaries, pairs)]
+                    + [self.__assign(param, ast.Name(t, ast.Load())) for t, (param, _) in zip(temporaries, pairs)])
+        return [self.__assign(param, arg) for param, arg in pairs]
+
+    ####
+    ## Recognizing the recursion
+    ####
+
+    def __recursive(self, function):
+        return any(self.__callsSelf(n, function.name) for n in ast.walk(function))
+
+    @staticmethod
+    def __callsSelf(node, name):
+        return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == name
+
+    def __returns(self, body, name, loops):
+        """Return statements of body, None when one inside a loop recurses"""
+        found = []
+        for statement in body:
+            if isinstance(statement, ast.Return):
+                if loops and any(self.__callsSelf(n, name) for n in ast.walk(statement)):
+                    return None
+                found.append(statement)
+            elif isinstance(statement, (ast.If, ast.While, ast.For)):
+                for nested in (statement.body, statement.orelse):
+                    inner = self.__returns(nested, name, loops + isinstance(statement, (ast.While, ast.For)))
+                    if inner is None:
+                        return None
+                    found.extend(inner)
+        return found
+
+    def __split(self, value, name):
+        """(call, operator, other operand) of `f(...)`, `f(...) op e` or `e op f(...)`; call is None when value does not recurse"""
+        if self.__callsSelf(value, name):
+            return value, None, None
+        if isinstance(value, ast.BinOp) and type(value.op) in IDENTITY:
+            for call, other in ((value.left, value.right), (value.right, value.left)):
+                if self.__callsSelf(call, name) and not any(isinstance(n, (ast.Call, ast.Subscript)) for n in ast.walk(other)):
+                    return call, type(value.op), other
+        return None, None, None
+
+    def __returnTailCalls(self, function):
+        """`f(args)` as the last thing a function returning None does is `return f(args)`"""
+        if any(isinstance(n, ast.Return) and n.value is not None for n in ast.walk(function)):
+            return
+        body = function.body
+        tails = [body]
+        while tails:
+            body = tails.pop()
+            if not body:
+                continue
+            last = body[-1]
+            if isinstance(last, ast.Expr) and self.__callsSelf(last.value, function.name):
+                body[-1] = ast.copy_location(ast.Return(last.value), last)
+            elif isinstance(last, ast.If):
+                tails.extend([last.body, last.orelse])
+
+    def __substituteTemporaries(self, function):
+        """`v = e` then `return ... v ...` becomes `return ... e ...` when v is used nowhere else"""
+        params = {a.arg for a in function.args.args}
+        bodies = [function.body] + [getattr(n, field) for n in ast.walk(function) if isinstance(n, (ast.If, ast.While))
+                                    for field in ('body', 'orelse')]
+        for body in bodies:
+            i = len(body) - 1
+            while i > 0:
+                assign, ret = body[i - 1], body[i]
+                if (isinstance(ret, ast.Return) and ret.value is not None and isinstance(assign, ast.Assign)
+                        and len(assign.targets) == 1 and isinstance(assign.targets[0], ast.Name)
+                        and assign.targets[0].id not in params):
+                    variable = assign.targets[0].id
+                    uses = [n for n in ast.walk(function) if isinstance(n, ast.Name) and n.id == variable]
+                    if len(uses) == 2 and any(n in uses for n in ast.walk(ret.value)):
+                        # evaluated right before the return: moving it into the return changes nothing
+                        ret.value = Replace(variable, assign.value).visit(ret.value)
+                        del body[i - 1]
+                i -= 1
+
+    ####
+    ## Helper functions
+    ####
+
+    @staticmethod
+    def __assign(name, value):
+        return ast.Assign([ast.Name(name, ast.Store())], value)
+
+    def __fresh(self, name):
+        """A name used nowhere in the module"""
+        k = 1
+        while f'{name}{k}' in self.__names:
+            k += 1
+        self.__names.add(f'{name}{k}')
+        return f'{name}{k}'
+
+
+class Replace(ast.NodeTransformer):
+    """Replaces the reads of one variable by an expression"""
+
+    def __init__(self, name, value) -> None:
+        super().__init__()
+        self.name = name
+        self.value = value
+
+    def visit_Name(self, node):
+        return self.value if node.id == self.name and isinstance(node.ctx, ast.Load) else node
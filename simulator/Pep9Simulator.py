@@ -0,0 +1,382 @@
+from collections import Counter
+
+LabeledInstruction = tuple[str, str]
+
+MEMORY_SIZE = 0x10000
+STACK_TOP = 0xFB8F  # initial SP of a user program under the Pep/9 operating system
+
+UNARY = {
+    'STOP', 'RET', 'RETTR', 'MOVSPA', 'MOVFLGA', 'MOVAFLG',
+    'NOTA', 'NOTX', 'NEGA', 'NEGX', 'ASLA', 'ASLX', 'ASRA', 'ASRX',
+    'ROLA', 'ROLX', 'RORA', 'RORX', 'NOP0', 'NOP1',
+}
+
+BRANCHES = {
+    'BR':   lambda n, z, v, c: True,
+    'BRLE': lambda n, z, v, c: n or z,
+    'BRLT': lambda n, z, v, c: n,
+    'BREQ': lambda n, z, v, c: z,
+    'BRNE': lambda n, z, v, c: not z,
+    'BRGE': lambda n, z, v, c: not n,
+    'BRGT': lambda n, z, v, c: not n and not z,
+    'BRV':  lambda n, z, v, c: v,
+    'BRC':  lambda n, z, v, c: c,
+}
+
+class SimulationError(Exception):
+    """Raised when the simulated program cannot go on (bad operand, runaway loop, missing input...)"""
+
+
+class Pep9Simulator():
+    """
+        Headless Pep/9 CPU executing a translated program.
+
+        The program is the whole listing as (label, instruction) pairs: the
+        initial `BR tl`, the allocator directives (.WORD, .BLOCK, .EQUATE)
+        and the instructions returned by TopLevelProgram.finalize(). Labels
+        are laid out at the addresses the Pep/9 assembler would give them.
+        DECI reads from a scripted list of integers and DECO appends to
+        `output`, so programs can be run and measured without the Pep/9 IDE.
+
+        `cycles` estimates the bus traffic of the one-byte-bus Pep/9 CPU:
+        every instruction byte fetched plus every data byte read or written.
+    """
+
+    def __init__(self, program: list[LabeledInstruction], inputs = (), maxSteps = 10_000_000) -> None:
+        self.__program = list(program)
+        self.__inputs = list(inputs)
+        self.maxSteps = maxSteps
+        self.memory = bytearray(MEMORY_SIZE)
+        self.symbols = {}
+        self.output = []
+        self.a = 0
+        self.x = 0
+        self.sp = STACK_TOP
+        self.n = self.z = self.v = self.c = False
+        # statistics
+        self.instructions = 0
+        self.cycles = 0
+        self.memoryReads = 0
+        self.memoryWrites = 0
+        self.minStackPointer = STACK_TOP
+        self.mix = Counter()
+        self.codeSize = 0
+        self.halted = False
+        self.__decoded = []
+        self.__addressToIndex = {}
+        self.__layout()
+
+    ####
+    ## Public interface
+    ####
+
+    def run(self):
+        """Execute from the first instruction until STOP or .END, returns the printed values"""
+        pc = 0
+        decoded = self.__decoded
+        while not self.halted:
+            if self.instructions >= self.maxSteps:
+                raise SimulationError(f'Step limit of {self.maxSteps} instructions reached')
+            if pc >= len(decoded):
+                raise SimulationError('Execution ran past the end of the program')
+            mnemonic, spec, mode, size, address = decoded[pc]
+            if mnemonic[0] == '.':
+                if mnemonic == '.END':
+                    break
+                raise SimulationError(f'Executing data: {mnemonic} at address {address:#06x}')
+            self.instructions += 1
+            self.cycles += size
+            self.mix[mnemonic] += 1
+            pc = self.__execute(mnemonic, spec, mode, pc + 1)
+        return self.output
+
+    def text(self):
+        """The printed values as the Pep/9 terminal shows them (DECO does not add separators)"""
+        return ''.join(str(value) for value in self.output)
+
+    def stats(self):
+        return {
+            'instructions': self.instructions,
+            'cycles': self.cycles,
+            'memory_reads': self.memoryReads,
+            'memory_writes': self.memoryWrites,
+            'max_stack_depth': STACK_TOP - self.minStackPointer,
+            'code_size': self.codeSize,
+        }
+
+    ####
+    ## First pass: addresses of every label, .WORD initial values
+    ####
+
+    def __layout(self):
+        address = 0
+        pending = []
+        for label, instruction in self.__program:
+            parts = instruction.split(None, 1)
+            mnemonic = parts[0].upper()
+            operand = parts[1].strip() if len(parts) > 1 else ''
+            if label is not None and label in self.symbols:
+                raise SimulationError(f'Duplicate symbol: {label}')
+            if mnemonic == '.EQUATE':
+                self.symbols[label] = self.__number(operand)
+                continue
+            if label is not None:
+                self.symbols[label] = address
+            if mnemonic == '.WORD':
+                size = 2
+            elif mnemonic == '.BLOCK':
+                size = self.__number(operand)
+            elif mnemonic == '.END':
+                size = 0
+            elif mnemonic in UNARY:
+                size = 1
+                self.codeSize += 1
+            elif mnemonic[0] == '.':
+                raise SimulationError(f'Unsupported directive: {instruction}')
+            else:
+                size = 3
+                self.codeSize += 3
+            self.__addressToIndex[address] = len(self.__decoded)
+            self.__decoded.append([mnemonic, operand, None, size, address])
+            pending.append(len(self.__decoded) - 1)
+            address += size
+            if address > MEMORY_SIZE:
+                raise SimulationError('Program does not fit in memory')
+
+        # second pass: operands can refer to labels defined later
+        for index in pending:
+            entry = self.__decoded[index]
+            mnemonic, operand, _, _, address = entry
+            if mnemonic == '.WORD':
+                self.__store(address, self.__value(operand), count = False)
+                entry[1] = None
+            elif mnemonic[0] == '.' or mnemonic in UNARY:
+                entry[1] = None
+            else:
+                spec, _, mode = operand.partition(',')
+                entry[1] = self.__value(spec.strip())
+                entry[2] = mode.strip().lower() or 'i'
+        self.__decoded = [tuple(entry) for entry in self.__decoded]
+
+    def __number(self, text):
+        text = text.strip()
+        if len(text) == 3 and text[0] == text[2] == "'":
+            return ord(text[1])
+        try:
+            return int(text, 0)
+        except ValueError:
+            raise SimulationError(f'Invalid number: {text}') from None
+
+    def __value(self, text):
+        if text in self.symbols:
+            return self.symbols[text] & 0xFFFF
+        if text and (text[0].isalpha() or text[0] == '_'):
+            raise SimulationError(f'Undefined symbol: {text}')
+        return self.__number(text) & 0xFFFF
+
+    ####
+    ## Memory and operands
+    ####
+
+    def __load(self, address, count = True):
+        if count:
+            self.memoryReads += 1
+            self.cycles += 2
+        return (self.memory[address & 0xFFFF] << 8) | self.memory[(address + 1) & 0xFFFF]
+
+    def __store(self, address, value, count = True):
+        if count:
+            self.memoryWrites += 1
+            self.cycles += 2
+        self.memory[address & 0xFFFF] = (value >> 8) & 0xFF
+        self.memory[(address + 1) & 0xFFFF] = value & 0xFF
+
+    def __address(self, spec, mode):
+        """Effective address of a non-immediate operand"""
+        match mode:
+            case 'd':
+                return spec
+            case 'n':
+                return self.__load(spec)
+            case 's':
+                return (self.sp + spec) & 0xFFFF
+            case 'sf':
+                return self.__load(self.sp + spec)
+            case 'x':
+                return (spec + self.x) & 0xFFFF
+            case 'sx':
+                return (self.sp + spec + self.x) & 0xFFFF
+            case 'sfx':
+                return (self.__load(self.sp + spec) + self.x) & 0xFFFF
+            case _:
+                raise SimulationError(f'Invalid addressing mode: {mode}')
+
+    def __operand(self, spec, mode):
+        if mode == 'i':
+            return spec
+        return self.__load(self.__address(spec, mode))
+
+    def __byteOperand(self, spec, mode):
+        if mode == 'i':
+            return spec & 0xFF
+        self.memoryReads += 1
+        self.cycles += 1
+        return self.memory[self.__address(spec, mode)]
+
+    ####
+    ## Execution
+    ####
+
+    def __execute(self, mnemonic, spec, mode, pc):
+        """Execute one decoded instruction, returns the index of the next one"""
+        if mnemonic in BRANCHES:
+            if BRANCHES[mnemonic](self.n, self.z, self.v, self.c):
+                target = spec if mode == 'i' else self.__load(spec + self.x)
+                return self.__jump(target)
+            return pc
+
+        register = mnemonic[-1]
+        match mnemonic:
+            case 'NOP0' | 'NOP1' | 'NOP':
+                pass
+            case 'STOP':
+                self.halted = True
+            case 'CALL':
+                self.__push(self.__decoded[pc][4] if pc < len(self.__decoded) else 0)
+                target = spec if mode == 'i' else self.__load(spec + self.x)
+                return self.__jump(target)
+            case 'RET':
+                target = self.__load(self.sp)
+                self.sp = (self.sp + 2) & 0xFFFF
+                return self.__jump(target)
+            case 'ADDSP' | 'SUBSP':
+                value = self.__operand(spec, mode)
+                self.sp = self.__arithmetic(self.sp, value, mnemonic == 'SUBSP')
+                self.minStackPointer = min(self.minStackPointer, self.sp)
+            case 'MOVSPA':
+                self.a = self.sp
+            case 'LDWA' | 'LDWX':
+                self.__set(register, self.__operand(spec, mode))
+                self.__nz(self.__get(register))
+            case 'LDBA' | 'LDBX':
+                value = self.__byteOperand(spec, mode)
+                self.__set(register, (self.__get(register) & 0xFF00) | value)
+                self.n = False
+                self.z = value == 0
+            case 'STWA' | 'STWX':
+                if mode == 'i':
+                    raise SimulationError(f'{mnemonic} cannot use immediate addressing')
+                self.__store(self.__address(spec, mode), self.__get(register))
+            case 'STBA' | 'STBX':
+                if mode == 'i':
+                    raise SimulationError(f'{mnemonic} cannot use immediate addressing')
+                self.memoryWrites += 1
+                self.cycles += 1
+                self.memory[self.__address(spec, mode)] = self.__get(register) & 0xFF
+            case 'ADDA' | 'ADDX' | 'SUBA' | 'SUBX':
+                value = self.__operand(spec, mode)
+                self.__set(register, self.__arithmetic(self.__get(register), value, mnemonic.startswith('SUB')))
+            case 'CPWA' | 'CPWX':
+                self.__arithmetic(self.__get(register), self.__operand(spec, mode), True)
+                self.n = self.n != self.v  # Pep/9 corrects N on overflow for comparisons
+            case 'CPBA' | 'CPBX':
+                difference = ((self.__get(register) & 0xFF) - self.__byteOperand(spec, mode)) & 0xFF
+                self.n = difference >= 0x80
+                self.z = difference == 0
+                self.v = self.c = False
+            case 'ANDA' | 'ANDX':
+                self.__set(register, self.__get(register) & self.__operand(spec, mode))
+                self.__nz(self.__get(register))
+            case 'ORA' | 'ORX':
+                self.__set(register, self.__get(register) | self.__operand(spec, mode))
+                self.__nz(self.__get(register))
+            case 'NOTA' | 'NOTX':
+                self.__set(register, ~self.__get(register) & 0xFFFF)
+                self.__nz(self.__get(register))
+            case 'NEGA' | 'NEGX':
+                value = self.__get(register)
+                self.__set(register, -value & 0xFFFF)
+                self.__nz(self.__get(register))
+                self.v = value == 0x8000
+            case 'ASLA' | 'ASLX':
+                value = self.__get(register)
+                result = (value << 1) & 0xFFFF
+                self.__set(register, result)
+                self.__nz(result)
+                self.c = bool(value & 0x8000)
+                self.v = bool((value ^ result) & 0x8000)
+            case 'ASRA' | 'ASRX':
+                value = self.__get(register)
+                result = (value >> 1) | (value & 0x8000)
+                self.__set(register, result)
+                self.__nz(result)
+                self.c = bool(value & 1)
+            case 'ROLA' | 'ROLX':
+                value = self.__get(register)
+                self.__set(register, ((value << 1) | self.c) & 0xFFFF)
+                self.c = bool(value & 0x8000)
+            case 'RORA' | 'RORX':
+                value = self.__get(register)
+                self.__set(register, (value >> 1) | (self.c << 15))
+                self.c = bool(value & 1)
+            case 'DECI':
+                if mode == 'i':
+                    raise SimulationError('DECI cannot use immediate addressing')
+                if not self.__inputs:
+                    raise SimulationError('DECI: no more scripted input')
+                value = int(self.__inputs.pop(0))
+                self.v = not -32768 <= value <= 32767
+                self.__store(self.__address(spec, mode), value & 0xFFFF)
+                self.__nz(value & 0xFFFF)
+            case 'DECO':
+                self.output.append(self.__signed(self.__operand(spec, mode)))
+            case 'HEXO':
+                self.output.append(f'{self.__operand(spec, mode):04X}')
+            case 'STRO':
+                address = self.__address(spec, mode)
+                chars = []
+                while self.memory[address] != 0:
+                    chars.append(chr(self.memory[address]))
+                    address = (address + 1) & 0xFFFF
+                self.output.append(''.join(chars))
+            case _:
+                raise SimulationError(f'Unsupported instruction: {mnemonic}')
+        return pc
+
+    def __jump(self, address):
+        if address not in self.__addressToIndex:
+            raise SimulationError(f'Branch to an address that is not an instruction: {address:#06x}')
+        return self.__addressToIndex[address]
+
+    def __push(self, value):
+        self.sp = (self.sp - 2) & 0xFFFF
+        self.minStackPointer = min(self.minStackPointer, self.sp)
+        self.__store(self.sp, value)
+
+    def __get(self, register):
+        return self.a if register == 'A' else self.x
+
+    def __set(self, register, value):
+        if register == 'A':
+            self.a = value & 0xFFFF
+        else:
+            self.x = value & 0xFFFF
+
+    def __nz(self, value):
+        self.n = bool(value & 0x8000)
+        self.z = value == 0
+
+    def __arithmetic(self, left, right, subtract):
+        """16-bit add or subtract setting NZVC, returns the result"""
+        if subtract:
+            right = ~right & 0xFFFF
+        total = left + right + (1 if subtract else 0)
+        result = total & 0xFFFF
+        self.__nz(result)
+        self.c = total > 0xFFFF
+        self.v = not ((left ^ right) & 0x8000) and bool((left ^ result) & 0x8000)
+        return result
+
+    @staticmethod
+    def __signed(value):
+        return value - 0x10000 if value & 0x8000 else value
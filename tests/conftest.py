@@ -0,0 +1,38 @@
+import ast
+import io
+import os
+import sys
+from contextlib import redirect_stdout
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import translator
+from simulator.Pep9Simulator import Pep9Simulator
+
+def wrap(value):
+    """value as a signed 16-bit word, as Pep/9 prints it"""
+    return (value + 0x8000) % 0x10000 - 0x8000
+
+def expected(source, inputs):
+    """What CPython prints for source, read as 16-bit words"""
+    values = iter(inputs)
+    out = io.StringIO()
+    with redirect_stdout(out):
+        exec(source, {'input': lambda: str(next(values))})
+    return [wrap(int(line)) for line in out.getvalue().split()]
+
+def simulated(source, inputs = (), options = None):
+    """What the translation of source prints on the simulator"""
+    simulator = Pep9Simulator(translator.program_listing(ast.parse(source), options), list(inputs))
+    simulator.run()
+    return simulator.output
+
+@pytest.fixture
+def check():
+    """Translate source with options, run it on every input vector, compare with CPython"""
+    def check(source, vectors = ((),), options = None):
+        for inputs in vectors:
+            assert simulated(source, inputs, options) == expected(source, inputs), inputs
+    return check
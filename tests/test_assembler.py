@@ -0,0 +1,47 @@
+import ast
+
+import pytest
+
+import translator
+from generators.Assembler import Assembler, AssemblyError
+from simulator.Pep9Simulator import Pep9Simulator
+
+def many_loops(count):
+    lines = ['total = 0']
+    for n in range(count):
+        lines += ['i = 0', f'while i < {n % 3 + 1}:', '    if i != 1:', f'        total = total + {n}', '    i = i + 1']
+    return '\n'.join(lines + ['print(total)']) + '\n'
+
+def test_program_with_many_loops_assembles():
+    program = translator.program_listing(ast.parse(many_loops(120)))
+    assembler = Assembler(program)
+    assert all(len(label) <= 8 for label in assembler.symbols)
+    assert assembler.objectCode().endswith('zz\n')
+    simulator = Pep9Simulator(program)
+    simulator.run()
+    total = sum(n * len([i for i in range(n % 3 + 1) if i != 1]) for n in range(120))
+    assert simulator.output == [(total + 0x8000) % 0x10000 - 0x8000]
+
+def test_names_like_generated_labels_assemble(check):
+    source = ('wh0 = int(input())\n'
+              'tl = 0\n'
+              'def rt0(if0):\n'
+              '    ddd1 = if0 + 1\n'
+              '    return ddd1\n'
+              'while wh0 > 0:\n'
+              '    wh0 = wh0 - 2\n'
+              '    tl = rt0(tl)\n'
+              'print(wh0)\nprint(tl)\n')
+    for options in ({}, {'inlining': False}):
+        Assembler(translator.program_listing(ast.parse(source), options))
+        check(source, vectors=([5], [0]), options=options)
+
+def test_rejects_long_labels_and_missing_end():
+    with pytest.raises(AssemblyError):
+        Assembler([('verylonglabel', 'STOP'), (None, '.END')])
+    with pytest.raises(AssemblyError):
+        Assembler([(None, 'STOP')])
+
+def test_encodes_addressing_modes():
+    assembler = Assembler([(None, 'LDWA 5,i'), (None, 'LDWA x,d'), (None, 'STWA 2,s'), (None, 'STOP'), ('x', '.WORD 7'), (None, '.END')])
+    assert assembler.code.hex() == 'c00005c1000ae30002000007'
@@ -0,0 +1,37 @@
+import ast
+
+from conftest import simulated
+from optimizers.ConstantFolding import ConstantFolding, wrap
+
+def folded(source):
+    root = ast.parse(source)
+    ConstantFolding(root).run()
+    return root
+
+def test_folds_with_16_bit_wraparound():
+    root = folded('x = 30000 + 30000\ny = 300 * 300\nz = -32768 - 1\nw = (30000 + 30000) // 7\n')
+    values = [statement.value.value for statement in root.body]
+    assert values == [wrap(60000), wrap(90000), 32767, wrap(60000) // 7]
+
+def test_folding_matches_the_unfolded_code():
+    source = ('_BIG = 30000\n'
+              'x = int(input())\n'
+              'y = _BIG + _BIG\n'
+              'z = 300 * 300 + x\n'
+              'w = (_BIG + _BIG) // 7\n'
+              'v = (_BIG * 3) % 1000\n'
+              'print(y)\nprint(z)\nprint(w)\nprint(v)\n')
+    for inputs in ([0], [5], [-7]):
+        assert simulated(source, inputs) == simulated(source, inputs, {'constant_folding': False})
+
+def test_propagates_constant_globals(check):
+    source = '_K = 7\nx = int(input())\ny = x + _K * 2\nprint(y)\n'
+    root = folded(source)
+    assert '_K' not in ast.unparse(root.body[2])
+    check(source, vectors=([1], [-20], [32760]))
+
+def test_keeps_the_branch_taken(check):
+    source = '_DEBUG = 0\nx = int(input())\nif _DEBUG > 0:\n    print(1)\nelse:\n    print(x)\n'
+    root = folded(source)
+    assert not any(isinstance(n, ast.If) for n in ast.walk(root))
+    check(source, vectors=([3],))
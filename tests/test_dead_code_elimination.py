@@ -0,0 +1,62 @@
+import ast
+
+from optimizers.DeadCodeElimination import DeadCodeElimination
+
+def eliminated(source):
+    root = ast.parse(source)
+    DeadCodeElimination(root).run()
+    return ast.unparse(root)
+
+def test_liveness_reaches_a_fixpoint_around_loops(check):
+    # c is read by b = c one iteration later, b by a = b the iteration after:
+    # each pass over the body finds one more live store
+    source = ('x = int(input())\n'
+              'a = 0\nb = 0\nc = 0\n'
+              'i = 0\n'
+              'while i < x:\n'
+              '    a = b\n'
+              '    b = c\n'
+              '    c = i\n'
+              '    d = i + i\n'
+              '    i = i + 1\n'
+              'unused = x + 1\n'
+              'print(a)\n')
+    result = eliminated(source)
+    assert 'c = i' in result and 'b = c' in result and 'a = b' in result
+    assert 'd =' not in result and 'unused' not in result
+    check(source, vectors=([0], [1], [2], [3], [7]))
+
+def test_stores_with_effects_are_kept(check):
+    source = ('x = int(input())\n'
+              'y = int(input())\n'
+              'z = x // y\n'
+              'print(x)\n')
+    result = eliminated(source)
+    # input() is read even if y is not, and the division may stop the program
+    assert 'y = int(input())' in result and 'z = x // y' in result
+    check(source, vectors=([7, 2],))
+
+def test_unreachable_functions_and_statements(check):
+    source = ('def used(n):\n'
+              '    return n + 1\n'
+              '    n = n * 2\n'
+              'def unused(n):\n'
+              '    return used(n)\n'
+              'x = int(input())\n'
+              'y = used(x)\n'
+              'print(y)\n')
+    result = eliminated(source)
+    assert 'def unused' not in result and 'n * 2' not in result
+    check(source, vectors=([4],))
+
+def test_arrays_only_written_are_removed(check):
+    source = ('log_ = [0] * 10\n'
+              'x = int(input())\n'
+              'i = 0\n'
+              'while i < 10:\n'
+              '    log_[i] = x\n'
+              '    i = i + 1\n'
+              'print(x)\n')
+    result = eliminated(source)
+    assert 'log_' not in result
+    check(source, vectors=([5],))
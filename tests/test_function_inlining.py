@@ -0,0 +1,57 @@
+import ast
+
+from optimizers.FunctionInlining import FunctionInlining
+
+def inlined(source):
+    root = ast.parse(source)
+    inlining = FunctionInlining(root)
+    inlining.run()
+    return root, inlining
+
+def functions(root):
+    return {s.name for s in root.body if isinstance(s, ast.FunctionDef)}
+
+def test_locals_of_the_callee_do_not_clobber_the_caller(check):
+    # y and t are both locals of scale and globals of the top level
+    source = ('def scale(x):\n'
+              '    t = x + x\n'
+              '    y = t + x\n'
+              '    return y\n'
+              'x = int(input())\n'
+              't = 100\n'
+              'y = 5\n'
+              'z = scale(t)\n'
+              'print(x)\nprint(t)\nprint(y)\nprint(z)\n')
+    root, inlining = inlined(source)
+    assert inlining.inlined == 1 and functions(root) == set()
+    check(source, vectors=([2], [-9]))
+
+def test_parameter_named_like_a_variable_of_the_caller(check):
+    source = ('def inc(a):\n'
+              '    t = a + 1\n'
+              '    return t\n'
+              'def twice(t):\n'
+              '    a = inc(t)\n'
+              '    u = inc(a)\n'
+              '    return t + u\n'
+              'a = int(input())\n'
+              'r = twice(a)\n'
+              'print(a)\nprint(r)\n')
+    root, inlining = inlined(source)
+    # twice becomes a leaf once inc is inlined, then is inlined in turn
+    assert inlining.inlined == 3 and functions(root) == set()
+    check(source, vectors=([0], [41]))
+
+def test_assigned_parameter_is_copied(check):
+    source = ('def countdown(n):\n'
+              '    s = 0\n'
+              '    while n > 0:\n'
+              '        s = s + n\n'
+              '        n = n - 1\n'
+              '    return s\n'
+              'n = int(input())\n'
+              'r = countdown(n)\n'
+              'print(n)\nprint(r)\n')
+    root, _ = inlined(source)
+    assert functions(root) == set()
+    check(source, vectors=([4], [0]))
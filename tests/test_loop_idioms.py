@@ -0,0 +1,52 @@
+import ast
+
+from optimizers.LoopIdioms import LoopIdioms
+
+PRODUCT = ('a = int(input())\n'
+           'b = int(input())\n'
+           'r = 0\n'
+           'while b > 0:\n'
+           '    r = r + a\n'
+           '    b = b - 1\n'
+           'print(r)\nprint(b)\n')
+
+QUOTIENT = ('r = int(input())\n'
+            'd = int(input())\n'
+            'q = 0\n'
+            'while r >= d:\n'
+            '    r = r - d\n'
+            '    q = q + 1\n'
+            'print(q)\nprint(r)\n')
+
+def rewritten(source):
+    root = ast.parse(source)
+    idioms = LoopIdioms(root)
+    idioms.run()
+    return root, idioms
+
+def test_repeated_addition_is_a_product(check):
+    root, idioms = rewritten(PRODUCT)
+    assert idioms.products == 1
+    assert 'a * b' in ast.unparse(root)
+    check(PRODUCT, vectors=([6, 7], [123, 456], [-5, 3], [9, 0], [9, -4], [300, 300]))
+
+def test_repeated_subtraction_is_a_quotient(check):
+    root, idioms = rewritten(QUOTIENT)
+    assert idioms.quotients == 1
+    assert 'r // d' in ast.unparse(root)
+    check(QUOTIENT, vectors=([17, 5], [5, 17], [0, 7], [-5, 3], [32000, 3]))
+
+def test_division_by_a_variable_keeps_the_loop_unless_positive(check):
+    root, _ = rewritten(QUOTIENT)
+    guard = next(n for n in ast.walk(root) if isinstance(n, ast.If))
+    assert ast.unparse(guard.test) == 'd > 0'
+    assert any(isinstance(n, ast.While) for n in guard.orelse)
+    # r < d <= 0: the loop never runs, where r // d would give 1, or divide by zero
+    check(QUOTIENT, vectors=([-5, -3], [-1, 0]))
+
+def test_division_by_a_positive_constant_needs_no_guard(check):
+    source = 'r = int(input())\nq = 0\nwhile r >= 7:\n    r = r - 7\n    q = q + 1\nprint(q)\nprint(r)\n'
+    root, idioms = rewritten(source)
+    assert idioms.quotients == 1
+    assert not any(isinstance(n, ast.While) for n in ast.walk(root))
+    check(source, vectors=([20], [6], [-3]))
@@ -0,0 +1,82 @@
+import ast
+
+import translator
+from optimizers.LoopOptimization import LoopOptimization
+
+SQUARES = ('n = int(input())\n'
+           'total = 0\n'
+           'i = {start}\n'
+           'while i {compare} n:\n'
+           '    total = total + i * i\n'
+           '    i = i {operator} {step}\n'
+           'print(total)\n')
+
+def products(loop):
+    """Multiplications left in loop that are not shifts"""
+    return [n for n in ast.walk(loop) if isinstance(n, ast.BinOp) and isinstance(n.op, ast.Mult)
+            and not (isinstance(n.right, ast.Constant) and n.right.value & (n.right.value - 1) == 0)]
+
+def test_square_of_induction_variable(check):
+    for start, compare, operator, step in ((0, '<', '+', 1), (1, '<', '+', 3), (40, '>', '-', 3), (0, '<', '+', 5)):
+        source = SQUARES.format(start=start, compare=compare, operator=operator, step=step)
+        root = ast.parse(source)
+        LoopOptimization(root).run()
+        loop = next(n for n in ast.walk(root) if isinstance(n, ast.While))
+        assert products(loop) == [], ast.unparse(root)
+        check(source, vectors=([0], [10], [37]))
+
+def test_square_keeps_mul_out_of_the_loop():
+    source = SQUARES.format(start=1, compare='<', operator='+', step=3)
+    program = translator.program_listing(ast.parse(source))
+    labels = [label for label, _ in program]
+    body = [instruction for _, instruction in program[labels.index('wh0'):labels.index('ew0')]]
+    assert not any(instruction.startswith('CALL') for instruction in body)
+
+def test_product_with_an_invariant(check):
+    source = ('k = int(input())\n'
+              'n = int(input())\n'
+              'total = 0\n'
+              'i = 0\n'
+              'while i < n:\n'
+              '    total = total + i * k\n'
+              '    i = i + 2\n'
+              'print(total)\n')
+    root = ast.parse(source)
+    optimizer = LoopOptimization(root)
+    optimizer.run()
+    assert optimizer.reduced == 1 and products(next(n for n in ast.walk(root) if isinstance(n, ast.While))) == []
+    check(source, vectors=([3, 10], [-7, 9], [0, 0], [250, 300]))
+
+def test_invariants_are_computed_before_the_loop(check):
+    source = ('a = int(input())\n'
+              'b = int(input())\n'
+              'i = 0\n'
+              'while i < 5:\n'
+              '    c = a * b + 1\n'
+              '    d = a // b\n'
+              '    e = c + i\n'
+              '    print(e)\n'
+              '    i = i + 1\n')
+    root = ast.parse(source)
+    optimizer = LoopOptimization(root)
+    optimizer.run()
+    loop = next(n for n in ast.walk(root) if isinstance(n, ast.While))
+    # a // b may divide by zero: it stays where the loop guards it
+    assert optimizer.hoisted == 1 and 'a * b' not in ast.unparse(loop) and 'a // b' in ast.unparse(loop)
+    check(source, vectors=([3, 4], [-2, 5]))
+
+def test_copies_are_propagated_until_reassigned(check):
+    source = ('p = int(input())\n'
+              'i = 0\n'
+              'while i < 3:\n'
+              '    b = p\n'
+              '    c = b + b\n'
+              '    p = c\n'
+              '    d = b + 1\n'
+              '    print(d)\n'
+              '    i = i + 1\n')
+    root = ast.parse(source)
+    optimizer = LoopOptimization(root)
+    optimizer.run()
+    assert optimizer.copies == 2 and 'd = b + 1' in ast.unparse(root)
+    check(source, vectors=([1], [-4]))
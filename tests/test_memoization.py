@@ -0,0 +1,43 @@
+import ast
+
+import translator
+from optimizers.Memoization import Memoization
+from simulator.Pep9Simulator import Pep9Simulator
+
+FIB = ('def fib(n):\n'
+       '    if n < 2:\n'
+       '        return n\n'
+       '    a = fib(n - 1)\n'
+       '    b = fib(n - 2)\n'
+       '    return a + b\n'
+       'x = int(input())\n'
+       'r = fib(x)\n'
+       'print(r)\n')
+
+def memoized(source):
+    root = ast.parse(source)
+    memoization = Memoization(root)
+    memoization.run()
+    return memoization.memoized
+
+def instructions(source, inputs, options):
+    simulator = Pep9Simulator(translator.program_listing(ast.parse(source), options), inputs)
+    simulator.run()
+    return simulator.stats()['instructions']
+
+def test_memoized_fibonacci(check):
+    assert memoized(FIB) == ['fib']
+    check(FIB, vectors=([0], [1], [10], [20]), options={'memoization': True})
+    assert instructions(FIB, [15], {'memoization': True}) * 10 < instructions(FIB, [15], {})
+
+def test_arguments_beyond_the_table(check):
+    # the table holds 8 entries: larger arguments are computed, not cached
+    check(FIB, vectors=([12],), options={'memoization': True, 'memo_entries': 8})
+
+def test_impure_functions_are_not_memoized():
+    printing = FIB.replace('    if n < 2:\n', '    print(n)\n    if n < 2:\n')
+    assert memoized(printing) == []
+    reading = 'g = int(input())\n' + FIB.replace('return n\n', 'return n + g\n')
+    assert memoized(reading) == []
+    constant = '_K = 3\n' + FIB.replace('return n\n', 'return n + _K\n')
+    assert memoized(constant) == ['fib']
@@ -0,0 +1,37 @@
+import ast
+import glob
+import os
+
+import translator
+from conftest import simulated
+from optimizers.PeepholeOptimizer import PeepholeOptimizer
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_samples')
+# local arrays need a size known at translation time
+UNSUPPORTED = {os.path.join('5_arrays', 'local_read.py')}
+
+def optimized(instructions, rules = PeepholeOptimizer.RULES):
+    return PeepholeOptimizer(instructions, rules).optimize()
+
+def test_rules():
+    assert optimized([('tl', 'NOP1'), ('a', 'NOP1'), (None, 'LDWA 1,i'), (None, 'BR a')]) == [
+        ('tl', 'LDWA 1,i'), (None, 'BR tl')]
+    assert optimized([(None, 'STWA x,d'), (None, 'LDWA x,d'), (None, 'STOP')]) == [(None, 'STWA x,d'), (None, 'STOP')]
+    assert optimized([(None, 'BR a'), ('a', 'BR b'), ('b', 'STOP')]) == [('b', 'STOP')]
+    assert optimized([(None, 'BREQ a'), (None, 'BR c'), (None, 'DECO x,d'), ('a', 'STOP'), ('c', 'STOP')]) == [
+        (None, 'BREQ a'), (None, 'BR c'), ('a', 'STOP'), ('c', 'STOP')]
+
+def test_rules_can_be_left_out():
+    instructions = [(None, 'STWA x,d'), (None, 'LDWA x,d'), (None, 'STOP')]
+    assert optimized(instructions, ('merge_labels',)) == instructions
+
+def test_samples_print_the_same_without_peephole():
+    inputs = [5, 3, 1, 2, 3, 4, 5, 6, 7, 8, 9]
+    for path in sorted(glob.glob(os.path.join(SAMPLES, '*', '*.py'))):
+        if os.path.relpath(path, SAMPLES) in UNSUPPORTED:
+            continue
+        with open(path) as f:
+            source = f.read()
+        assert simulated(source, inputs) == simulated(source, inputs, {'peephole': False}), path
+        assert len(translator.program_listing(ast.parse(source))) <= len(
+            translator.program_listing(ast.parse(source), {'peephole': False})), path
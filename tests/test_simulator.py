@@ -0,0 +1,14 @@
+import pytest
+
+from simulator.Pep9Simulator import Pep9Simulator, SimulationError
+
+def test_rejects_duplicate_symbols():
+    with pytest.raises(SimulationError):
+        Pep9Simulator([(None, 'STOP'), ('x', '.WORD 1'), ('x', '.WORD 2'), (None, '.END')])
+    with pytest.raises(SimulationError):
+        Pep9Simulator([('n', '.EQUATE 2'), (None, 'STOP'), ('n', '.BLOCK 2'), (None, '.END')])
+
+def test_runs_a_listing():
+    simulator = Pep9Simulator([(None, 'DECI x,d'), (None, 'DECO x,d'), (None, 'STOP'), ('x', '.BLOCK 2'), (None, '.END')], [42])
+    simulator.run()
+    assert simulator.output == [42]
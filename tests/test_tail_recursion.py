@@ -0,0 +1,69 @@
+import ast
+
+import translator
+from optimizers.TailRecursion import TailRecursion
+from simulator.Pep9Simulator import Pep9Simulator
+
+def transformed(source):
+    root = ast.parse(source)
+    recursion = TailRecursion(root)
+    recursion.run()
+    return root, recursion
+
+def calls(root, name):
+    return [n for n in ast.walk(root) if isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id == name]
+
+def stack_depth(source, inputs):
+    simulator = Pep9Simulator(translator.program_listing(ast.parse(source)), inputs)
+    simulator.run()
+    return simulator.stats()['max_stack_depth']
+
+def test_tail_call(check):
+    source = ('def gcd(a, b):\n'
+              '    if b == 0:\n'
+              '        return a\n'
+              '    return gcd(b, a % b)\n'
+              'x = int(input())\n'
+              'y = int(input())\n'
+              'r = gcd(x, y)\n'
+              'print(r)\n')
+    root, recursion = transformed(source)
+    assert recursion.transformed == ['gcd'] and len(calls(root, 'gcd')) == 1
+    check(source, vectors=([84, 36], [17, 5], [9, 0], [0, 9]))
+
+def test_product_accumulator(check):
+    source = ('def fac(n):\n'
+              '    if n <= 1:\n'
+              '        return 1\n'
+              '    return n * fac(n - 1)\n'
+              'x = int(input())\n'
+              'r = fac(x)\n'
+              'print(r)\n')
+    root, recursion = transformed(source)
+    assert recursion.transformed == ['fac'] and len(calls(root, 'fac')) == 1
+    check(source, vectors=([0], [1], [7], [12]))
+    # a loop: the stack does not grow with n
+    assert stack_depth(source, [3]) == stack_depth(source, [12])
+
+def test_sum_accumulator_through_a_temporary(check):
+    source = ('def total(n, k):\n'
+              '    if n == 0:\n'
+              '        return k\n'
+              '    r = total(n - 1, k)\n'
+              '    return r + n\n'
+              'x = int(input())\n'
+              'r = total(x, 1000)\n'
+              'print(r)\n')
+    root, recursion = transformed(source)
+    assert recursion.transformed == ['total'] and len(calls(root, 'total')) == 1
+    check(source, vectors=([0], [10], [200]))
+
+def test_two_recursive_calls_are_left_alone():
+    source = ('def fib(n):\n'
+              '    if n < 2:\n'
+              '        return n\n'
+              '    return fib(n - 1) + fib(n - 2)\n'
+              'r = fib(10)\n'
+              'print(r)\n')
+    root, recursion = transformed(source)
+    assert recursion.transformed == [] and len(calls(root, 'fib')) == 3
@@ -0,0 +1,40 @@
+import ast
+
+import pytest
+
+import translator
+
+def test_unary_operators(check):
+    check('x = int(input())\n'
+          'y = -x\n'
+          'z = ~x\n'
+          'w = +x\n'
+          'print(y)\nprint(z)\nprint(w)\n'
+          'y = 5 - -x\n'
+          'z = -(x + 3) + x\n'
+          'w = -x * 3\n'
+          'print(y)\nprint(z)\nprint(w)\n',
+          vectors=([7], [0], [-12], [32767]))
+
+def test_unary_operators_of_locals_and_arguments(check):
+    check('def neg(a):\n'
+          '    b = -a\n'
+          '    return ~b\n'
+          'x = int(input())\n'
+          'y = neg(-x)\n'
+          'print(y)\n',
+          vectors=([4], [-9]))
+
+def test_not_is_only_a_condition():
+    with pytest.raises(ValueError):
+        translator.program_listing(ast.parse('x = int(input())\ny = not x\nprint(y)\n'))
+
+def test_negative_constant_indices(check):
+    source = ('a_ = [3, 5, 7]\n'
+              'x = int(input())\n'
+              'a_[-3] = x\n'
+              'j = a_[-1]\n'
+              'k = a_[-3] + x\n'
+              'print(j)\nprint(k)\n')
+    for options in ({}, {'constant_folding': False}):
+        check(source, vectors=([4], [-2]), options=options)
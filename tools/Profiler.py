@@ -0,0 +1,136 @@
+import ast
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+class Profiler():
+    """
+        Where a translation spends its time: wall time of every phase of the
+        pipeline, in order, and the number of nodes each visitor method
+        handled. Optionally the phases also run under cProfile, or under
+        tracemalloc for the peak memory each one allocates (both slow the
+        phases down: time and measure memory in separate runs).
+
+        The pipeline takes a Profiler; a disabled one (the default) costs one
+        attribute test per phase. summary() is a plain dict, for CI checks
+        comparing runs, trace() the same phases as Chrome trace events
+        (chrome://tracing, Perfetto).
+    """
+
+    def __init__(self, enabled = True, cprofile = False, memory = False) -> None:
+        self.enabled = enabled
+        self.phases = []            # (name, start, seconds), start relative to the creation of the profiler
+        self.memory = {}            # name -> peak bytes allocated during the phase, when profiling memory
+        self.visits = Counter()     # 'Visitor.visit_Node' -> nodes visited
+        self.counters = {}          # sizes worth reporting with the times (AST nodes, instructions...)
+        self.__cprofile = cProfile.Profile() if enabled and cprofile else None
+        self.__tracing = enabled and memory
+        self.__started = self.__tracing and not tracemalloc.is_tracing()
+        if self.__started:
+            tracemalloc.start()
+        self.__origin = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the code run in the with block as one phase"""
+        if not self.enabled:
+            yield
+            return
+        if self.__tracing:
+            tracemalloc.reset_peak()
+            allocated = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        if self.__cprofile is not None:
+            self.__cprofile.enable()
+        try:
+            yield
+        finally:
+            if self.__cprofile is not None:
+                self.__cprofile.disable()
+            self.phases.append((name, start - self.__origin, time.perf_counter() - start))
+            if self.__tracing:
+                peak = tracemalloc.get_traced_memory()[1] - allocated
+                self.memory[name] = max(self.memory.get(name, 0), peak)
+
+    def instrument(self, visitor):
+        """Count the nodes an ast.NodeVisitor visits, per visit_ method. Returns visitor"""
+        if not self.enabled or not isinstance(visitor, ast.NodeVisitor):
+            return visitor
+        visit = visitor.visit
+        owner = type(visitor).__name__
+        methods = {}
+        def counting(node):
+            kind = node.__class__
+            if kind not in methods:
+                method = 'visit_' + kind.__name__
+                methods[kind] = f'{owner}.{method if hasattr(visitor, method) else "generic_visit"}'
+            self.visits[methods[kind]] += 1
+            return visit(node)
+        # NodeVisitor dispatches children through self.visit: the instance attribute catches them all
+        visitor.visit = counting
+        return visitor
+
+    def count(self, name, value):
+        self.counters[name] = value
+
+    def stop(self):
+        """Stop tracing the memory allocations, when this profiler started it"""
+        if self.__started:
+            tracemalloc.stop()
+        self.__tracing = self.__started = False
+
+    ####
+    ## Reports
+    ####
+
+    def total(self):
+        return sum(seconds for _, _, seconds in self.phases)
+
+    def summary(self):
+        """Phases (seconds, summed when a phase runs more than once), peak bytes, visits and counters"""
+        phases = {}
+        for name, _, seconds in self.phases:
+            phases[name] = phases.get(name, 0) + seconds
+        return {'total': self.total(), 'phases': phases, 'memory': dict(self.memory),
+                'visits': dict(self.visits.most_common()), 'counters': dict(self.counters)}
+
+    def text(self):
+        """Human readable report, one line per phase then per visitor method"""
+        total = self.total() or 1
+        lines = [f'{"phase":<24} {"ms":>9} {"%":>6}' + (f' {"peak KiB":>9}' if self.memory else '')]
+        for name, seconds in self.summary()['phases'].items():
+            peak = f' {self.memory.get(name, 0) / 1024:>9.1f}' if self.memory else ''
+            lines.append(f'{name:<24} {seconds * 1000:>9.3f} {seconds / total * 100:>6.1f}{peak}')
+        lines.append(f'{"total":<24} {self.total() * 1000:>9.3f}')
+        for name, value in self.counters.items():
+            lines.append(f'{name:<24} {value:>9}')
+        if self.visits:
+            lines.append(f'{"visitor method":<48} {"nodes":>9}')
+            for name, count in self.visits.most_common():
+                lines.append(f'{name:<48} {count:>9}')
+        return '\n'.join(lines)
+
+    def trace(self):
+        """The phases as Chrome trace events (complete events, in microseconds)"""
+        events = [{'name': name, 'cat': 'phase', 'ph': 'X', 'ts': start * 1e6, 'dur': seconds * 1e6, 'pid': os.getpid(), 'tid': 0}
+                  for name, start, seconds in self.phases]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'visits': dict(self.visits), 'counters': self.counters}}
+
+    def dumpStats(self, path):
+        """Write the cProfile statistics of the phases, for `python -m pstats path` or snakeviz"""
+        if self.__cprofile is None:
+            raise ValueError('The profiler was not created with cprofile=True')
+        self.__cprofile.dump_stats(path)
+
+    def hotspots(self, limit = 15):
+        """The functions taking the most cumulative time under cProfile, as text"""
+        if self.__cprofile is None:
+            return ''
+        out = io.StringIO()
+        pstats.Stats(self.__cprofile, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,126 @@
+import hashlib
+import os
+
+class TranslationCache():
+    """
+        On-disk, content-addressed cache of translated listings.
+
+        Entries are keyed by a hash of the source text and of the translator
+        version, so an unchanged program skips parsing and code generation.
+        The cache is bounded in bytes: the least recently used entries (by
+        modification time, refreshed on every hit) are evicted first. The size
+        and number of entries are counted once, then kept up to date by put():
+        the directory is only scanned again when they exceed the budget. Each
+        process sharing the directory counts its own writes between scans, so
+        the others can briefly take it past maxBytes.
+    """
+
+    def __init__(self, directory, maxBytes = 64 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.__bytes = None     # size and number of the entries, counted on the first put or stats
+        self.__count = None
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(source, version):
+        digest = hashlib.sha256()
+        digest.update(version.encode())
+        digest.update(b'\0')
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        path = self.__path(key)
+        try:
+            with open(path) as f:
+                text = f.read()
+            os.utime(path)  # refresh the entry for LRU eviction
+        except FileNotFoundError:  # never stored, or evicted by another worker
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text
+
+    def put(self, key, text):
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write then rename, so concurrent readers never see a partial entry
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w') as f:
+            f.write(text)
+        size = os.path.getsize(temporary)
+        if self.__bytes is None:
+            self.__countEntries()
+        try:
+            replaced = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced = None
+        os.replace(temporary, path)
+        if replaced is None:
+            self.__count += 1
+        self.__bytes += size - (replaced or 0)
+        if self.__bytes > self.maxBytes:
+            self.__evict()
+
+    def stats(self):
+        if self.__bytes is None:
+            self.__countEntries()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': self.__count,
+            'bytes': self.__bytes,
+            'max_bytes': self.maxBytes,
+        }
+
+    ####
+    ## Helper functions
+    ####
+
+    def __path(self, key):
+        # fan out on the first two hex digits to keep directories small
+        return os.path.join(self.directory, key[:2], key + '.pep')
+
+    def __entries(self):
+        """(modification time, size, path) of every entry"""
+        entries = []
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if not entry.name.endswith('.pep'):
+                    continue
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, entry.path))
+        return entries
+
+    def __countEntries(self):
+        entries = self.__entries()
+        self.__bytes = sum(size for _, size, _ in entries)
+        self.__count = len(entries)
+
+    def __evict(self):
+        # the entries of other processes, and their last hits, are only known from the directory
+        entries = self.__entries()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+            count -= 1
+        self.__bytes = total
+        self.__count = count
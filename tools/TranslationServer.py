@@ -0,0 +1,149 @@
+import json
+import os
+import socketserver
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+class TranslationServer():
+    """
+        Long-running translator: the interpreter starts and the visitors and
+        generators are imported once, then every request only pays for its
+        translation.
+
+        The protocol is line-delimited JSON, over stdin/stdout or over the
+        connections of a Unix socket. A request is an object with an "op"
+        ("translate", the default, "ping" or "shutdown") and an optional "id"
+        echoed in its response; the other fields are passed to handler.
+        Responses come back as the translations finish, not necessarily in
+        the order of the requests.
+
+        Translations run on a pool of `jobs` worker processes, forked after
+        the imports so they start warm. At most `backlog` requests are queued
+        or running at once: reading stops until one finishes, so a client
+        flooding the server cannot grow its memory.
+    """
+
+    def __init__(self, handler, jobs = None, backlog = None, version = None) -> None:
+        self.handler = handler      # module-level function: request dict -> response dict, run in a worker
+        self.jobs = jobs or os.cpu_count() or 1
+        self.backlog = backlog or 4 * self.jobs
+        self.version = version
+        self.requests = 0
+        self.__slots = threading.BoundedSemaphore(self.backlog)
+        self.__pool = None
+        self.__stopping = threading.Event()
+        self.__socketServer = None
+
+    def serveStream(self, infile, outfile):
+        """Answer the requests read from infile on outfile, until EOF or a shutdown request"""
+        with self.__started():
+            self.__serve(infile, outfile)
+
+    def serveSocket(self, path):
+        """Answer the requests of every connection to the Unix socket at path, until a shutdown request"""
+        serve = self.__serve
+
+        class Connection(socketserver.StreamRequestHandler):
+            def handle(self):
+                serve(self.rfile, self.wfile)
+
+        if os.path.exists(path):
+            os.remove(path)
+        with self.__started(), socketserver.ThreadingUnixStreamServer(path, Connection) as self.__socketServer:
+            self.__socketServer.daemon_threads = True
+            try:
+                self.__socketServer.serve_forever()
+            finally:
+                self.__socketServer = None
+                os.remove(path)
+
+    ####
+    ## Requests
+    ####
+
+    def __serve(self, infile, outfile):
+        lock = threading.Lock()
+        binary = not hasattr(outfile, 'encoding')
+        idle = threading.Condition()
+        outstanding = 0     # requests of this client still being translated
+
+        def reply(response):
+            line = json.dumps(response) + '\n'
+            with lock:
+                outfile.write(line.encode() if binary else line)
+                outfile.flush()
+
+        def done(future, id):
+            nonlocal outstanding
+            self.__slots.release()
+            try:
+                response = future.result()
+            except Exception as e:  # a worker process died
+                response = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+            try:
+                reply({'id': id, **response})
+            finally:
+                with idle:
+                    outstanding -= 1
+                    idle.notify_all()
+
+        for line in infile:
+            if self.__stopping.is_set():
+                break
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError('a request is a JSON object')
+            except ValueError as e:
+                reply({'id': None, 'ok': False, 'error': f'Invalid request: {e}'})
+                continue
+            id = request.get('id')
+            op = request.get('op', 'translate')
+            if op == 'ping':
+                reply({'id': id, 'ok': True, 'version': self.version, 'requests': self.requests})
+            elif op == 'shutdown':
+                reply({'id': id, 'ok': True})
+                self.__stop()
+                break
+            elif op == 'translate':
+                self.__slots.acquire()
+                self.requests += 1
+                with idle:
+                    outstanding += 1
+                try:
+                    future = self.__pool.submit(self.handler, request)
+                except Exception as e:  # the pool is broken or shutting down
+                    self.__slots.release()
+                    with idle:
+                        outstanding -= 1
+                    reply({'id': id, 'ok': False, 'error': f'{type(e).__name__}: {e}'})
+                    continue
+                future.add_done_callback(lambda f, id = id: done(f, id))
+            else:
+                reply({'id': id, 'ok': False, 'error': f'Unknown op: {op}'})
+        # answer everything this client asked before closing its stream
+        with idle:
+            idle.wait_for(lambda: outstanding == 0)
+
+    def __stop(self):
+        self.__stopping.set()
+        if self.__socketServer is not None:
+            # shutdown() waits for serve_forever, which runs in another thread
+            threading.Thread(target=self.__socketServer.shutdown).start()
+
+    ####
+    ## Worker pool
+    ####
+
+    @contextmanager
+    def __started(self):
+        self.__stopping.clear()
+        self.__pool = ProcessPoolExecutor(max_workers=self.jobs)
+        try:
+            yield self.__pool
+        finally:
+            self.__pool.shutdown(wait=True)
+            self.__pool = None
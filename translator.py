@@ -1,55 +1,497 @@
 import argparse
 import ast
-from visitors.BottomLevelProgram import BottomLevelProgram
+import functools
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from visitors.GlobalVariables import GlobalVariableExtraction
 from visitors.TopLevelProgram import TopLevelProgram
 from visitors.LocalVariables import LocalVariableExtraction
+from visitors.LoopNesting import LoopNesting
 from generators.StaticMemoryAllocation import StaticMemoryAllocation
-from generators.EntryPoint import EntryPoint
 from generators.DynamicMemoryAllocation import DynamicMemoryAllocation
+from generators.OutputSink import OutputSink
+from generators.Program import Program
+from generators.RuntimeLibrary import RuntimeLibrary
+from generators.Assembler import Assembler, AssemblyError
+from optimizers.ConstantFolding import ConstantFolding
+from optimizers.LoopOptimization import LoopOptimization
+from optimizers.DeadCodeElimination import DeadCodeElimination
+from optimizers.LoopIdioms import LoopIdioms
+from optimizers.FunctionInlining import FunctionInlining
+from optimizers.TailRecursion import TailRecursion
+from optimizers.Memoization import Memoization
+from optimizers.PeepholeOptimizer import PeepholeOptimizer
+from optimizers.RegisterAllocation import RegisterAllocation
+from simulator.Pep9Simulator import Pep9Simulator, SimulationError
+from tools.Profiler import Profiler
+from tools.TranslationCache import TranslationCache
+from tools.TranslationServer import TranslationServer
+
+TRANSLATOR_VERSION = '0.2'
+# the code the listings depend on, fingerprinted in translator_version()
+TRANSLATOR_PACKAGES = ('visitors', 'generators', 'optimizers')
+
+# code generation options, overridden from the command line or by callers of process()
+DEFAULT_OPTIONS = {
+    'loop_idioms': True,
+    'inlining': True,
+    'inline_statements': FunctionInlining.MAX_STATEMENTS,
+    'tail_recursion': True,
+    'memoization': False,
+    'memo_entries': Memoization.ENTRIES,
+    'constant_folding': True,
+    'loop_optimization': True,
+    'loop_log': False,
+    'dead_code': True,
+    'peephole': True,
+    'peephole_rules': PeepholeOptimizer.RULES,
+    'index_registers': True,
+}
 
 def main():
-    input_file, print_ast = process_cli()
+    args = process_cli()
+    options = translation_options(args)
+    if args['serve'] or args['socket']:
+        server = TranslationServer(functools.partial(translate_request, defaults=options), args['jobs'], args['backlog'], translator_version())
+        if args['socket']:
+            server.serveSocket(args['socket'])
+        else:
+            server.serveStream(sys.stdin, sys.stdout)
+        return
+    if args['batch']:
+        failures = process_batch(args['batch'], args['jobs'], args['out_dir'], args['cache'], args['cache_size'], options)
+        raise SystemExit(1 if failures else 0)
+    input_file = args['f']
     with open(input_file) as f:
         source = f.read()
-    node = ast.parse(source)
-    if print_ast:
-        print(ast.dump(node, indent=2))
+    if args['ast_only']:
+        print(ast.dump(ast.parse(source), indent=2))
+        return
+    if args['profile'] or args['profile_json'] or args['profile_stats']:
+        profile(input_file, source, options, args)
+        return
+    if args['run']:
+        simulate(program_listing(ast.parse(source), options), args['input'])
+        return
+    if args['pepo'] or args['pepl']:
+        assemble(program_listing(ast.parse(source), options), args['pepo'], args['pepl'])
+    cache = open_cache(args['cache'], args['cache_size'])
+    text = translate_text(input_file, source, cache, options)
+    if args['o'] is None:
+        sys.stdout.write(text)
     else:
-        process(input_file, node)
-    
+        with open(args['o'], 'w') as out:
+            out.write(text)
+    if cache is not None and args['cache_stats']:
+        print_cache_stats(cache.stats())
+
 def process_cli():
     """"Process Command Line Interface options"""
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', help='filename to compile (.py)')
+    parser.add_argument('-o', default=None, metavar='FILE',
+                        help='write the listing to FILE instead of stdout')
     parser.add_argument('--ast-only', default=False, action='store_true')
+    parser.add_argument('--batch', nargs='+', metavar='PATH',
+                        help='files, directories or glob patterns to compile, one .pep per input')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='number of worker processes for --batch and server mode (default: one per core)')
+    parser.add_argument('--out-dir', default=None,
+                        help='directory receiving the .pep files of --batch (default: next to each input)')
+    parser.add_argument('--serve', default=False, action='store_true',
+                        help='keep running and translate the requests read from stdin, one JSON object per line, answered on stdout')
+    parser.add_argument('--socket', default=None, metavar='PATH',
+                        help='like --serve, over the connections of a Unix socket created at PATH')
+    parser.add_argument('--backlog', type=int, default=None, metavar='N',
+                        help='requests queued or running at once in server mode (default: 4 per worker)')
+    parser.add_argument('--run', default=False, action='store_true',
+                        help='execute the translation on the built-in Pep/9 simulator and report its statistics')
+    parser.add_argument('--pepo', default=None, metavar='FILE',
+                        help='also assemble the translation and write its object code (hex, as the Pep/9 loader reads it) to FILE')
+    parser.add_argument('--pepl', default=None, metavar='FILE',
+                        help='also assemble the translation and write its listing, with addresses and object code, to FILE')
+    parser.add_argument('--profile', default=False, action='store_true',
+                        help='time every phase of the translation and count the nodes each visitor method visits, reported on stderr (bypasses --cache)')
+    parser.add_argument('--profile-json', default=None, metavar='FILE',
+                        help='write the profile to FILE as a Chrome trace (chrome://tracing, Perfetto), with the visit counts')
+    parser.add_argument('--profile-stats', default=None, metavar='FILE',
+                        help='also run the phases under cProfile and write its statistics to FILE (python -m pstats FILE)')
+    parser.add_argument('--input', nargs='*', type=int, default=[], metavar='N',
+                        help='values read by DECI when using --run')
+    parser.add_argument('--no-loop-idioms', dest='loop_idioms', default=True, action='store_false',
+                        help='keep the loops multiplying by repeated addition or dividing by repeated subtraction')
+    parser.add_argument('--no-inlining', dest='inlining', default=True, action='store_false',
+                        help='keep every function call, even of small leaf functions')
+    parser.add_argument('--no-tail-recursion', dest='tail_recursion', default=True, action='store_false',
+                        help='keep recursive calls instead of turning tail recursion into loops')
+    parser.add_argument('--memoize', dest='memoization', default=False, action='store_true',
+                        help='cache the results of pure recursive functions of one integer in static tables')
+    parser.add_argument('--no-constant-folding', dest='constant_folding', default=True, action='store_false',
+                        help='do not fold constant expressions nor propagate constant globals')
+    parser.add_argument('--no-loop-optimization', dest='loop_optimization', default=True, action='store_false',
+                        help='keep invariant computations and products of induction variables inside the loops')
+    parser.add_argument('--loop-log', default=False, action='store_true',
+                        help='list every computation the loop optimization moved or reduced in the listing')
+    parser.add_argument('--no-dead-code', dest='dead_code', default=True, action='store_false',
+                        help='keep unreachable functions, dead stores and unread arrays')
+    parser.add_argument('--no-peephole', dest='peephole', default=True, action='store_false',
+                        help='print the instructions exactly as generated, without the peephole pass')
+    parser.add_argument('--no-index-registers', dest='index_registers', default=True, action='store_false',
+                        help='keep loop induction variables in memory instead of the index register X')
+    parser.add_argument('--peephole-rules', default=None, metavar='RULE,...',
+                        help=f'peephole rules to apply (default: {",".join(PeepholeOptimizer.RULES)})')
+    parser.add_argument('--cache', default=None, metavar='DIR',
+                        help='reuse translations of unchanged sources stored in DIR')
+    parser.add_argument('--cache-size', type=int, default=64, metavar='MB',
+                        help='maximum size of the cache before least recently used entries are evicted')
+    parser.add_argument('--cache-stats', default=False, action='store_true',
+                        help='print cache hit/miss statistics after translating')
     args = vars(parser.parse_args())
-    return args['f'], args['ast_only']
+    if args['f'] is None and args['batch'] is None and not args['serve'] and args['socket'] is None:
+        parser.error('one of -f, --batch, --serve or --socket is required')
+    return args
+
+def translation_options(args):
+    """Code generation options selected on the command line"""
+    options = dict(DEFAULT_OPTIONS)
+    options['loop_idioms'] = args['loop_idioms']
+    options['inlining'] = args['inlining']
+    options['tail_recursion'] = args['tail_recursion']
+    options['memoization'] = args['memoization']
+    options['constant_folding'] = args['constant_folding']
+    options['loop_optimization'] = args['loop_optimization']
+    options['loop_log'] = args['loop_log']
+    options['dead_code'] = args['dead_code']
+    options['peephole'] = args['peephole']
+    options['index_registers'] = args['index_registers']
+    if args['peephole_rules'] is not None:
+        options['peephole_rules'] = tuple(r.strip() for r in args['peephole_rules'].split(',') if r.strip())
+    return options
+
+def process(input_file, root_node, options = None, sink = None, profiler = None):
+    """Translate root_node into sink (a buffered sink on stdout by default), returns the notes of the optimizers"""
+    profiler = profiler or Profiler(enabled=False)
+    owned = sink is None
+    if owned:
+        sink = OutputSink(sys.stdout)
+
+    program = Program(input_file, *pipeline(root_node, options, profiler))
+    with profiler.phase('output'):
+        program.generate(sink)
+
+    if owned:
+        sink.flush()
+    return program.notes
+
+def translate(source, options = None, input_file = '<source>', profiler = None):
+    """Translate Python source into a Program, printing nothing: its sections are (label, instruction) pairs
+       and its listing text is only formatted by render()"""
+    profiler = profiler or Profiler(enabled=False)
+    with profiler.phase('parse'):
+        root_node = ast.parse(source, input_file)
+    return Program(input_file, *pipeline(root_node, options, profiler))
+
+def pipeline(root_node, options = None, profiler = None):
+    """Extract the variables, allocate them and generate the instructions of root_node.
+       Returns the two allocators, the instructions and notes reported by the optimizers.
+       The AST optimizations transform root_node in place. A Profiler times every phase"""
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    profiler = profiler or Profiler(enabled=False)
+    notes = []
+    if profiler.enabled:
+        profiler.count('ast_nodes', sum(1 for _ in ast.walk(root_node)))
+
+    def optimize(name, optimizer, *args):
+        with profiler.phase(name):
+            optimizer = profiler.instrument(optimizer(root_node, *args))
+            optimizer.run()
+        notes.append(optimizer.report())
+        return optimizer
+
+    # a helper multiplying by repeated addition shrinks to one statement, small enough to inline
+    if options['loop_idioms']:
+        optimize('loop idioms', LoopIdioms)
+    # inlined helpers can expose the operator of an accumulating recursion, and the
+    # arguments substituted in the inlined bodies are then folded
+    if options['inlining']:
+        optimize('inlining', FunctionInlining, options['inline_statements'])
+    if options['tail_recursion']:
+        optimize('tail recursion', TailRecursion)
+    # after TailRecursion: the functions still recursive are the ones recursing more than once
+    if options['memoization']:
+        optimize('memoization', Memoization, options['memo_entries'])
+    if options['constant_folding']:
+        optimize('constant folding', ConstantFolding)
+    # after folding: constants are no longer variables, more expressions are invariant
+    if options['loop_optimization']:
+        loops = optimize('loop optimization', LoopOptimization)
+        if options['loop_log']:
+            notes.extend(loops.log)
+    # last: the passes above leave copies and counters nobody reads, the allocators must not see them
+    if options['dead_code']:
+        optimize('dead code', DeadCodeElimination)
+    if profiler.enabled:
+        profiler.count('ast_nodes_optimized', sum(1 for _ in ast.walk(root_node)))
+
+    with profiler.phase('variables'):
+        globalExtractor = profiler.instrument(GlobalVariableExtraction(root_node))
+        globalExtractor.visit(root_node)
+
+        localExtractor = profiler.instrument(LocalVariableExtraction(root_node, globalExtractor.symbols))
+        localExtractor.visit(root_node)
+
+    with profiler.phase('allocation'):
+        global_memory_alloc = StaticMemoryAllocation(globalExtractor.symbols)
+        local_memory_alloc = DynamicMemoryAllocation(globalExtractor.symbols)
+
+    with profiler.phase('code generation'):
+        nesting = LoopNesting(root_node)
+        runtime = RuntimeLibrary()
+        registers = None
+        if options['index_registers']:
+            registers = RegisterAllocation(root_node)
+            notes.append(registers.report())
+        top_level = profiler.instrument(TopLevelProgram('tl', globalExtractor.symbols, nesting, runtime, registers))
+        top_level.visit(root_node)
+
+        # the runtime routines and the functions sit before tl, where `BR tl` jumps over them
+        global_memory_alloc.reserve(runtime.directives())
+        instructions = runtime.instructions() + top_level.finalize()
+    profiler.count('instructions', len(instructions))
+
+    if options['peephole']:
+        with profiler.phase('peephole'):
+            # functions are entered by CALL: their labels must survive like the entry point's
+            keep = ['tl'] + [scope.label for scope in globalExtractor.symbols.scopes()]
+            peephole = PeepholeOptimizer(instructions, options['peephole_rules'], keep)
+            instructions = peephole.optimize()
+        notes.append(peephole.report())
+        profiler.count('instructions_optimized', len(instructions))
+
+    return global_memory_alloc, local_memory_alloc, instructions, notes
+
+def program_listing(root_node, options = None):
+    """The whole translated program as (label, instruction) pairs, in listing order"""
+    return Program(None, *pipeline(root_node, options)).listing()
+
+def simulate(program, inputs):
+    """Run a program on the Pep/9 simulator, print its output then its execution statistics"""
+    simulator = Pep9Simulator(program, inputs)
+    try:
+        simulator.run()
+    except SimulationError as e:
+        print(simulator.text())
+        raise SystemExit(f'; simulation failed: {e}')
+    print(simulator.text())
+    for name, value in simulator.stats().items():
+        print(f'; {name:<16} {value}')
+
+def assemble(program, object_file = None, listing_file = None):
+    """Assemble a program with the built-in assembler, write its object code and listing, returns the Assembler"""
+    try:
+        assembler = Assembler(program)
+    except AssemblyError as e:
+        raise SystemExit(f'; assembly failed: {e}')
+    if object_file is not None:
+        with open(object_file, 'w') as out:
+            out.write(assembler.objectCode())
+    if listing_file is not None:
+        with open(listing_file, 'w') as out:
+            out.write(assembler.listing())
+    return assembler
+
+####
+## Profiling: where a translation spends its time, to spot scaling regressions
+####
+
+def profile_translation(input_file, source, options = None, cprofile = False, memory = False):
+    """Translate source with every phase timed (and its peak memory measured), returns the listing and the Profiler"""
+    profiler = Profiler(cprofile=cprofile, memory=memory)
+    try:
+        program = translate(source, options, input_file, profiler)
+        with profiler.phase('output'):
+            text = program.render()
+    finally:
+        profiler.stop()
+    return text, profiler
+
+def profile(input_file, source, options, args):
+    """--profile: translate as usual, the report goes to stderr and the trace or cProfile statistics to files"""
+    text, profiler = profile_translation(input_file, source, options, args['profile_stats'] is not None)
+    if args['o'] is None:
+        sys.stdout.write(text)
+    else:
+        with open(args['o'], 'w') as out:
+            out.write(text)
+    print(profiler.text(), file=sys.stderr)
+    if args['profile_json'] is not None:
+        with open(args['profile_json'], 'w') as out:
+            json.dump(profiler.trace(), out, indent=1)
+    if args['profile_stats'] is not None:
+        profiler.dumpStats(args['profile_stats'])
+        print(profiler.hotspots(), file=sys.stderr)
+
+####
+## Translation cache: unchanged sources skip parsing and code generation
+####
+
+@functools.cache
+def translator_version():
+    """TRANSLATOR_VERSION plus a fingerprint of the translator code, so any change to a visitor, generator or optimizer invalidates the cache"""
+    digest = hashlib.sha256(TRANSLATOR_VERSION.encode())
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = [path for package in TRANSLATOR_PACKAGES for path in sorted(glob.glob(os.path.join(root, package, '*.py')))]
+    for path in paths + [os.path.join(root, 'translator.py')]:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return f'{TRANSLATOR_VERSION}+{digest.hexdigest()[:16]}'
+
+def open_cache(directory, size_mb):
+    if directory is None:
+        return None
+    return TranslationCache(directory, size_mb * 1024 * 1024)
+
+@functools.cache
+def worker_cache(directory, size_mb):
+    """The cache of a batch worker process, kept across its files so the entries are only counted once"""
+    return open_cache(directory, size_mb)
+
+def translate_text(input_file, source, cache = None, options = None):
+    """Translated listing of source, served from the cache when the source is unchanged"""
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    if cache is not None:
+        # the same source translated with other options is another entry
+        key = cache.key(source, f'{translator_version()} {sorted(options.items())}')
+        body = cache.get(key)
+        if body is not None:
+            return f'; Translating {input_file}\n' + body
+    text = translate(source, options, input_file).render()
+    if cache is not None:
+        # the header names the input file: keep it out of the content-addressed entry
+        cache.put(key, text.split('\n', 1)[1])
+    return text
+
+def print_cache_stats(stats):
+    lookups = stats['hits'] + stats['misses']
+    ratio = stats['hits'] / lookups * 100 if lookups else 0
+    print(f'; cache: {stats["hits"]} hits, {stats["misses"]} misses ({ratio:.0f}% hit rate), '
+          f'{stats["evictions"]} evictions, {stats["entries"]} entries, '
+          f'{stats["bytes"] / 1024:.1f}/{stats["max_bytes"] / 1024:.0f} KiB')
+
+####
+## Server mode: the translator stays imported, requests come as JSON lines
+####
+
+def translate_request(request, defaults = None):
+    """Worker of the server: translate request["source"], returns the listing and the diagnostics.
+       request["options"] override the options the server was started with"""
+    options = {**DEFAULT_OPTIONS, **(defaults or {})}
+    overrides = request.get('options') or {}
+    unknown = sorted(set(overrides) - set(options))
+    if unknown:
+        return {'ok': False, 'error': f'Unknown options: {", ".join(unknown)}', 'diagnostics': []}
+    options.update(overrides)
+    options['peephole_rules'] = tuple(options['peephole_rules'])
+    input_file = request.get('file', '<request>')
+    source = request.get('source')
+    if not isinstance(source, str):
+        return {'ok': False, 'error': 'The request has no "source" text', 'diagnostics': []}
+    try:
+        program = translate(source, options, input_file)
+    except SyntaxError as e:
+        return {'ok': False, 'error': f'SyntaxError: {e.msg}', 'diagnostics': [{'severity': 'error', 'message': e.msg, 'line': e.lineno}]}
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        return {'ok': False, 'error': error, 'diagnostics': [{'severity': 'error', 'message': error}]}
+    return {'ok': True, 'listing': program.render(), 'diagnostics': [{'severity': 'info', 'message': note} for note in program.notes]}
 
-def process(input_file, root_node):
-    
-    print(f'; Translating {input_file}')
-    globalExtractor = GlobalVariableExtraction(root_node)
-    globalExtractor.visit(root_node)
+####
+## Batch mode: many inputs, one .pep per input, fanned out over a process pool
+####
 
-    localExtractor = LocalVariableExtraction(root_node, globalExtractor.renamedVariables)
-    localExtractor.visit(root_node)
+def expand_inputs(patterns):
+    """Expand files, directories (recursively) and glob patterns into a list of .py files"""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, '**', '*.py'), recursive=True))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for match in matches:
+            if match not in files:
+                files.append(match)
+    return files
 
-    global_memory_alloc = StaticMemoryAllocation(globalExtractor.results)
-    local_memory_alloc = DynamicMemoryAllocation(localExtractor.results, localExtractor.returns)
+def output_path(input_file, root, out_dir):
+    """x.py is written as x.pep, next to its source or mirrored under out_dir"""
+    if out_dir is None:
+        return os.path.splitext(input_file)[0] + '.pep'
+    relative = os.path.relpath(os.path.abspath(input_file), root)
+    return os.path.join(out_dir, os.path.splitext(relative)[0] + '.pep')
 
-    print('; Branching to top level (tl) instructions')
-    print('\t\tBR tl')
+def translate_file(input_file, output_file, cache_dir = None, cache_size = 64, options = None):
+    """Worker: translate one file, returns (input_file, output_file, seconds, error, cache hits)"""
+    start = time.perf_counter()
+    error = None
+    cache = worker_cache(cache_dir, cache_size)
+    hits = cache.hits if cache is not None else 0
+    try:
+        with open(input_file) as f:
+            source = f.read()
+        text = translate_text(input_file, source, cache, options)
+        directory = os.path.dirname(output_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(output_file, 'w') as out:
+            out.write(text)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+        # never leave a half written listing behind
+        if os.path.exists(output_file):
+            os.remove(output_file)
+    hits = cache.hits - hits if cache is not None else 0
+    return input_file, output_file, time.perf_counter() - start, error, hits
 
-    global_memory_alloc.generate()
-    local_memory_alloc.generate()
+def process_batch(patterns, jobs = None, out_dir = None, cache_dir = None, cache_size = 64, options = None):
+    """Translate every input over a process pool, print a summary, return the failures"""
+    files = expand_inputs(patterns)
+    if not files:
+        print('; No input files found')
+        return []
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+    outputs = [output_path(f, root, out_dir) for f in files]
 
-    top_level = TopLevelProgram('tl', globalExtractor.renamedVariables, localExtractor.renamedVariables, localExtractor.returns, local_memory_alloc.stackMemory)
-    top_level.visit(root_node)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # small chunks keep the workers balanced, large enough to amortize the IPC
+        chunksize = max(1, len(files) // ((jobs or os.cpu_count() or 1) * 4))
+        count = len(files)
+        results = list(pool.map(translate_file, files, outputs, [cache_dir] * count, [cache_size] * count, [options] * count, chunksize=chunksize))
+    elapsed = time.perf_counter() - start
 
-    ep = EntryPoint(top_level.finalize())
-    ep.generate() 
+    failures = [r for r in results if r[3] is not None]
+    print(f'; {"status":<6}  {"time (ms)":>9}  file')
+    for input_file, output_file, seconds, error, hits in results:
+        status = 'FAIL' if error else ('cached' if hits else 'ok')
+        print(f'; {status:<6}  {seconds * 1000:>9.2f}  {input_file}' + (f' -> {output_file}' if not error else ''))
+    for input_file, _, _, error, _ in failures:
+        print(f'; FAILED {input_file}: {error}')
+    print(f'; {len(results) - len(failures)}/{len(results)} translated, {len(failures)} failed, {elapsed:.2f}s wall time')
+    if cache_dir is not None:
+        # workers count their own hits, the entries are shared on disk
+        stats = open_cache(cache_dir, cache_size).stats()
+        stats['hits'] = sum(r[4] for r in results)
+        stats['misses'] = len(results) - stats['hits']
+        print_cache_stats(stats)
+    return failures
 
 
 if __name__ == '__main__':
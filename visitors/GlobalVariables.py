@@ -1,53 +1,61 @@
 import ast
 
+from visitors.SymbolTable import SymbolTable, STATIC, EQUATE, arrayValues, isGenerated
+
 class GlobalVariableExtraction(ast.NodeVisitor):
     """ 
         We extract all the left hand side of the global (top-level) assignments
+        into the root scope of a symbol table
     """
     
-    def __init__(self, root_node) -> None:
+    def __init__(self, root_node, symbols = None) -> None:
         super().__init__()
         self.root_node = root_node
-        self.childParent(self.root_node)
-        self.results = set()
+        self.symbols = SymbolTable() if symbols is None else symbols
         self.renamedVariables = {}
         self.renamedVariableConstant = 1
 
 
+    def visit_Module(self, node):
+        self.generic_visit(node)
+        # _CAPITAL globals assigned once with a constant are equates, not memory
+        for symbol in self.symbols:
+            if symbol.label[0] == "_" and symbol.label[1:].isupper() and symbol.constant and symbol.length is None:
+                symbol.storage = EQUATE
+
+
     def visit_Assign(self, node):  
 
         if len(node.targets) != 1:
             raise ValueError("Only unary assignments are supported")
+        if isinstance(node.targets[0], ast.Subscript):
+            return  # storing into an array element defines nothing
+
+        # the first assignment gives the initial value (the elements of an array), later ones only count
+        initialValue = node.value.value if isinstance(node.value, ast.Constant) else arrayValues(node.value)
+        self.__define(node.targets[0].id, initialValue, node)
+
+
+    def visit_AugAssign(self, node):
+        if isinstance(node.target, ast.Name):
+            self.__define(node.target.id, None, node)
 
-        if node.targets[0].id in self.renamedVariables:
+
+    def __define(self, name, initialValue, node):
+        if name in self.renamedVariables:
             pass
         else:
-            #  generate a arbitrarily defined renamed variable for variables longer than 8 characters
-            if len(node.targets[0].id) > 8:
+            #  generate a arbitrarily defined renamed variable for variables longer than 8 characters,
+            #  or named like a label of the translator
+            if len(name) > 8 or isGenerated(name):
                 renamed = "zzz" + str(self.renamedVariableConstant)
                 self.renamedVariableConstant += 1
-                self.renamedVariables[node.targets[0].id] = renamed
+                self.renamedVariables[name] = renamed
             else:
-                self.renamedVariables[node.targets[0].id] = node.targets[0].id
+                self.renamedVariables[name] = name
 
-        if any(self.renamedVariables[node.targets[0].id] == i[0] for i in self.results):  # if we've already seen it
-            pass 
-        else:
-            if isinstance(node.value, ast.Constant):
-                self.results.add((self.renamedVariables[node.targets[0].id], node.value.value))
-            else:
-                self.results.add((self.renamedVariables[node.targets[0].id], None))    
-            
-            
-    '''Credit: https://stackoverflow.com/questions/34570992/getting-parent-of-ast-node-in-python'''     
-    #  define children and parents of each node in the AST tree upon initialization
-    def childParent(self, root_node):
-        for node in ast.walk(root_node):
-            for child in ast.iter_child_nodes(node):
-                child.parent = node
-                node.child = child
+        self.symbols.define(name, self.renamedVariables[name], STATIC, initialValue, node)
             
 
     def visit_FunctionDef(self, node):
         pass
-   
\ No newline at end of file
@@ -1,56 +1,127 @@
 import ast
 
+from visitors.SymbolTable import Symbol, LOCAL, PARAM, RETURN, arrayValues, isGenerated
+
 class LocalVariableExtraction(ast.NodeVisitor):
-    """ 
-        We extract all the left hand side of the local assignments
     """
-    
-    def __init__(self, root_node, renamedGlobalVariables) -> None:
+        We extract the parameters and the left hand side of the local
+        assignments into one child scope of the symbol table per function,
+        and lay out the stack frame of every function from its own symbols
+        (an array takes one word per element):
+
+            SP ->   outgoing arguments  (arguments and return slots of the calls it makes)
+                    locals
+                    return address      (pushed by CALL)
+                    parameters          (stored by the caller, first parameter first)
+                    return value        (read by the caller after CALL)
+
+        The caller's outgoing arguments are the callee's parameters and return
+        value. Offsets are per function, but .EQUATE labels share one namespace:
+        a local whose name is already taken gets the number of its function appended,
+        and one named like a label of the translator is renamed.
+    """
+
+    def __init__(self, root_node, symbols) -> None:
         super().__init__()
         self.root_node = root_node
-        self.results = set()
-        self.renamedVariables = {}
-        self.renamedGlobalVariables = renamedGlobalVariables  
+        self.symbols = symbols
         self.renamedVariableConstant = 1
-        self.renamedReturnConstant = 1 
-        self.returns = []
-            
+        self.renamedFunctionConstant = 1
+        self.renamedReturnConstant = 1
+        self.__labels = {symbol.label for symbol in symbols}
+        self.__functions = {}  # name -> number of parameters, of every function of the module
+
+
+    def visit_Module(self, node):
+        # calls can reach functions defined further down: name them all first
+        for statement in node.body:
+            if isinstance(statement, ast.FunctionDef):
+                scope = self.symbols.scope(statement.name)
+                scope.label = statement.name
+                if len(scope.label) > 8 or isGenerated(scope.label):
+                    scope.label = "fff" + str(self.renamedFunctionConstant)
+                    self.renamedFunctionConstant += 1
+                self.__labels.add(scope.label)
+                self.__functions[statement.name] = len(statement.args.args)
+        self.generic_visit(node)
+        # the top level has no frame, only room for the arguments of its calls
+        self.symbols.outgoing = self.__outgoing([s for s in node.body if not isinstance(s, ast.FunctionDef)])
+
 
     def visit_FunctionDef(self, node):
 
-        varsForFunc = 0
+        scope = self.symbols.scope(node.name)
+        number = list(self.__functions).index(node.name) + 1
+
+        for arg in node.args.args:
+            scope.parameters.append(scope.define(arg.arg, self.__label(arg.arg, number), PARAM))
 
-        for content in node.body:
+        for content in self.__assignments(node.body):
 
-            if isinstance(content, ast.Assign):
+            if isinstance(content, ast.AugAssign):
+                name, initialValue = content.target.id, None
+            else:
                 if len(content.targets) != 1:
                     raise ValueError("Only unary assignments are supported")
+                name = content.targets[0].id
+                initialValue = content.value.value if isinstance(content.value, ast.Constant) else arrayValues(content.value)
+            if name in scope:
+                # parameters and locals assigned again keep their slot
+                scope.define(name, scope[name].label, scope[name].storage, initialValue, content)
+                continue
+            scope.define(name, self.__label(name, number), LOCAL, initialValue, content)
 
-                if content.targets[0].id in self.renamedVariables:
-                    pass
-                else:
-
-                    # create randomly defined local variable for symbol table
-
-                    if len(content.targets[0].id) > 8:
-                        renamed = "ddd" + str(self.renamedVariableConstant)
-                        self.renamedVariableConstant += 1
-                        self.renamedVariables[content.targets[0].id] = renamed
-                    else:
-                        self.renamedVariables[content.targets[0].id] = content.targets[0].id
-
-                if any(self.renamedVariables[content.targets[0].id] == i[0] for i in self.results):  # if we've already seen it
-                    pass 
-                else:
-                    if isinstance(content.value, ast.Constant):
-                        self.results.add((self.renamedVariables[content.targets[0].id], content.value.value))
-                    else:
-                        self.results.add((self.renamedVariables[content.targets[0].id], None))
-                    
-                    varsForFunc += 1
-            
-
-        # since each function needs one return value, generate random return variable
-        returnName = "rrr" + str(self.renamedReturnConstant)
+        # SP -> outgoing arguments, locals, return address, parameters, return value
+        scope.outgoing = self.__outgoing(node.body)
+        offset = scope.outgoing
+        for symbol in scope:
+            if symbol.storage == LOCAL:
+                symbol.offset = offset  # an array starts at its first element
+                offset += symbol.size
+        scope.frameSize = offset
+        offset += 2  # return address
+        for symbol in scope.parameters:
+            symbol.offset = offset
+            offset += 2
+
+        # the return value slot has no source name: it only exists in the frame
+        scope.returnSymbol = Symbol(None, "rrr" + str(self.renamedReturnConstant), RETURN)
         self.renamedReturnConstant += 1
-        self.returns.append((returnName, varsForFunc*2 + 2))
+        scope.returnSymbol.offset = offset
+
+
+    def __label(self, name, number):
+        """Label of a local or parameter of function number, unique across the program"""
+        if len(name) > 8 or isGenerated(name):
+            label = "ddd" + str(self.renamedVariableConstant)
+            self.renamedVariableConstant += 1
+        elif name not in self.__labels:
+            label = name
+        else:
+            suffix = '_' + str(number)
+            label = name[:8 - len(suffix)] + suffix
+            if label in self.__labels:
+                label = "ddd" + str(self.renamedVariableConstant)
+                self.renamedVariableConstant += 1
+        self.__labels.add(label)
+        return label
+
+    def __outgoing(self, body):
+        """Bytes needed by the largest call of body: its arguments and the return slot"""
+        size = 0
+        for statement in body:
+            for node in ast.walk(statement):
+                if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in self.__functions:
+                    size = max(size, 2 * self.__functions[node.func.id] + 2)
+        return size
+
+    def __assignments(self, body):
+        """Assignments to a name in a function body in source order, including those nested in loops and conditionals"""
+        for statement in body:
+            if isinstance(statement, ast.Assign) and not isinstance(statement.targets[0], ast.Subscript):
+                yield statement
+            elif isinstance(statement, ast.AugAssign) and isinstance(statement.target, ast.Name):
+                yield statement
+            elif isinstance(statement, (ast.While, ast.If)):
+                yield from self.__assignments(statement.body)
+                yield from self.__assignments(statement.orelse)
@@ -0,0 +1,48 @@
+import ast
+
+class LoopNesting():
+    """
+        Precomputes, in a single walk, how many loops and conditionals enclose
+        every node of the tree and which function it belongs to.
+
+        The answers live in a side table keyed by node: nothing is attached to
+        the AST itself (no parent pointers, hence no reference cycles) and every
+        lookup is O(1). Nodes created after the walk are unknown to the table
+        and reported as nested in a loop, the conservative answer.
+    """
+
+    UNKNOWN = (1, 1, None)
+
+    def __init__(self, root_node) -> None:
+        self.__table = {}
+        # explicit stack: deeply nested generated programs must not hit the recursion limit
+        stack = [(root_node, 0, 0, None)]
+        while stack:
+            node, loops, branches, function = stack.pop()
+            self.__table[node] = (loops, branches, function)
+            if isinstance(node, (ast.While, ast.For)):
+                loops += 1
+            elif isinstance(node, ast.If):
+                branches += 1
+            elif isinstance(node, ast.FunctionDef):
+                function = node.name
+            for child in ast.iter_child_nodes(node):
+                stack.append((child, loops, branches, function))
+
+    def loopDepth(self, node):
+        return self.__table.get(node, self.UNKNOWN)[0]
+
+    def inWhile(self, node):
+        return self.loopDepth(node) > 0
+
+    def branchDepth(self, node):
+        return self.__table.get(node, self.UNKNOWN)[1]
+
+    def function(self, node):
+        """Name of the function enclosing node, None at the top level"""
+        return self.__table.get(node, self.UNKNOWN)[2]
+
+    def runsOnce(self, node):
+        """True when node is straight-line top level code: outside loops, conditionals and functions"""
+        loops, branches, function = self.__table.get(node, self.UNKNOWN)
+        return loops == 0 and branches == 0 and function is None
@@ -0,0 +1,144 @@
+import ast
+import re
+
+# storage classes
+STATIC = 'static'   # global variable, .WORD or .BLOCK, accessed with ,d
+EQUATE = 'equate'   # _CAPITAL global constant, .EQUATE, accessed with ,i
+LOCAL = 'local'     # variable in the stack frame of a function, accessed with ,s
+PARAM = 'param'     # parameter of a function, stored by the caller below the return address, accessed with ,s
+RETURN = 'return'   # return value slot of a function, accessed with ,s
+
+ADDRESSING = {STATIC: 'd', EQUATE: 'i', LOCAL: 's', PARAM: 's', RETURN: 's'}
+INDEXED = {STATIC: 'x', LOCAL: 'sx'}   # addressing of an array element, X holding the byte offset
+
+# labels the translator makes up: numbered loops, conditionals, array fills, function exits and renamed
+# symbols, the entry point and the runtime routines; a name of the program never keeps one of them
+GENERATED = re.compile(r'(wh|ew|if|el|ei|bo|ar|rt|zzz|ddd|rrr|fff)[0-9]+|tl|__\w*')
+
+def isGenerated(name):
+    """Whether name could clash with a label the translator makes up"""
+    return GENERATED.fullmatch(name) is not None
+
+def arrayValues(node):
+    """Elements of an array literal (`[c] * n` or `[c1, c2, ...]`, constants only), None when node is not one"""
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+        for cells, count in ((node.left, node.right), (node.right, node.left)):
+            if isinstance(cells, ast.List):
+                if not (isinstance(count, ast.Constant) and type(count.value) is int and count.value >= 0):
+                    raise ValueError(f'Unsupported array size: {ast.unparse(count)} is not a constant')
+                return arrayValues(cells) * count.value
+    if isinstance(node, ast.List):
+        if not all(isinstance(e, ast.Constant) and type(e.value) is int for e in node.elts):
+            raise ValueError('Unsupported array: its elements must be constants')
+        return [e.value for e in node.elts]
+    return None
+
+class Symbol():
+    """A name of the program and everything the generators need to know about it"""
+
+    def __init__(self, name, label, storage, initialValue = None, initializer = None) -> None:
+        self.name = name                    # name in the Python source
+        self.label = label                  # name in the Pep/9 listing (at most 8 characters)
+        self.storage = storage              # STATIC, EQUATE, LOCAL, PARAM or RETURN
+        self.initialValue = initialValue    # constant of the first assignment, None if not a constant
+        self.initializer = initializer      # the ast.Assign giving the initial value
+        self.offset = None                  # frame offset (LOCAL, PARAM, RETURN)
+        self.length = None                  # number of elements of an array, None for a single word
+        self.assignments = 0
+
+    @property
+    def constant(self):
+        """Assigned once, with a constant"""
+        return self.assignments == 1 and self.initialValue is not None
+
+    @property
+    def addressing(self):
+        return ADDRESSING[self.storage]
+
+    @property
+    def indexedAddressing(self):
+        if self.length is None:
+            raise ValueError(f'{self.name} is not an array')
+        return INDEXED[self.storage]
+
+    @property
+    def size(self):
+        """Bytes taken in memory"""
+        return 2 if self.length is None else 2 * self.length
+
+    def __repr__(self) -> str:
+        return f'Symbol({self.name!r}, {self.label!r}, {self.storage}, initialValue={self.initialValue!r}, offset={self.offset!r})'
+
+
+class SymbolTable():
+    """
+        Symbols of one scope, indexed by their source name. Lookups are dict
+        accesses that fall back on the enclosing scope, and iteration follows
+        insertion order, so the allocators lay memory out deterministically.
+        The module is the root scope, every function gets a child scope.
+
+        A scope also carries the layout of its stack frame, filled in by
+        LocalVariableExtraction (the root scope only has outgoing arguments).
+    """
+
+    def __init__(self, name = None, parent = None) -> None:
+        self.name = name
+        self.parent = parent
+        self.__symbols = {}
+        self.__scopes = {}
+        self.label = name           # label of the function in the listing
+        self.parameters = []        # PARAM symbols, in call order
+        self.returnSymbol = None    # RETURN slot read by the caller after CALL
+        self.outgoing = 0           # bytes at the bottom of the frame for the arguments of the calls made
+        self.frameSize = 0          # bytes the function reserves itself: outgoing arguments and locals
+
+    def define(self, name, label, storage, initialValue = None, initializer = None):
+        """Symbol of name in this scope, created on its first definition.
+           An array is defined by an initialValue listing its elements"""
+        symbol = self.__symbols.get(name)
+        length = len(initialValue) if isinstance(initialValue, list) else None
+        if symbol is None:
+            symbol = Symbol(name, label, storage, initialValue, initializer)
+            symbol.length = length
+            self.__symbols[name] = symbol
+        elif symbol.length != length:
+            raise ValueError(f'Cannot change the size of {name}: arrays have a fixed size')
+        symbol.assignments += 1
+        return symbol
+
+    def lookup(self, name):
+        """Symbol visible under name from this scope, None when undefined"""
+        scope = self
+        while scope is not None:
+            symbol = scope.__symbols.get(name)
+            if symbol is not None:
+                return symbol
+            scope = scope.parent
+        return None
+
+    def resolve(self, name):
+        symbol = self.lookup(name)
+        if symbol is None:
+            raise ValueError(f'Undefined variable: {name}')
+        return symbol
+
+    def scope(self, name):
+        """Child scope of a function, created on first use"""
+        if name not in self.__scopes:
+            self.__scopes[name] = SymbolTable(name, self)
+        return self.__scopes[name]
+
+    def scopes(self):
+        return list(self.__scopes.values())
+
+    def __contains__(self, name):
+        return name in self.__symbols
+
+    def __getitem__(self, name):
+        return self.__symbols[name]
+
+    def __iter__(self):
+        return iter(self.__symbols.values())
+
+    def __len__(self):
+        return len(self.__symbols)
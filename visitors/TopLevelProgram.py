@@ -1,91 +1,213 @@
 import ast
 
-from visitors.BottomLevelProgram import BottomLevelProgram
+from visitors.SymbolTable import STATIC, EQUATE, arrayValues
 
 LabeledInstruction = tuple[str, str]
-GLOBALVAR = "globalVar"
-LOCALVAR = "localVar"
+
+# branch taken when the comparison holds
+BRANCH = {ast.Lt: 'BRLT', ast.LtE: 'BRLE', ast.Gt: 'BRGT', ast.GtE: 'BRGE', ast.Eq: 'BREQ', ast.NotEq: 'BRNE'}
+# branch taken when it does not: '<' in the code means we branch if '>='...
+INVERTED = {ast.Lt: 'BRGE', ast.LtE: 'BRGT', ast.Gt: 'BRLE', ast.GtE: 'BRLT', ast.Eq: 'BRNE', ast.NotEq: 'BREQ'}
+# same comparison with the operands swapped
+MIRRORED = {ast.Lt: ast.Gt, ast.LtE: ast.GtE, ast.Gt: ast.Lt, ast.GtE: ast.LtE, ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+
+# instructions leaving N and Z as the value of A (a CPWA of A with 0 would set them the same way)
+FLAGS_FROM_A = {'LDWA', 'ADDA', 'SUBA', 'ANDA', 'ORA', 'NEGA', 'NOTA', 'ASLA', 'ASRA'}
+# instructions touching neither A nor the flags
+FLAGS_KEPT = {'STWA', 'STWX', 'NOP0', 'NOP1'}
 
 class TopLevelProgram(ast.NodeVisitor):
-    """We support assignments and input/print calls"""
+    """
+        Instructions of the top level and of the functions it calls, each
+        function laid out before the entry point: assignments (to variables
+        and array elements), input/print, while and if whose conditions combine
+        comparisons with and/or/not, calls with their arguments on the stack,
+        and the runtime routines of *, // and % by variables
+    """
     
-    def __init__(self, entry_point, globalRenamedVariables, localRenamedVariables, returns, stackMemory) -> None:
+    def __init__(self, entry_point, symbols, nesting, runtime, registers = None) -> None:
         super().__init__()
         self.__instructions = list()
+        self.__functionCode = list()  # functions are laid out before the entry point
         self.__record_instruction('NOP1', label=entry_point)
+        if symbols.outgoing:
+            # room for the arguments of the calls made by the top level
+            self.__record_instruction(f'SUBSP {symbols.outgoing},i')
         self.__should_save = True
-        self.__current_variable = None
+        self.__target = None      # Name or Subscript node being assigned
         self.__elem_id_while = 0
         self.__elem_id_if = 0
-        self.__processedConstants = []
-        self.__globalRenamedVariables = globalRenamedVariables
-        self.__localRenamedVariables = localRenamedVariables
-        self.__functions = []
-        self.__stackMemory = stackMemory
-        self.__typeOfVar = None
-        self.__returns = returns
+        self.__elem_id_array = 0
+        self.__elem_id_bool = 0
+        self.__loops = []         # ids of the enclosing while loops, innermost last
+        self.__flags = None       # operand A was loaded from or stored to, 'A' if none, while N/Z reflect A
+        self.__symbols = symbols  # root scope of the SymbolTable
+        self.__scope = symbols    # scope of the function being visited
+        self.__functions = {scope.name: scope for scope in symbols.scopes()}
+        self.__exit = None        # label of the epilogue of the function being visited
+        self.__nesting = nesting  # LoopNesting side table of the tree being visited
+        self.__runtime = runtime  # RuntimeLibrary recording the routines called
+        self.__registers = registers  # RegisterAllocation of the loops, None to keep every variable in memory
+        self.__inX = None         # (Induction, Symbol) of the variable held by X in the loop being visited
 
 
     def finalize(self):
         self.__instructions.append((None, '.END'))
-        return self.__instructions
+        return self.__functionCode + self.__instructions
 
     ####
     ## Handling Assignments (variable = ...)
     ###
 
     def visit_Assign(self, node):
-        # remembering the name of the target     
-        if node.targets[0].id in self.__globalRenamedVariables:
-            self.__current_variable = self.__globalRenamedVariables[node.targets[0].id]
-            self.__typeOfVar = GLOBALVAR
+        if self.__inX is not None and self.__inX[0].update is node:
+            self.__stepX()
+            return
+        target = node.targets[0]
+        if isinstance(target, ast.Subscript):
+            self.__store(target, node.value)
+            return
+
+        # remembering the target, resolved in the scope of the current function
+        symbol = self.__scope.resolve(target.id)
+        values = arrayValues(node.value)
+
+        # the initializer of a global runs exactly once (outside loops, conditionals and functions):
+        # its .WORD/.BLOCK/.EQUATE directive already holds the value, skip the store
+        if (symbol.initializer is node and symbol.storage in (STATIC, EQUATE)
+                and (isinstance(node.value, ast.Constant) or values is not None) and self.__nesting.runsOnce(node)):
+            return
+        if symbol.storage == EQUATE:
+            raise ValueError(f'Cannot assign to constant {target.id}')
+
+        if symbol.length is not None:
+            self.__fillArray(symbol, values)
         else:
-            self.__current_variable = self.__localRenamedVariables[node.targets[0].id]
-            self.__typeOfVar = LOCALVAR
+            self.__store(target, node.value)
 
-        # visiting the left part, now knowing where to store the result
-        self.visit(node.value)
-        if self.__should_save:
 
-            if self.__typeOfVar == GLOBALVAR:
-                self.__record_instruction(f'STWA {self.__current_variable},d')
-            else:
-                self.__record_instruction(f'STWA {self.__current_variable},s')
+    def visit_AugAssign(self, node):
+        if self.__inX is not None and self.__inX[0].update is node:
+            self.__stepX()
+            return
+        # x op= value is x = x op value
+        self.visit_Assign(ast.copy_location(ast.Assign([node.target], ast.BinOp(node.target, node.op, node.value)), node))
+
 
+    def __store(self, target, value):
+        # visiting the left part, now knowing where to store the result
+        self.__target = target
+        self.visit(value)
+        if self.__should_save:
+            # an element is addressed once the value is in A: computing it may use X
+            self.__access_memory(target, 'STWA')
         else:
             self.__should_save = True
-        self.__current_variable = None
+        self.__target = None
+
+    def __fillArray(self, symbol, values):
+        """Store the elements of an array literal, with a loop on X when they are all the same"""
+        mode = symbol.indexedAddressing
+        if len(set(values)) == 1:
+            array_id = self.__identifyArray()
+            self.__record_instruction(f'LDWA {values[0]},i')
+            self.__record_instruction(f'LDWX {2 * (len(values) - 1)},i')
+            self.__record_instruction(f'STWA {symbol.label},{mode}', label = f'ar{array_id}')
+            self.__record_instruction('SUBX 2,i')
+            self.__record_instruction(f'BRGE ar{array_id}')
+        else:
+            for i, value in enumerate(values):
+                self.__record_instruction(f'LDWA {value},i')
+                self.__record_instruction(f'LDWX {2 * i},i')
+                self.__record_instruction(f'STWA {symbol.label},{mode}')
 
 
     def visit_Constant(self, node): 
-
-        # checks to see if node within while loop
-        inWhile = self.__inWhile(node)
-
-        # if program has already seen the variable, not in a while loop, and is global, then skip instantiation
-        if (self.__current_variable not in self.__processedConstants) and (inWhile == False) and (self.__typeOfVar == GLOBALVAR):    # ignores store
-            self.__processedConstants.append(self.__current_variable)
-            self.__should_save = False
-        else:  # goes to store
-            self.__record_instruction(f'LDWA {node.value},i')
+        self.__record_instruction(f'LDWA {node.value},i')
 
     
     def visit_Name(self, node):
-        if self.__typeOfVar == GLOBALVAR:
-            self.__record_instruction(f'LDWA {self.__globalRenamedVariables[node.id]},d')
-        else: 
-            self.__record_instruction(f'LDWA {self.__localRenamedVariables[node.id]},s')
-        
+        self.__access_memory(node, 'LDWA')
+
+
+    def visit_Subscript(self, node):
+        self.__access_memory(node, 'LDWA')
+
+
+    def visit_UnaryOp(self, node):
+        # the operand is left in A, then negated or complemented in place
+        if isinstance(node.op, ast.Not):
+            raise ValueError('Unsupported expression: not is only supported in the conditions of if and while')
+        self.__load(node.operand)
+        if isinstance(node.op, ast.USub):
+            self.__record_instruction('NEGA')
+        elif isinstance(node.op, ast.Invert):
+            self.__record_instruction('NOTA')
+
 
     def visit_BinOp(self, node):
-        self.__access_memory(node.left, 'LDWA')
-        if isinstance(node.op, ast.Add):
-            self.__access_memory(node.right, 'ADDA')
-        elif isinstance(node.op, ast.Sub):
-            self.__access_memory(node.right, 'SUBA')
+        # the result is left in A; at most one operand can itself be an expression
+        if not (self.__isOperand(node.left) or self.__isOperand(node.right)):
+            raise ValueError('Unsupported expression: one operand of each operator must be a variable or a constant')
+        if isinstance(node.op, (ast.Add, ast.Sub)):
+            self.__additive(node)
+        elif isinstance(node.op, ast.Mult):
+            self.__multiplicative(node)
+        elif isinstance(node.op, (ast.FloorDiv, ast.Mod)):
+            self.__division(node)
         else:
             raise ValueError(f'Unsupported binary operator: {node.op}')
 
+    def __additive(self, node):
+        instruction = 'ADDA' if isinstance(node.op, ast.Add) else 'SUBA'
+        if self.__isOperand(node.right):
+            self.__load(node.left)
+            self.__access_memory(node.right, instruction)
+        else:
+            # a - (expr) is -(expr) + a
+            self.visit(node.right)
+            if instruction == 'SUBA':
+                self.__record_instruction('NEGA')
+            self.__access_memory(node.left, 'ADDA')
+
+    def __multiplicative(self, node):
+        # multiplying by a power of two is a left shift
+        for value, other in ((node.right, node.left), (node.left, node.right)):
+            shift = self.__powerOfTwo(value)
+            if shift is not None:
+                self.__load(other)
+                for _ in range(shift):
+                    self.__record_instruction('ASLA')
+                return
+        self.__callRuntime('__mul', node.left, '__mul_a', node.right, '__mul_b')
+
+    def __division(self, node):
+        shift = self.__powerOfTwo(node.right)
+        if shift is not None:
+            self.__load(node.left)
+            if isinstance(node.op, ast.FloorDiv):
+                # arithmetic shifts round towards -infinity, like //
+                for _ in range(shift):
+                    self.__record_instruction('ASRA')
+            else:
+                # two's complement: the low bits are the (non negative) remainder, like %
+                self.__record_instruction(f'ANDA {(1 << shift) - 1},i')
+            return
+        self.__callRuntime('__div', node.left, '__div_n', node.right, '__div_d')
+        if isinstance(node.op, ast.Mod):
+            self.__record_instruction('LDWA __div_n,d')  # __div leaves the remainder in __div_n
+
+    def __callRuntime(self, routine, left, leftSlot, right, rightSlot):
+        """Pass both operands through the static slots of a runtime routine and CALL it"""
+        # the expression operand goes first: it may call routines and overwrite the slots
+        operands = [(left, leftSlot), (right, rightSlot)]
+        if self.__isOperand(left):
+            operands.reverse()
+        for operand, slot in operands:
+            self.__load(operand)
+            self.__record_instruction(f'STWA {slot},d')
+        self.__record_instruction(f'CALL {self.__runtime.use(routine)}')
+
     def visit_Call(self, node):
         match node.func.id:
             case 'int': 
@@ -93,24 +215,26 @@ class TopLevelProgram(ast.NodeVisitor):
                 self.visit(node.args[0])
             case 'input':
                 # We are only supporting integers for now
-                if self.__typeOfVar == GLOBALVAR:
-                    self.__record_instruction(f'DECI {self.__current_variable},d')
-                    self.__should_save = False # DECI already save the value in memory
-                else:
-                    self.__record_instruction(f'DECI {self.__current_variable},s')
-                    self.__should_save = False # DECI already save the value in memory
+                if self.__target is None:
+                    raise ValueError('Unsupported input(): its value must be assigned to a variable')
+                self.__access_memory(self.__target, 'DECI')
+                self.__should_save = False # DECI already save the value in memory
             case 'print':
-                # We are only supporting integers for now
-                if self.__typeOfVar == GLOBALVAR:
-                    self.__record_instruction(f'DECO {self.__globalRenamedVariables[node.args[0].id]},d')
-                else:
-                    self.__record_instruction(f'DECO {self.__localRenamedVariables[node.args[0].id]},s')
+                # We are only supporting integers for now (constant folding can turn the variable into a literal)
+                self.__access_memory(node.args[0], 'DECO')
+            case 'exit':
+                self.__record_instruction('STOP')
             case _:
-                # create call with name of function
-                if (node.func.id in self.__functions):
-                    self.__record_instruction(f'CALL {node.func.id}')
-                else:
-                    raise ValueError(f'Unsupported function call: {node.func.id}')
+                # the return value is left in A
+                callee = self.__call(node)
+                self.__record_instruction(f'LDWA {2 * len(callee.parameters)},s')
+
+    def visit_Expr(self, node):
+        # a call used as a statement: its return value is not read
+        if isinstance(node.value, ast.Call) and isinstance(node.value.func, ast.Name) and node.value.func.id in self.__functions:
+            self.__call(node.value)
+        else:
+            self.visit(node.value)
 
     ####
     ## Handling While loops (only variable OP variable)
@@ -118,57 +242,69 @@ class TopLevelProgram(ast.NodeVisitor):
 
     def visit_While(self, node):
         loop_id = self.__identifyWhile()
-        inverted = {
-            ast.Lt:  'BRGE', # '<'  in the code means we branch if '>=' 
-            ast.LtE: 'BRGT', # '<=' in the code means we branch if '>' 
-            ast.Gt:  'BRLE', # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT', # '>=' in the code means we branch if '<'
-            ast.Eq: 'BRNE',    # '==' in the code means we branch if '!='
-            ast.NotEq: 'BREQ'   # '!=' in the code means we branch if '=='
-        }
-        # left part can only be a variable
-        self.__access_memory(node.test.left, 'LDWA', label = f'wh_{loop_id}')
-        # right part can only be a variable
-        self.__access_memory(node.test.comparators[0], 'CPWA')
-        # print("node test comparators: ", node.test.comparators[0])
-        # Branching is condition is not true (thus, inverted)
-        self.__record_instruction(f'{inverted[type(node.test.ops[0])]} end_wh_{loop_id}')
+
+        induction = self.__registers.variable(node) if self.__registers is not None else None
+        if induction is not None:
+            symbol = self.__scope.resolve(induction.name)
+            if symbol.length is None:
+                # the induction variable lives in X for the whole loop
+                self.__inX = (induction, symbol)
+                self.__record_instruction(f'LDWX {symbol.label},{symbol.addressing}')
+
+        # the back edge joins at wh_N: nothing is known of the flags there
+        self.__flags = None
+        if self.__inX is not None and self.__inX[0].inTest:
+            # X is the left operand of CPWX: compare it with the other side, mirroring the operator if needed
+            op = type(node.test.ops[0])
+            other = node.test.comparators[0]
+            if not (isinstance(node.test.left, ast.Name) and node.test.left.id == induction.name):
+                op, other = MIRRORED[op], node.test.left
+            self.__access_memory(other, 'CPWX', label = f'wh{loop_id}')
+            self.__record_instruction(f'{INVERTED[op]} ew{loop_id}')
+        else:
+            # Branching if condition is not true
+            self.__branch(node.test, f'ew{loop_id}', False, label = f'wh{loop_id}')
         # Visiting the body of the loop
+        self.__loops.append(loop_id)
         for contents in node.body:
             self.visit(contents)
-        self.__record_instruction(f'BR wh_{loop_id}')
+        self.__loops.pop()
+        self.__record_instruction(f'BR wh{loop_id}')
         # Sentinel marker for the end of the loop
-        self.__record_instruction(f'NOP1', label = f'end_wh_{loop_id}')
+        self.__record_instruction(f'NOP1', label = f'ew{loop_id}')
+        if self.__inX is not None:
+            if not self.__inX[0].writeThrough:
+                self.__spillX()
+            self.__inX = None
+
+
+    def visit_Continue(self, node):
+        if not self.__loops:
+            raise ValueError('continue outside of a loop')
+        self.__record_instruction(f'BR wh{self.__loops[-1]}')
+
+
+    def visit_Break(self, node):
+        if not self.__loops:
+            raise ValueError('break outside of a loop')
+        # end_wh_N writes the variable X holds back
+        self.__record_instruction(f'BR ew{self.__loops[-1]}')
 
 
     def visit_If(self, node):
         loop_id = self.__identifyIf()
-        inverted = {
-            ast.Lt:  'BRGE',    # '<'  in the code means we branch if '>=' 
-            ast.LtE: 'BRGT',    # '<=' in the code means we branch if '>' 
-            ast.Gt:  'BRLE',    # '>'  in the code means we branch if '<='
-            ast.GtE: 'BRLT',    # '>=' in the code means we branch if '<'
-            ast.Eq: 'BRNE',    # '==' in the code means we branch if '!='
-            ast.NotEq: 'BREQ'   # '!=' in the code means we branch if '=='
-        }
-
-        # left part can only be a variable
-        self.__access_memory(node.test.left, 'LDWA', label = f'if_{loop_id}')
-        
-        # right part can only be a variable
-        self.__access_memory(node.test.comparators[0], 'CPWA')
-        
-        # Branching is condition is not true (thus, inverted)
-        self.__record_instruction(f'{inverted[type(node.test.ops[0])]} else_{loop_id}')
+
+        # Branching if condition is not true (nothing jumps to if_N: the flags left by the previous statement are live)
+        self.__branch(node.test, f'el{loop_id}', False, label = f'if{loop_id}')
         
         # Visiting the body of the loop
         for contents in node.body:
             self.visit(contents)
         # mark the end of the if statement
-        self.__record_instruction(f'BR end_if_{loop_id}')
+        self.__record_instruction(f'BR ei{loop_id}')
         
         # Begin the else statement
-        self.__record_instruction(f'NOP1', label = f'else_{loop_id}')
+        self.__record_instruction(f'NOP1', label = f'el{loop_id}')
 
         # Visit all content in the 'else'. If there is an elif, 
         # this will recursively call visit_If().
@@ -176,36 +312,109 @@ class TopLevelProgram(ast.NodeVisitor):
             self.visit(contents)
 
         # Mark the end of the else statement
-        self.__record_instruction(f'BR end_if_{loop_id}')
+        self.__record_instruction(f'BR ei{loop_id}')
 
         # Sentinel marker for the end of the if else block
-        self.__record_instruction(f'NOP1', label = f'end_if_{loop_id}')
+        self.__record_instruction(f'NOP1', label = f'ei{loop_id}')
 
     ####
-    ## Not handling function calls 
+    ## Handling conditions: comparisons, and/or/not with short-circuit branches
     ####
 
-    def visit_FunctionDef(self, node):
+    def __branch(self, test, target, when, label = None):
+        """Branch to target when the truth of test is `when`, fall through otherwise"""
+        if isinstance(test, ast.BoolOp):
+            # `a and b` is false as soon as one is false, `a or b` true as soon as one is true
+            if isinstance(test.op, ast.And) != when:
+                for value in test.values:
+                    self.__branch(value, target, when, label)
+                    label = None
+            else:
+                # the last value decides, the others skip it when they short-circuit
+                skip = f'bo{self.__identifyBool()}'
+                for value in test.values[:-1]:
+                    self.__branch(value, skip, not when, label)
+                    label = None
+                self.__branch(test.values[-1], target, when)
+                self.__record_instruction('NOP1', label = skip)
+        elif isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+            self.__branch(test.operand, target, not when, label)
+        elif isinstance(test, ast.Constant):
+            if bool(test.value) == when:
+                self.__record_instruction(f'BR {target}', label)
+            elif label is not None:
+                self.__record_instruction('NOP1', label)
+        elif isinstance(test, ast.Compare) and len(test.ops) > 1:
+            # a < b < c is a < b and b < c
+            pairs = zip([test.left] + test.comparators, test.ops, test.comparators)
+            self.__branch(ast.BoolOp(ast.And(), [ast.Compare(left, [op], [right]) for left, op, right in pairs]), target, when, label)
+        else:
+            # a value alone is true when not 0
+            left, op, right = (test.left, type(test.ops[0]), test.comparators[0]) if isinstance(test, ast.Compare) else (test, ast.NotEq, ast.Constant(0))
+            if op not in BRANCH:
+                raise ValueError(f'Unsupported comparison: {ast.unparse(test)}')
+            if self.__isZero(left) and not self.__isZero(right):
+                left, op, right = right, MIRRORED[op], left
+            if not self.__isOperand(right):
+                if not self.__isOperand(left):
+                    raise ValueError(f'Unsupported comparison: {ast.unparse(test)}, one side must be a variable or a constant')
+                left, op, right = right, MIRRORED[op], left
+            if self.__flags is not None and self.__flags == self.__operandSpec(left):
+                # A already holds left and N/Z reflect it: nothing to load
+                if label is not None:
+                    flags = self.__flags
+                    self.__record_instruction('NOP1', label)
+                    self.__flags = flags  # callers only pass labels nothing jumps to (see visit_While)
+            elif self.__isOperand(left):
+                self.__access_memory(left, 'LDWA', label)
+            else:
+                if label is not None:
+                    self.__record_instruction('NOP1', label)
+                self.visit(left)
+            # N and Z already compare A with 0, unless A comes from somewhere they do not follow (a CALL...)
+            if not (self.__isZero(right) and self.__flags is not None):
+                self.__access_memory(right, 'CPWA')
+            self.__record_instruction(f'{(BRANCH if when else INVERTED)[op]} {target}')
 
-        self.__record_instruction(f'NOP1', label = f'{node.name}')
-        self.__functions.append(node.name)
+    ####
+    ## Handling functions: each one has its own frame, see LocalVariableExtraction
+    ####
 
-        self.__record_instruction(f'SUBSP {self.__stackMemory},i')
+    def visit_FunctionDef(self, node):
+        scope = self.__functions[node.name]
+        # the body goes to the function code, laid out before the top level
+        topLevel, self.__instructions = self.__instructions, list()
+        self.__scope = scope
+        self.__exit = f'rt{list(self.__functions).index(node.name)}'
+
+        self.__record_instruction(f'NOP1', label = scope.label)
+        if scope.frameSize:
+            self.__record_instruction(f'SUBSP {scope.frameSize},i')
 
         for contents in node.body:
             self.visit(contents)
-        
-        self.__record_instruction(f'ADDSP {self.__stackMemory},i')
+
+        # epilogue, every return branches here
+        self.__record_instruction(f'NOP1', label = self.__exit)
+        if scope.frameSize:
+            self.__record_instruction(f'ADDSP {scope.frameSize},i')
         self.__record_instruction(f'RET')
 
+        self.__functionCode.extend(self.__instructions)
+        self.__instructions = topLevel
+        self.__scope = self.__symbols
+        self.__exit = None
 
-    def visit_Return(self, node):
 
-        try:
-            self.__record_instruction(f'LDWA {node.value.id},s')
-            self.__record_instruction(f'STWA {self.__returns.pop()[0]},s')
-        except:
-            pass
+    def visit_Return(self, node):
+        if self.__exit is None:
+            raise ValueError('Return outside of a function')
+        if node.value is not None:
+            self.__load(node.value)
+            self.__record_instruction(f'STWA {self.__scope.returnSymbol.label},s')
+        if self.__inX is not None and not self.__inX[0].writeThrough and self.__inX[1].storage == STATIC:
+            self.__spillX()  # a global outlives the frame
+        self.__record_instruction(f'BR {self.__exit}')
 
 
     ####
@@ -214,40 +423,139 @@ class TopLevelProgram(ast.NodeVisitor):
 
     def __record_instruction(self, instruction, label = None):
         self.__instructions.append((label, instruction))
+        self.__trackFlags(instruction, label)
+
+    def __trackFlags(self, instruction, label):
+        """Follow what N and Z say about A, for __branch to drop the loads and compares they make useless"""
+        if label is not None:
+            self.__flags = None  # other paths may jump to a label
+        mnemonic, _, operand = instruction.partition(' ')
+        indexed = operand.endswith('x')  # X may change between two accesses
+        if mnemonic == 'LDWA':
+            self.__flags = 'A' if indexed else operand
+        elif mnemonic in FLAGS_FROM_A:
+            self.__flags = 'A'
+        elif mnemonic == 'STWA' and self.__flags is not None:
+            self.__flags = 'A' if indexed else operand
+        elif mnemonic in FLAGS_KEPT:
+            if self.__flags == operand:
+                self.__flags = 'A'  # the memory no longer holds A
+        else:
+            self.__flags = None
+
+    def __call(self, node):
+        """Store the arguments in the outgoing area at the bottom of the frame, then CALL. Returns the callee's scope"""
+        if not isinstance(node.func, ast.Name) or node.func.id not in self.__functions:
+            raise ValueError(f'Unsupported function call: {ast.unparse(node.func)}')
+        callee = self.__functions[node.func.id]
+        if len(node.args) != len(callee.parameters):
+            raise ValueError(f'{node.func.id} expects {len(callee.parameters)} arguments, got {len(node.args)}')
+        if self.__inX is not None and not self.__inX[0].writeThrough:
+            self.__spillX()  # the callee or the arguments may read the variable
+        for i, arg in enumerate(node.args):
+            # the outgoing area is shared: a call in an argument would overwrite the arguments already stored
+            if any(isinstance(n, ast.Call) for n in ast.walk(arg)):
+                raise ValueError(f'Unsupported argument of {node.func.id}: calls cannot be nested')
+            self.__load(arg)
+            self.__record_instruction(f'STWA {2 * i},s')
+        self.__record_instruction(f'CALL {callee.label}')
+        if self.__inX is not None:
+            # the callee may have used X, or changed a global
+            self.__record_instruction(f'LDWX {self.__inX[1].label},{self.__inX[1].addressing}')
+        return callee
+
+    def __stepX(self):
+        """ADDX/SUBX the step of the induction variable held by X"""
+        induction, symbol = self.__inX
+        self.__access_memory(induction.step, 'ADDX' if induction.operator is ast.Add else 'SUBX')
+        if induction.writeThrough:
+            self.__spillX()
+
+    def __spillX(self):
+        symbol = self.__inX[1]
+        self.__record_instruction(f'STWX {symbol.label},{symbol.addressing}')
+
+    def __isOperand(self, node):
+        """Variables, constants and array elements indexed by one of them can be the operand of an instruction"""
+        if isinstance(node, ast.Subscript):
+            return isinstance(node.slice, ast.Name) or self.__constantIndex(node.slice) is not None
+        return isinstance(node, (ast.Constant, ast.Name))
+
+    def __constantIndex(self, node):
+        """Value of a constant index, negative ones (`a_[-1]`, a unary minus when not folded) included; None otherwise"""
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            value = self.__constantIndex(node.operand)
+            return None if value is None else -value
+        if isinstance(node, ast.Constant) and type(node.value) is int:
+            return node.value
+        return None
+
+    def __isZero(self, node):
+        return isinstance(node, ast.Constant) and node.value == 0
+
+    def __operandSpec(self, node):
+        """`label,addressing` of a variable or constant, None for anything else"""
+        if isinstance(node, ast.Constant):
+            return f'{node.value},i'
+        if isinstance(node, ast.Name):
+            symbol = self.__scope.resolve(node.id)
+            return f'{symbol.label},{symbol.addressing}'
+        return None
+
+    def __powerOfTwo(self, node):
+        """k when node is the constant 2**k (k >= 0), None otherwise"""
+        if isinstance(node, ast.Constant) and type(node.value) is int and node.value > 0 and node.value & (node.value - 1) == 0:
+            return node.value.bit_length() - 1
+        return None
+
+    def __load(self, node):
+        """Leave the value of node in A"""
+        if self.__isOperand(node):
+            self.__access_memory(node, 'LDWA')
+        else:
+            self.visit(node)
 
     def __access_memory(self, node, instruction, label = None):
         if isinstance(node, ast.Constant):
             self.__record_instruction(f'{instruction} {node.value},i', label)
-        else:
-            if node.id in self.__globalRenamedVariables:
-                self.__record_instruction(f'{instruction} {self.__globalRenamedVariables[node.id]},d', label) 
+        elif isinstance(node, ast.Subscript):
+            # X holds the byte offset of the element: constant, or the index doubled by ASLX
+            symbol = self.__scope.resolve(node.value.id)
+            mode = symbol.indexedAddressing
+            index = self.__constantIndex(node.slice)
+            if index is not None:
+                index = index + symbol.length if index < 0 else index
+                if not 0 <= index < symbol.length:
+                    raise ValueError(f'Index out of range: {ast.unparse(node)}')
+                self.__record_instruction(f'LDWX {2 * index},i', label)
+            elif isinstance(node.slice, ast.Name):
+                index = self.__scope.resolve(node.slice.id)
+                self.__record_instruction(f'LDWX {index.label},{index.addressing}', label)
+                self.__record_instruction('ASLX')
             else:
-                self.__record_instruction(f'{instruction} {self.__localRenamedVariables[node.id]},s', label)
+                raise ValueError(f'Unsupported index: {ast.unparse(node.slice)}, only variables and constants can index an array')
+            self.__record_instruction(f'{instruction} {symbol.label},{mode}')
+        else:
+            # locals shadow globals: the symbol table looks in the function scope first
+            symbol = self.__scope.resolve(node.id)
+            self.__record_instruction(f'{instruction} {symbol.label},{symbol.addressing}', label)
 
     def __identifyWhile(self):
         result = self.__elem_id_while
         self.__elem_id_while = self.__elem_id_while + 1
         return result
 
+    def __identifyArray(self):
+        result = self.__elem_id_array
+        self.__elem_id_array = self.__elem_id_array + 1
+        return result
+
+    def __identifyBool(self):
+        result = self.__elem_id_bool
+        self.__elem_id_bool = self.__elem_id_bool + 1
+        return result
+
     def __identifyIf(self):
         result = self.__elem_id_if
         self.__elem_id_if = self.__elem_id_if + 1
         return result
-
-    def __inWhile(self, node):
-        resultList = []
-        currNode = node
-
-        # check node lineage until reaching root node
-        while True:
-            try:
-                resultList.append(currNode.parent)
-                currNode = currNode.parent
-            except:
-                break 
-
-        # if there is a while node in the lineage, return true
-        if any(isinstance(i, ast.While) for i in resultList):
-            return True
-        else:
-            return False
\ No newline at end of file